@@ -3,6 +3,13 @@ from .notest_lib import notest_run
 from .validators import AbstractExtractor, AbstractValidator
 from.operations import Operation
 from .lib.utils import templated_var
-from .lib.mysql_lib import MysqlClient
 # from notest.http_test_runner.http_test import HttpTestResult
-from .validators import Failure
\ No newline at end of file
+from .validators import Failure
+
+
+def __getattr__(name):
+    """ MysqlClient needs mysql.connector, only imported when used """
+    if name == 'MysqlClient':
+        from .lib.mysql_lib import MysqlClient
+        return MysqlClient
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
@@ -0,0 +1,240 @@
+import asyncio
+import json
+import time
+import weakref
+import threading
+from collections import namedtuple
+import aiohttp
+
+from .http_response import HttpResponse, make_timings
+
+DEFAULT_TIMEOUT = 10  # Seconds
+DEFAULT_LIMIT_PER_HOST = 100  # Max pooled connections to one host
+STREAM_CHUNK_SIZE = 64 * 1024  # Bytes read at once from streamed responses
+
+# Connector settings of a pooled session, the handler of the async client
+SessionConfig = namedtuple('SessionConfig', ['limit_per_host', 'force_close'])
+DEFAULT_SESSION_CONFIG = SessionConfig(DEFAULT_LIMIT_PER_HOST, False)
+# Pooled sessions of each event loop by SessionConfig, so every request of a loop shares connections
+LOOP_SESSIONS = weakref.WeakKeyDictionary()
+# Event loop of each thread for blocking sends, kept between requests so connections are reused
+THREAD_LOOPS = threading.local()
+
+
+def mark_phase(name):
+    """ Trace callback recording the time of a phase into the request trace context """
+
+    async def on_phase(session, trace_config_ctx, params):
+        marks = trace_config_ctx.trace_request_ctx
+        if isinstance(marks, dict):
+            marks[name] = time.perf_counter()
+
+    return on_phase
+
+
+def create_trace_config():
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_dns_resolvehost_start.append(mark_phase('dns_start'))
+    trace_config.on_dns_resolvehost_end.append(mark_phase('dns_end'))
+    trace_config.on_connection_create_start.append(mark_phase('connect_start'))
+    trace_config.on_connection_create_end.append(mark_phase('connect_end'))
+    trace_config.on_request_end.append(mark_phase('first_byte'))
+    return trace_config
+
+
+def get_timings(marks, start, end):
+    """ Build phase timings from trace marks, tls is part of connect with aiohttp """
+
+    def span(begin, finish):
+        if begin in marks and finish in marks:
+            return marks[finish] - marks[begin]
+        return None
+
+    first_byte = marks.get('first_byte')
+    return make_timings(
+        dns=span('dns_start', 'dns_end'),
+        connect=span('connect_start', 'connect_end'),
+        ttfb=first_byte - start if first_byte else None,
+        transfer=end - first_byte if first_byte else None,
+        total=end - start
+    )
+
+
+def get_loop_session(config=DEFAULT_SESSION_CONFIG):
+    """ Get the pooled session of the running event loop for a SessionConfig, create it if needed """
+    loop = asyncio.get_running_loop()
+    sessions = LOOP_SESSIONS.setdefault(loop, dict())
+    session = sessions.get(config)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(limit_per_host=config.limit_per_host,
+                                         force_close=config.force_close)
+        session = aiohttp.ClientSession(connector=connector,
+                                        trace_configs=[create_trace_config()])
+        sessions[config] = session
+    return session
+
+
+async def close_loop_session():
+    """ Close the pooled sessions of the running event loop, if any """
+    sessions = LOOP_SESSIONS.pop(asyncio.get_running_loop(), dict())
+    for session in sessions.values():
+        if not session.closed:
+            await session.close()
+
+
+def close_thread_loop(loop):
+    """ Close a thread loop and its pooled session, when its thread is gone or at exit """
+    if loop.is_closed():
+        return
+
+    def close():
+        for session in LOOP_SESSIONS.pop(loop, dict()).values():
+            if not session.closed:
+                loop.run_until_complete(session.close())
+        loop.close()
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        close()
+        return
+    # Finalized in a thread running another loop, which can not run this one
+    closer = threading.Thread(target=close)
+    closer.start()
+    closer.join()
+
+
+def get_thread_loop():
+    """ Event loop of the current thread for blocking sends, created on first use
+        and closed with its thread """
+    loop = getattr(THREAD_LOOPS, 'loop', None)
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        THREAD_LOOPS.loop = loop
+        weakref.finalize(threading.current_thread(), close_thread_loop, loop)
+    return loop
+
+
+class AsyncClient:
+    """ asyncio http client built on aiohttp
+        Requests of one event loop share a session, pooling connections per host """
+
+    def __init__(self, handler=None):
+        self.session = None
+        self.session_config = DEFAULT_SESSION_CONFIG
+        if isinstance(handler, aiohttp.ClientSession):
+            self.session = handler
+        elif isinstance(handler, SessionConfig):
+            self.session_config = handler
+        self.response = None
+
+    def get_handler(self):
+        return self.session if self.session is not None else self.session_config
+
+    @staticmethod
+    def create_handler(pool_size=DEFAULT_LIMIT_PER_HOST, keep_alive=True):
+        """ Sessions belong to an event loop, the handler is the SessionConfig
+            of the sessions get_loop_session pools in each loop """
+        return SessionConfig(limit_per_host=pool_size, force_close=not keep_alive)
+
+    @staticmethod
+    def close_handler(handler):
+        # Sessions are owned by their event loop, see close_loop_session
+        pass
+
+    def close(self):
+        pass
+
+    def send_request(self, test_obj, timeout=DEFAULT_TIMEOUT, context=None,
+                     handler=None, ssl_insecure=True, verbose=False):
+        """ Blocking send, same contract as the other clients
+            Runs on the event loop of the thread, its session keeps connections between requests """
+        return get_thread_loop().run_until_complete(self.send_request_async(
+            test_obj, timeout=timeout, context=context, handler=handler,
+            ssl_insecure=ssl_insecure, verbose=verbose))
+
+    async def send_request_async(self, test_obj, timeout=DEFAULT_TIMEOUT,
+                                 context=None, handler=None,
+                                 ssl_insecure=True, verbose=False):
+        if handler is not None and isinstance(handler, aiohttp.ClientSession):
+            session = handler
+        elif isinstance(handler, SessionConfig):
+            session = get_loop_session(handler)
+        elif self.session is not None and not self.session.closed:
+            session = self.session
+        else:
+            session = get_loop_session(self.session_config)
+
+        head = test_obj.get_headers(context=context)
+        headers = {k.lower(): str(v) for k, v in head.items()}
+        # Set charset if doing unicode conversion and not set explicitly
+        body = test_obj.http_body
+        json_body = None
+        if isinstance(body, str):
+            if 'content-type' in headers.keys():
+                content = headers['content-type']
+                if 'json' in content:
+                    json_body = json.loads(body)
+                    body = None
+                if 'charset' not in content:
+                    headers['content-type'] = content + ' ; charset=UTF-8'
+
+        auth = None
+        if test_obj.auth_username and test_obj.auth_password:
+            auth_username = test_obj.auth_username
+            auth_password = test_obj.auth_password
+            if isinstance(auth_username, bytes):
+                auth_username = auth_username.decode()
+            if isinstance(auth_password, bytes):
+                auth_password = auth_password.decode()
+            auth = aiohttp.BasicAuth(auth_username, auth_password)
+
+        proxy = None
+        if "proxies" in test_obj.__dict__ and test_obj.proxies:
+            proxies = test_obj.proxies
+            proxy = proxies.get(str(test_obj.url).split(':', 1)[0])
+
+        request_size = test_obj.http_body or b''
+        if isinstance(request_size, str):
+            request_size = request_size.encode('utf-8')
+        request_size = len(request_size) + sum(
+            len(k) + len(v) + 4 for k, v in headers.items())
+
+        stream = getattr(test_obj, 'response_stream', None)
+        marks = dict()
+        start = time.perf_counter()
+        async with session.request(
+                method=test_obj.method,
+                url=str(test_obj.url),
+                headers=headers,
+                data=body,
+                json=json_body,
+                auth=auth,
+                proxy=proxy,
+                ssl=False if ssl_insecure is True else True,
+                timeout=aiohttp.ClientTimeout(total=timeout),
+                trace_request_ctx=marks) as resp:
+            if stream is not None:
+                # Streamed bodies are written chunk by chunk to the test's response stream
+                async for chunk in resp.content.iter_chunked(STREAM_CHUNK_SIZE):
+                    stream.write(chunk)
+                response_body = None
+                body_size = stream.byte_count
+            else:
+                response_body = await resp.read()
+                body_size = len(response_body)
+            response_headers = [(k.lower(), v) for k, v in resp.headers.items()]
+            response = HttpResponse(
+                body=response_body,
+                headers=response_headers,
+                status_code=resp.status,
+                reason=resp.reason,
+                cookies=resp.cookies,
+                timings=get_timings(marks, start, time.perf_counter()),
+                bytes_sent=request_size,
+                bytes_received=body_size + sum(
+                    len(k) + len(v) + 4 for k, v in response_headers)
+            )
+        self.response = response
+
+        return response
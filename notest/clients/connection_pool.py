@@ -0,0 +1,66 @@
+import threading
+import logging
+from urllib.parse import urlsplit
+
+from notest.clients.request_client import get_client_class
+
+logger = logging.getLogger('notest.connection_pool')
+
+DEFAULT_POOL_SIZE = 10  # Max pooled connections per host
+
+
+class ConnectionPoolManager:
+    """ Owns the request handles (requests sessions, curl handles) of a whole run
+        Handles are keyed by client type, scheme/host and thread, so tests, imported
+        subtestsets and loops reuse connections, and concurrent workers never share one """
+
+    def __init__(self):
+        self.handlers = dict()
+        self.lock = threading.Lock()
+
+    def get_handler(self, client_type, url, testset_config=None):
+        """ Get the pooled handle for a request, create it on first use """
+        parts = urlsplit(str(url))
+        key = (client_type, parts.scheme, parts.netloc,
+               threading.get_ident())
+        with self.lock:
+            if key in self.handlers:
+                return self.handlers[key]
+
+        pool_size = getattr(testset_config, 'pool_size', DEFAULT_POOL_SIZE)
+        keep_alive = getattr(testset_config, 'keep_alive', True)
+        HttpClient = get_client_class(client_type)
+        handler = HttpClient.create_handler(pool_size=pool_size,
+                                            keep_alive=keep_alive)
+        logger.debug("New {} handler for {}://{}".format(
+            client_type, parts.scheme, parts.netloc))
+        with self.lock:
+            self.handlers[key] = handler
+        return handler
+
+    def replace(self, handler, new_handler):
+        """ Pool a handle a client recreated in place of a broken one, e.g. after a curl error """
+        with self.lock:
+            for key, value in self.handlers.items():
+                if value is handler:
+                    self.handlers[key] = new_handler
+
+    def discard(self, handler):
+        """ Close a handle and drop it from the pool, e.g. after a request error """
+        with self.lock:
+            keys = [k for k, v in self.handlers.items() if v is handler]
+            for key in keys:
+                del self.handlers[key]
+        for key in keys:
+            get_client_class(key[0]).close_handler(handler)
+
+    def close(self):
+        """ Close every pooled handle, at the end of a run """
+        with self.lock:
+            handlers = self.handlers
+            self.handlers = dict()
+        for key, handler in handlers.items():
+            try:
+                get_client_class(key[0]).close_handler(handler)
+            except Exception as e:
+                logger.error("Close {} handler error: {}".format(key[0], e))
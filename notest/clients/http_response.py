@@ -1,7 +1,15 @@
-
 class HttpResponse:
+    """ Response of a request, with optional per-phase timings in seconds:
+        dns, connect, tls - durations of name lookup, tcp connect and tls handshake
+        ttfb - from the start of the request until the first response byte
+        transfer - from the first response byte until the end of the response
+        total - whole request
+        Phases a client can not measure are None, the keys are always present:
+        requests has no dns, connect or tls, aiohttp counts tls in connect """
+
     def __init__(self, body=None, headers=None, status_code=None,
-                 reason=None, cookies=None, requests_response=None):
+                 reason=None, cookies=None, requests_response=None,
+                 timings=None, bytes_sent=None, bytes_received=None):
         if requests_response is not None:
             self.body = requests_response.content
             requests_headers = requests_response.headers
@@ -15,4 +23,19 @@ class HttpResponse:
             self.headers = headers
             self.status_code = status_code
             self.reason = reason
-            self.cookies = cookies
\ No newline at end of file
+            self.cookies = cookies
+        self.timings = timings
+        self.bytes_sent = bytes_sent
+        self.bytes_received = bytes_received
+
+
+def make_timings(dns=None, connect=None, tls=None, ttfb=None, transfer=None,
+                 total=None):
+    return {
+        "dns": dns,
+        "connect": connect,
+        "tls": tls,
+        "ttfb": ttfb,
+        "transfer": transfer,
+        "total": total
+    }
@@ -4,7 +4,7 @@ import sys
 import copy
 from io import BytesIO
 from .http_auth_type import HttpAuthType
-from .http_response import HttpResponse
+from .http_response import HttpResponse, make_timings
 
 
 base_dir = os.path.abspath(os.path.dirname(__file__))
@@ -38,6 +38,12 @@ class PyCurlClient:
     def get_handler(self):
         return self.handler
 
+    @staticmethod
+    def create_handler(pool_size=None, keep_alive=True):
+        """ Create a curl handle to be shared by many requests to one host,
+            keep-alive and the connection cache size are set per request from the testset config """
+        return pycurl.Curl()
+
     @staticmethod
     def close_handler(handler):
         if handler:
@@ -47,27 +53,46 @@ class PyCurlClient:
         if self.handler:
             self.handler.close()
 
+    @staticmethod
+    def get_timings(curl):
+        """ Phase timings of the last transfer, curl reports times since the start """
+        namelookup = curl.getinfo(pycurl.NAMELOOKUP_TIME)
+        connect = curl.getinfo(pycurl.CONNECT_TIME)
+        appconnect = curl.getinfo(pycurl.APPCONNECT_TIME)
+        starttransfer = curl.getinfo(pycurl.STARTTRANSFER_TIME)
+        total = curl.getinfo(pycurl.TOTAL_TIME)
+        return make_timings(
+            dns=namelookup,
+            connect=max(connect - namelookup, 0),
+            tls=max(appconnect - connect, 0) if appconnect else 0,
+            ttfb=starttransfer,
+            transfer=max(total - starttransfer, 0),
+            total=total
+        )
+
     def send_request(self, test_obj, timeout=DEFAULT_TIMEOUT, context=None,
                      handler=None, ssl_insecure=True, verbose=False):
         """ Create and mostly configure a curl object for test, reusing existing if possible """
 
-        if handler:
-            curl = handler
-
-            try:  # Check the curl handle isn't closed, and reuse it if possible
-                curl.getinfo(curl.HTTP_CODE)
-                # Below clears the cookies & curl options for clean run
-                # But retains the DNS cache and connection pool
-                curl.reset()
-                curl.setopt(curl.COOKIELIST, "ALL")
-            except pycurl.error:
-                curl = pycurl.Curl()
+        if not handler:
+            handler = self.handler
+        curl = handler
 
-        else:
-            curl = self.handler
+        try:  # Check the curl handle isn't closed, and reuse it if possible
+            curl.getinfo(curl.HTTP_CODE)
+            # Below clears the cookies & curl options for clean run
+            # But retains the DNS cache and connection pool
+            curl.reset()
+            curl.setopt(curl.COOKIELIST, "ALL")
+        except pycurl.error:
+            curl = pycurl.Curl()
+            self.handler = curl
 
         curl.setopt(curl.URL, str(test_obj.url))
         curl.setopt(curl.TIMEOUT, timeout)
+        pool_size = getattr(test_obj.testset_config, 'pool_size', None)
+        if pool_size:  # Set again after each reset, the connection cache itself is kept
+            curl.setopt(pycurl.MAXCONNECTS, pool_size)
 
         is_unicoded = False
         _body = test_obj.body
@@ -147,7 +172,8 @@ class PyCurlClient:
         # Fix for expecting 100-continue from server, which not all servers
         # will send!
         headers.append("Expect:")
-        headers.append("Connection: close")
+        if not getattr(test_obj.testset_config, 'keep_alive', True):
+            headers.append("Connection: close")
         curl.setopt(curl.HTTPHEADER, headers)
 
         # reset the body, it holds values from previous runs otherwise
@@ -155,7 +181,12 @@ class PyCurlClient:
         body = BytesIO()
         if sys.platform.find("win") > -1:
             curl.setopt(pycurl.CAINFO, libcurl_crt_file)
-        curl.setopt(pycurl.WRITEFUNCTION, body.write)
+        # Streamed bodies are written chunk by chunk to the test's response stream
+        stream = getattr(test_obj, 'response_stream', None)
+        if stream is not None:
+            curl.setopt(pycurl.WRITEFUNCTION, stream.write)
+        else:
+            curl.setopt(pycurl.WRITEFUNCTION, body.write)
         curl.setopt(pycurl.HEADERFUNCTION, headers.write)
         if verbose:
             curl.setopt(pycurl.VERBOSE, True)
@@ -165,7 +196,7 @@ class PyCurlClient:
 
         curl.perform()  # Run the actual call
 
-        response_body = body.getvalue()
+        response_body = None if stream is not None else body.getvalue()
         body.close()
         response_headers = headers.getvalue()
         headers.close()
@@ -173,7 +204,10 @@ class PyCurlClient:
         response = HttpResponse(
             body=response_body,
             headers=response_headers,
-            status_code=response_code
+            status_code=response_code,
+            timings=self.get_timings(curl),
+            bytes_sent=curl.getinfo(pycurl.REQUEST_SIZE) + int(curl.getinfo(pycurl.SIZE_UPLOAD)),
+            bytes_received=curl.getinfo(pycurl.HEADER_SIZE) + int(curl.getinfo(pycurl.SIZE_DOWNLOAD))
         )
         self.response = response
 
@@ -25,5 +25,8 @@ def get_client_class(client_type="requests"):
     elif client_type == "requests":
         from notest.clients.requests_client import RequestsClient as HttpClient
         return HttpClient
+    elif client_type == "async":
+        from notest.clients.async_client import AsyncClient as HttpClient
+        return HttpClient
     else:
         raise Exception("Unknown Client Type: {}".format(client_type))
@@ -1,13 +1,17 @@
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import os
+import time
 
 from .http_auth_type import HttpAuthType
-from .http_response import HttpResponse
+from .http_response import HttpResponse, make_timings
 
 base_dir = os.path.abspath(os.path.dirname(__file__))
 
 DEFAULT_TIMEOUT = 10  # Seconds
+DEFAULT_POOL_SIZE = 10  # Max pooled connections per host
+STREAM_CHUNK_SIZE = 64 * 1024  # Bytes read at once from streamed responses
 
 
 class RequestsClient:
@@ -28,6 +32,18 @@ class RequestsClient:
     def get_handler(self):
         return self.session
 
+    @staticmethod
+    def create_handler(pool_size=DEFAULT_POOL_SIZE, keep_alive=True):
+        """ Create a session to be shared by many requests """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size,
+                              pool_maxsize=pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        if not keep_alive:
+            session.headers['Connection'] = 'close'
+        return session
+
     @staticmethod
     def close_handler(handler):
         if handler:
@@ -37,6 +53,17 @@ class RequestsClient:
         if self.session:
             self.session.close()
 
+    @staticmethod
+    def get_request_size(request_obj):
+        """ Size of the prepared request, headers counted as serialized """
+        body = request_obj.body
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        size = len(body) if body else 0
+        size += len(request_obj.method) + len(request_obj.url) + 12
+        size += sum(len(k) + len(v) + 4 for k, v in request_obj.headers.items())
+        return size
+
     def send_request(self, test_obj, timeout=DEFAULT_TIMEOUT,
                      context=None,
                      handler=None, ssl_insecure=True, verbose=False):
@@ -45,6 +72,8 @@ class RequestsClient:
             session = handler
         else:
             session = self.session
+        # Sessions may be pooled between tests, only the connections are shared
+        session.cookies.clear()
 
         # https://2.python-requests.org//zh_CN/latest/user/advanced.html
         request_obj = requests.Request(
@@ -95,17 +124,50 @@ class RequestsClient:
         if verbose:
             pass
 
+        # Streamed bodies are written chunk by chunk to the test's response stream
+        stream = getattr(test_obj, 'response_stream', None)
+        start = time.perf_counter()
         resp = session.send(
             request=request_obj,
             verify=verify,
             timeout=timeout,
             cert=cert,
-            proxies=proxies
+            proxies=proxies,
+            stream=stream is not None
         )
-
-        response = HttpResponse(
-            requests_response=resp
+        if stream is not None:
+            try:
+                for chunk in resp.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                    stream.write(chunk)
+            finally:
+                resp.close()
+            body_size = stream.byte_count
+            response = HttpResponse(
+                headers=[i for i in resp.headers.lower_items()],
+                status_code=resp.status_code,
+                reason=resp.reason,
+                cookies=resp.cookies
+            )
+        else:
+            body_size = len(resp.content)
+            response = HttpResponse(
+                requests_response=resp
+            )
+        total = time.perf_counter() - start
+        # requests only measures the time until the response headers are parsed,
+        # the connection phases happen inside urllib3 and are not exposed
+        ttfb = resp.elapsed.total_seconds()
+        response.timings = make_timings(
+            dns=None,
+            connect=None,
+            tls=None,
+            ttfb=ttfb,
+            transfer=max(total - ttfb, 0),
+            total=total
         )
+        response.bytes_sent = self.get_request_size(request_obj)
+        response.bytes_received = body_size + sum(
+            len(k) + len(v) + 4 for k, v in resp.headers.items())
         self.response = response
 
         return response
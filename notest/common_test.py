@@ -1,13 +1,29 @@
 
+import asyncio
+import functools
+
+
 class CommonTest:
     test_type = None
     name = None
     config = None
     testset_config = None
     group = None
+    depends_on = None  # Names of earlier tests to run after, see scheduler
 
     def run_test(self, test_config, context=None, handler=None, **kwargs):
         raise NotImplementedError()
 
+    async def run_test_async(self, test_config, context=None, handler=None, **kwargs):
+        """ Run a blocking test in the default executor, runners can do better """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(
+            self.run_test, test_config, context=context, handler=handler, **kwargs))
+
     def reload(self):
         raise NotImplementedError()
+
+    def fork(self):
+        """ Return a copy of this test that can run concurrently with it """
+        return self
+
@@ -122,4 +122,4 @@ def __load_args(testset, args):
             pycurl_client.libcurl_crt_file = os.path.abspath(args['libcurl_ca_file'])
 
     if 'loop_interval' in args and args['loop_interval']:
-        testset.config.loop_interval = int(args['loop_interval'])
\ No newline at end of file
+        testset.config.loop_interval = float(args['loop_interval'])
\ No newline at end of file
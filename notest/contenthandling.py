@@ -1,6 +1,7 @@
 import os
 
 from notest.lib.parsing import *
+from notest.lib.utils import templated_string
 
 # Python 2/3 switches
 PYTHON_MAJOR_VERSION = sys.version_info[0]
@@ -42,14 +43,13 @@ class ContentHandler:
         if self.is_file:
             path = self.content
             if self.is_template_path and context:
-                path = string.Template(path).safe_substitute(
-                    context.get_values())
+                path = templated_string(path, context)
             data = None
             with open(path, 'r') as f:
                 data = f.read()
 
             if self.is_template_content and context:
-                return string.Template(data).safe_substitute(context.get_values())
+                return templated_string(data, context)
             else:
                 return data
         else:
@@ -1,5 +1,7 @@
 import logging
+import threading
 import types
+from collections import ChainMap
 
 """
 Basic context implementation for binding variables to values
@@ -7,6 +9,8 @@ Basic context implementation for binding variables to values
 
 logger = logging.getLogger('notest.context')
 
+GENERATOR_LOCK = threading.RLock()  # Guards next() on generators shared between threads
+
 
 class Context(object):
     """ Manages binding of variables & generators, with both variable name and generator name being strings """
@@ -44,7 +48,8 @@ class Context(object):
         """ Binds the next value for generator_name to variable_name and return value used """
         str_gen_name = str(generator_name)
         str_name = str(variable_name)
-        val = next(self.generators[str_gen_name])
+        with GENERATOR_LOCK:
+            val = next(self.generators[str_gen_name])
 
         prev = self.variables.get(str_name)
         if prev != val:
@@ -67,6 +72,15 @@ class Context(object):
     def get_generator(self, generator_name):
         return self.generators.get(str(generator_name))
 
+    def fork(self):
+        """ Copy-on-write child context, reads fall through to this context
+            and writes stay in the child. Generators are shared with the parent """
+        child = Context()
+        child.variables = ChainMap(dict(), self.variables)
+        child.generators = self.generators
+        child.mod_count = self.mod_count
+        return child
+
     def __init__(self):
         self.variables = dict()
         self.generators = dict()
@@ -1,5 +1,6 @@
 import json
 import sys
+from functools import lru_cache
 
 PYTHON_MAJOR_VERSION = sys.version_info[0]
 
@@ -10,11 +11,17 @@ try:  # First try to load notest from global namespace
     from notest import context
     from notest.lib import parsing
     from notest import contenthandling
+    from notest.lib.utils import parse_json_body
 except ImportError:  # Then try a relative import if possible
     from .. import validators
     from .. import context
     from .. import parsing
     from .. import contenthandling
+    from ..lib.utils import parse_json_body
+
+
+# Compiled expressions by query, templated queries are memoized by their rendered string
+compile_jmespath = lru_cache(maxsize=validators.QUERY_CACHE_SIZE)(jmespath.compile)
 
 
 class JMESPathExtractor(validators.AbstractExtractor):
@@ -25,13 +32,8 @@ class JMESPathExtractor(validators.AbstractExtractor):
     is_body_extractor = True
 
     def extract_internal(self, body=None, headers=None, context=None):
-        mybody = body
-        if PYTHON_MAJOR_VERSION > 2:
-            if isinstance(mybody, bytes):
-                mybody = str(mybody, 'utf-8')
-
         try:
-            res = jmespath.search(self.query, json.loads(mybody))  # Better way
+            res = compile_jmespath(self.query).search(parse_json_body(body))
             return res
         except Exception as e:
             raise ValueError("Invalid query: " + self.query + " : " + str(e))
@@ -40,6 +42,8 @@ class JMESPathExtractor(validators.AbstractExtractor):
     def parse(cls, config):
         base = JMESPathExtractor()
         base.query = config
+        if isinstance(config, str) and "$" not in config:
+            compile_jmespath(config)  # Templated queries compile once rendered
         return base
 
 
@@ -1,5 +1,4 @@
-import json
-from notest.lib.mysql_lib import MysqlClient
+from notest.lib.mysql_lib import pooled_client
 from notest.lib.utils import templated_var
 from notest import validators
 
@@ -25,21 +24,20 @@ class MySQLQueryExtractor(validators.AbstractExtractor):
         self.mysql_config = None
 
     def extract_internal(self, body=None, headers=None, context=None):
-        self.query = templated_var(self.query, context)
-        self.mysql_config = templated_var(self.mysql_config, context)
-        self.mysql_config = json.loads(self.mysql_config)
+        query = templated_var(self.query, context)
+        mysql_config = templated_var(self.mysql_config, context)
         try:
-            with MysqlClient(self.mysql_config) as cli:
-                res = cli.query(self.query)
+            with pooled_client(mysql_config) as cli:
+                res = cli.query(query)
                 if len(res) == 0:
                     raise Exception(
-                        "No data queried in MySQL by '{}'!".format(self.query))
+                        "No data queried in MySQL by '{}'!".format(query))
                 res = res[0]
                 if isinstance(res, tuple):
                     res = res[0]
                 return res
         except Exception as e:
-            raise ValueError("Invalid query: '" + self.query + "' : " + str(e))
+            raise ValueError("Invalid query: '" + query + "' : " + str(e))
 
     @classmethod
     def parse(cls, config):
@@ -0,0 +1,162 @@
+
+import os
+import logging
+from itertools import islice
+
+from notest.lib.utils import json_loads
+
+try:  # Optional, parquet and arrow generators need it
+    import pyarrow
+    import pyarrow.parquet
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+
+logger = logging.getLogger("notest.columnar_generator")
+
+'''
+ - generators:
+        - rows:
+            type: 'ndjson'  # or 'parquet', 'arrow', which need pyarrow
+            file: 'rows.ndjson'
+            columns: auto  # only the columns used as $variables by the tests, or a list
+            batch_size: 10000  # rows read at once
+'''
+
+DEFAULT_BATCH_SIZE = 10000
+COLUMNS_AUTO = 'auto'
+
+
+def get_columns(config, variable_binds):
+    """ Columns to keep, None for all of them
+        auto keeps the $variables used in the testset, or all if that is unknown """
+    columns = config.get('columns')
+    if columns is None:
+        return None
+    if isinstance(columns, str) and columns.strip().lower() == COLUMNS_AUTO:
+        template_vars = variable_binds.get('template_vars')
+        return None if template_vars is None else frozenset(template_vars)
+    if isinstance(columns, str):
+        columns = columns.split(',')
+    if not isinstance(columns, list):
+        raise ValueError("columns must be auto or a list of column names")
+    return [str(c).strip() for c in columns]
+
+
+def select_columns(names, columns):
+    """ Names of the file to read, all of them if auto matches none,
+        as the generator may be bound to one variable by generator_binds """
+    if columns is None:
+        return list(names)
+    if isinstance(columns, frozenset):
+        selected = [n for n in names if n in columns]
+        return selected or list(names)
+    return list(columns)
+
+
+def factory_ndjson_generator(path, columns=None, batch_size=DEFAULT_BATCH_SIZE):
+    def ndjson_generator():
+        with open(path, "rb") as fd:
+            while True:
+                lines = list(islice(fd, batch_size))
+                if not lines:
+                    break
+                for line in lines:
+                    if not line.strip():
+                        continue
+                    row = json_loads(line)
+                    if not isinstance(row, dict):
+                        raise ValueError("ndjson rows must be objects, not {} in {}".format(
+                            type(row).__name__, path))
+                    if columns is None:
+                        yield row
+                    else:
+                        yield {k: row.get(k) for k in select_columns(row, columns)}
+    return ndjson_generator
+
+
+def iter_batch_rows(batch, names):
+    """ Dicts of the rows of a record batch, for the named columns """
+    schema_names = batch.schema.names
+    values = [batch.column(schema_names.index(n)).to_pylist() for n in names]
+    for row in zip(*values):
+        yield dict(zip(names, row))
+
+
+def factory_parquet_generator(path, columns=None, batch_size=DEFAULT_BATCH_SIZE):
+    def parquet_generator():
+        parquet_file = pyarrow.parquet.ParquetFile(path)
+        names = select_columns(parquet_file.schema_arrow.names, columns)
+        logger.debug("Read columns {} of {}".format(names, path))
+        for batch in parquet_file.iter_batches(batch_size=batch_size,
+                                               columns=names):
+            yield from iter_batch_rows(batch, names)
+    return parquet_generator
+
+
+def open_arrow_reader(source):
+    """ Reader of the arrow IPC file format, or else the stream format """
+    try:
+        reader = pyarrow.ipc.open_file(source)
+        return (reader.get_batch(i) for i in range(reader.num_record_batches))
+    except pyarrow.ArrowInvalid:
+        source.seek(0)
+        return pyarrow.ipc.open_stream(source)
+
+
+def factory_arrow_generator(path, columns=None):
+    def arrow_generator():
+        with pyarrow.memory_map(path, "r") as source:
+            names = None
+            for batch in open_arrow_reader(source):
+                if names is None:
+                    names = select_columns(batch.schema.names, columns)
+                    logger.debug("Read columns {} of {}".format(names, path))
+                yield from iter_batch_rows(batch, names)
+    return arrow_generator
+
+
+def get_file_path(config, variable_binds):
+    working_directory = variable_binds.get('working_directory', '.')
+    return os.path.join(working_directory, config.get('file'))
+
+
+def get_batch_size(config):
+    batch_size = int(config.get('batch_size', DEFAULT_BATCH_SIZE))
+    if batch_size <= 0:
+        raise ValueError("batch_size must be > 0")
+    return batch_size
+
+
+def check_pyarrow(gen_type):
+    if pyarrow is None:
+        raise ImportError("{} generator needs pyarrow, pip install pyarrow".format(gen_type))
+
+
+def parse_ndjson_generator(config, variable_binds):
+    """ Parses configuration options for a ndjson generator, one json object per line """
+    return factory_ndjson_generator(get_file_path(config, variable_binds),
+                                    get_columns(config, variable_binds),
+                                    get_batch_size(config))()
+
+
+def parse_parquet_generator(config, variable_binds):
+    """ Parses configuration options for a parquet generator """
+    check_pyarrow('parquet')
+    return factory_parquet_generator(get_file_path(config, variable_binds),
+                                     get_columns(config, variable_binds),
+                                     get_batch_size(config))()
+
+
+def parse_arrow_generator(config, variable_binds):
+    """ Parses configuration options for an arrow IPC file or stream generator """
+    check_pyarrow('arrow')
+    return factory_arrow_generator(get_file_path(config, variable_binds),
+                                   get_columns(config, variable_binds))()
+
+
+GENERATORS = {
+    'ndjson': parse_ndjson_generator,
+    'parquet': parse_parquet_generator,
+    'arrow': parse_arrow_generator
+}
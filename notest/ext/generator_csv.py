@@ -1,14 +1,13 @@
 
 import os
 import logging
-import json
-import csv
 
-logger = logging.Logger("csv_generator")
+logger = logging.getLogger("notest.csv_generator")
 
-from notest.lib.mysql_lib import MysqlClient
 from notest.lib.utils import templated_var
-from notest import generators
+from notest.lib.parsing import safe_to_bool
+from notest.lib.csv_index import get_csv_index, get_row_range, parse_shard, \
+    DEFAULT_ENCODING
 
 
 '''
@@ -17,25 +16,45 @@ from notest import generators
         - task_name:
             type: 'csv'
             file: 'test.csv'
-            return_dict: false
+            shard: '$NOTEST_SHARD'  # i/N, the i-th of N parts of the rows, i from 1
+            start_row: 0  # first data row, after the header
+            limit: 1000  # max rows from start_row
+            save_index: true  # keep the row offset index in test.csv.idx
+            encoding: 'utf-8-sig'
 '''
 
 
-def factory_csv_generator(csv_path):
+def factory_csv_generator(csv_path, start_row=0, limit=None, shard=None,
+                          save_index=False, encoding=DEFAULT_ENCODING):
     def csv_generator():
-        with open(csv_path, "r") as fd:
-            reader = csv.DictReader(fd)
-            for line in reader:
-                yield line
+        index = get_csv_index(csv_path, encoding=encoding,
+                              save_index=save_index)
+        start, stop = get_row_range(len(index), start_row, limit, shard)
+        logger.debug("Read rows {} to {} of {}".format(start, stop, csv_path))
+        for line in index.iter_rows(start, stop):
+            yield line
     return csv_generator
 
 
 def parse_csv_generator(config, variable_binds):
-    """ Parses configuration options for a mysql_query generator """
+    """ Parses configuration options for a csv generator
+        shard, start_row and limit may use environment variables, to split the rows between machines """
     csv_file = config.get('file')
     working_directory = variable_binds.get('working_directory', '.')
     csv_path = os.path.join(working_directory, csv_file)
-    return factory_csv_generator(csv_path)()
+
+    options = {**os.environ, **variable_binds}
+    shard = config.get('shard')
+    if shard is not None:
+        shard = parse_shard(templated_var(str(shard), options))
+    start_row = int(templated_var(str(config.get('start_row', 0)), options))
+    limit = config.get('limit')
+    if limit is not None:
+        limit = int(templated_var(str(limit), options))
+    save_index = safe_to_bool(config.get('save_index', False))
+    encoding = config.get('encoding', DEFAULT_ENCODING)
+    return factory_csv_generator(csv_path, start_row, limit, shard,
+                                 save_index, encoding)()
 
 
 GENERATORS = {'csv': parse_csv_generator}
@@ -1,13 +1,12 @@
 
 import sys
 import logging
-import json
 
 logger = logging.Logger("mysql_generator")
 
-from notest.lib.mysql_lib import MysqlClient
+from notest.lib.mysql_lib import pooled_client, MysqlClient, load_mysql_config
 from notest.lib.utils import templated_var
-from notest import generators
+from notest.lib.parsing import safe_to_bool
 
 
 '''
@@ -17,8 +16,76 @@ from notest import generators
             type: 'mysql'
             query: 'select name from sites'
             config: '$mysql_config'
+        - site:  # rows read lazily, batch_size at a time, on a connection of its own
+            type: 'mysql'
+            query: 'select name, url from sites'
+            config: '$mysql_config'
+            return_dict_list: true
+            stream: true
+            batch_size: 1000
+            loop: requery  # cache, requery or false, default cache, or false with stream
 '''
 
+LOOP_CACHE = 'cache'  # Query once, cycle over the cached rows
+LOOP_REQUERY = 'requery'  # Run the query again after the last row
+LOOP_NONE = 'false'  # Stop after the last row
+LOOP_MODES = (LOOP_CACHE, LOOP_REQUERY, LOOP_NONE)
+DEFAULT_BATCH_SIZE = 1000
+
+
+def to_value(row, return_dict_list):
+    if return_dict_list is False and isinstance(row, tuple):
+        return row[0]
+    return row
+
+
+def factory_cached_generator(rows):
+    """ Cycle over the rows, without copying them like factory_fixed_sequence """
+    def cached_generator():
+        while True:
+            for row in rows:
+                yield row
+    return cached_generator
+
+
+def factory_query_generator(mysql_config, sql, return_dict_list, loop):
+    """ Query again for each pass over the rows, the pooled connection is only held by the query """
+    def query_generator():
+        while True:
+            with pooled_client(mysql_config) as cli:
+                rows = cli.query(sql, return_dict_list=return_dict_list)
+            if len(rows) == 0:
+                raise ValueError("No data queried in MySQL by '{}'!".format(sql))
+            for row in rows:
+                yield to_value(row, return_dict_list)
+            if loop != LOOP_REQUERY:
+                return
+    return query_generator
+
+
+def factory_stream_generator(mysql_config, sql, return_dict_list, loop,
+                             batch_size=DEFAULT_BATCH_SIZE):
+    """ Rows streamed batch_size at a time. An unbuffered result blocks its connection
+        until all rows are read, so the stream opens its own connection outside the pool
+        and closes it when iteration ends or the generator is closed """
+    def stream_generator():
+        cli = MysqlClient(load_mysql_config(mysql_config))
+        try:
+            while True:
+                count = 0
+                for row in cli.iter_query(sql, batch_size,
+                                          return_dict_list=return_dict_list):
+                    count += 1
+                    yield to_value(row, return_dict_list)
+                if count == 0:
+                    raise ValueError("No data queried in MySQL by '{}'!".format(sql))
+                if loop != LOOP_REQUERY:
+                    return
+        finally:
+            if cli.connection is not None:
+                cli.close()
+    return stream_generator
+
 
 def parse_mysql_query_generator(config, variable_binds):
     """ Parses configuration options for a mysql_query generator """
@@ -26,26 +93,33 @@ def parse_mysql_query_generator(config, variable_binds):
     sql = config.get('query')
     return_dict_list = config.get('return_dict_list', False)
     mysql_config = templated_var(mysql_config, variable_binds)
-    if isinstance(mysql_config, str):
-        mysql_config = json.loads(mysql_config)
     sql = templated_var(sql)
     if isinstance(return_dict_list, str):
         return_dict_list = True if return_dict_list.lower() == 'true' else False
+    stream = safe_to_bool(config.get('stream', False))
+    batch_size = int(config.get('batch_size', DEFAULT_BATCH_SIZE))
+    if batch_size <= 0:
+        raise ValueError("batch_size of mysql generator must be > 0")
+    loop = str(config.get('loop', LOOP_NONE if stream else LOOP_CACHE)).lower()
+    if loop not in LOOP_MODES:
+        raise ValueError("loop of mysql generator must be one of {}".format(
+            ", ".join(LOOP_MODES)))
+    if stream and loop == LOOP_CACHE:
+        raise ValueError("mysql generator can not cache the rows of a stream, use loop: requery")
+
+    if stream:
+        return factory_stream_generator(mysql_config, sql, return_dict_list,
+                                        loop, batch_size=batch_size)()
+    if loop != LOOP_CACHE:
+        return factory_query_generator(mysql_config, sql, return_dict_list,
+                                       loop)()
     try:
-        with MysqlClient(mysql_config) as cli:
-            r = None
-            if return_dict_list is False:
-                res = cli.query(sql)
-                r = list()
-                for i in res:
-                    if isinstance(i, tuple):
-                        i = i[0]
-                    r.append(i)
-            else:
-                r = cli.query(sql, return_dict_list=return_dict_list)
+        with pooled_client(mysql_config) as cli:
+            r = [to_value(row, return_dict_list)
+                 for row in cli.query(sql, return_dict_list=return_dict_list)]
             if len(r) == 0:
                 raise Exception("No data queried in MySQL by '{}'!".format(sql))
-            return generators.factory_fixed_sequence(r)()
+            return factory_cached_generator(r)()
     except Exception as e:
         logger.error(str(e))
         raise ValueError("Invalid query: " + sql + " : " + str(e))
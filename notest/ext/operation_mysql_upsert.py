@@ -1,26 +1,139 @@
-import json
+import os
+import csv
+import time
+import logging
 
 from notest.lib.utils import templated_var
-from notest.lib.mysql_lib import MysqlClient
+from notest.lib.mysql_lib import pooled_client
+from notest.context import GENERATOR_LOCK
+
+logger = logging.getLogger('notest.mysql_upsert')
 
 '''
 - operation:
     - type: "mysql_upsert"
     - config: '{"user": "root", "password": "password", "host": "192.168.99.101", "database": "test"}'
     - sql: 'insert into sites(name, url) values("a", "a.com")'
+
+- operation:
+    - type: "mysql_bulk_upsert"
+    - config: '$mysql_config'
+    - sql: 'insert into sites(name, url) values(%s, %s) on duplicate key update url=values(url)'
+    - rows: [["a", "a.com"], ["b", "$b_url"]]  # or one of:
+    # - generator: 'site'  # testset generator yielding lists or dicts
+    # - count: 100  # required with generator, rows taken from it
+    # - csv: 'sites.csv'  # header row, rows are dicts for %(name)s, or tuples of columns
+    # - columns: [name, url]
+    - batch_size: 1000
 '''
 
+DEFAULT_BATCH_SIZE = 1000
+
 
 def mysql_upsert(config, context=None):
-    print("Run mysql_upsert")
+    logger.info("Run mysql_upsert")
     assert isinstance(config, dict)
     assert "config" in config
     assert "sql" in config
     sql = templated_var(config['sql'], context)
     mysql_config = templated_var(config['config'], context)
-    mysql_config = json.loads(mysql_config)
-    with MysqlClient(mysql_config) as cli:
+    with pooled_client(mysql_config) as cli:
         cli.execute(sql)
 
 
-OPERATIONS = {'mysql_upsert': mysql_upsert}
+def to_params(row):
+    """ executemany parameters of a row, dicts for %(name)s and tuples for %s """
+    if isinstance(row, dict):
+        return row
+    if isinstance(row, (list, tuple)):
+        return tuple(row)
+    return (row,)
+
+
+def iter_inline_rows(rows, context):
+    for row in rows:
+        if isinstance(row, (list, tuple)):
+            yield tuple(templated_var(v, context) for v in row)
+        else:
+            yield to_params(templated_var(row, context))
+
+
+def iter_generator_rows(generator, count):
+    """ count rows of a testset generator, most generators never end.
+        Each next() holds GENERATOR_LOCK, as concurrent tests may share the generator """
+    for _ in range(count):
+        with GENERATOR_LOCK:
+            try:
+                row = next(generator)
+            except StopIteration:
+                return
+        yield to_params(row)
+
+
+def iter_csv_rows(path, columns=None):
+    """ Rows of a csv file with a header row, read lazily """
+    with open(path, "r", newline='') as fd:
+        for row in csv.DictReader(fd):
+            if columns:
+                yield tuple(row[c] for c in columns)
+            else:
+                yield row
+
+
+def get_bulk_rows(config, context=None):
+    sources = [k for k in ('rows', 'generator', 'csv') if k in config]
+    if len(sources) != 1:
+        raise ValueError("mysql_bulk_upsert needs one of rows, generator or csv")
+    if 'rows' in config:
+        rows = config['rows']
+        if not isinstance(rows, list):
+            raise ValueError("rows of mysql_bulk_upsert must be a list")
+        return iter_inline_rows(rows, context)
+    if 'generator' in config:
+        if config.get('count') is None:
+            raise ValueError("generator of mysql_bulk_upsert needs count, generators may never end")
+        count = int(templated_var(str(config['count']), context))
+        if count < 0:
+            raise ValueError("count of mysql_bulk_upsert must be >= 0")
+        name = templated_var(config['generator'], context)
+        generator = context.get_generator(name) if context is not None else None
+        if generator is None:  # Checked before a connection is taken from the pool
+            raise ValueError("No generator named {} for mysql_bulk_upsert".format(name))
+        return iter_generator_rows(generator, count)
+    path = templated_var(config['csv'], context)
+    if not os.path.isabs(path):
+        path = os.path.join(config.get('working_directory') or '.', path)
+    return iter_csv_rows(path, config.get('columns'))
+
+
+def mysql_bulk_upsert(config, context=None):
+    """ Run a parameterized statement over many rows, executemany in batches
+        inside one transaction. Returns the counters of the run """
+    assert isinstance(config, dict)
+    assert "config" in config
+    assert "sql" in config
+    sql = templated_var(config['sql'], context)
+    mysql_config = templated_var(config['config'], context)
+    batch_size = int(config.get('batch_size', DEFAULT_BATCH_SIZE))
+    if batch_size <= 0:
+        raise ValueError("batch_size of mysql_bulk_upsert must be > 0")
+    rows = get_bulk_rows(config, context)
+
+    start = time.perf_counter()
+    with pooled_client(mysql_config) as cli:
+        row_count, affected, batches = cli.execute_many(sql, rows, batch_size)
+    elapsed = time.perf_counter() - start
+    logger.info("mysql_bulk_upsert: {} rows in {} batches, {} rows affected, {:.3f}s".format(
+        row_count, batches, affected, elapsed))
+    return {
+        "rows": row_count,
+        "rows_affected": affected,
+        "batches": batches,
+        "elapsed": elapsed
+    }
+
+
+OPERATIONS = {
+    'mysql_upsert': mysql_upsert,
+    'mysql_bulk_upsert': mysql_bulk_upsert
+}
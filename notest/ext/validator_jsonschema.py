@@ -1,38 +1,82 @@
+import os
 import traceback
 import json
-import yaml
+from functools import lru_cache
+
 import jsonschema
 
 from notest import validators
 from notest.lib import parsing
+from notest.lib.utils import parse_json_body, templated_string
+from notest.lib.file_cache import yaml_load
 from notest import contenthandling
 
+SCHEMA_CACHE_SIZE = 128  # Max compiled schemas kept
+
+
+@lru_cache(maxsize=SCHEMA_CACHE_SIZE)
+def compile_schema(schema_text):
+    """ Load and check a schema once, keyed by its content
+        Returns a validator object of the draft declared by the schema """
+    schema = yaml_load(schema_text)
+    validator_class = jsonschema.validators.validator_for(schema)
+    validator_class.check_schema(schema)
+    return validator_class(schema)
+
+
+@lru_cache(maxsize=SCHEMA_CACHE_SIZE)
+def compile_schema_version(path, mtime_ns, size):
+    """ Schema file read and compiled once per version on disk """
+    with open(path, 'r') as f:
+        return compile_schema(f.read())
+
+
+def compile_schema_file(path):
+    """ Compiled schema of a file, a file changed on disk is read again """
+    stat = os.stat(path)
+    return compile_schema_version(path, stat.st_mtime_ns, stat.st_size)
+
 
 class JsonSchemaValidator(validators.AbstractValidator):
     """ Json schema validator using the jsonschema library """
     schema = None
 
-    def validate(self, body=None, headers=None, context=None):
-        schema_text = self.schema.get_content(context=context)
-        schema = yaml.safe_load(schema_text)
-        # TODO add caching of parsed schema
+    def get_schema_validator(self, context=None):
+        """ Compiled validator of the schema, only recompiled when the templated
+            path or the templated content changes """
+        handler = self.schema
+        if handler.is_file and not handler.is_template_content:
+            path = handler.content
+            if handler.is_template_path and context:
+                path = templated_string(path, context)
+            return compile_schema_file(path)
+        return compile_schema(handler.get_content(context=context))
 
+    def validate(self, body=None, headers=None, context=None):
         try:
-            # TODO try draft3/draft4 iter_errors -
-            # https://python-jsonschema.readthedocs.org/en/latest/validate/#jsonschema.IValidator.iter_errors
-            parsed_body = body
-            if isinstance(body, bytes):
-                parsed_body = body.decode()
-            jsonschema.validate(json.loads(parsed_body), schema)
-            return True
-        except jsonschema.exceptions.ValidationError as ve:
+            schema_validator = self.get_schema_validator(context=context)
+        except jsonschema.exceptions.SchemaError:
             trace = traceback.format_exc()
             return validators.Failure(
-                message="JSON Schema Validation Failed", 
+                message="Invalid JSON Schema",
                 details=trace,
                 validator=self,
                 failure_type=validators.FAILURE_VALIDATOR_EXCEPTION)
 
+        # All errors are reported in one pass
+        errors = list(schema_validator.iter_errors(parse_json_body(body)))
+        if not errors:
+            return True
+        details = list()
+        for error in errors:
+            path = "/".join(str(p) for p in error.absolute_path) or "<root>"
+            details.append("{}: {}".format(path, error.message))
+        return validators.Failure(
+            message="JSON Schema Validation Failed, {} errors".format(len(errors)),
+            details="\n".join(details),
+            validator=self,
+            failure_type=validators.FAILURE_VALIDATOR_EXCEPTION)
+
     def get_readable_config(self, context=None):
         return "JSON schema validation"
 
@@ -0,0 +1,263 @@
+import hashlib
+import re
+
+from notest import validators
+from notest.lib import parsing
+from notest.lib.utils import templated_var, json_loads
+
+'''
+Validators consuming the response body chunk by chunk, for tests with stream: true
+They also work on normal tests, the whole body is then one chunk
+- test:
+    url: "/export"
+    stream: true
+    validators:
+        - byte_count: {min: 1024}
+        - hash: {algorithm: sha256, expected: '$export_sha256'}
+        - regex: 'total: \\d+'
+        - ndjson: {min_lines: 1, required_keys: [id, name]}
+'''
+
+DEFAULT_REGEX_OVERLAP = 64 * 1024  # Bytes kept between chunks, longest match across two chunks
+MAX_REPORTED_ERRORS = 10
+
+
+def stream_failure(validator, message, details=None):
+    return validators.Failure(
+        message=message, details=details, validator=validator,
+        failure_type=validators.FAILURE_VALIDATOR_FAILED)
+
+
+class ByteCountValidator(validators.AbstractStreamValidator):
+    """ Check the body size, byte_count: 100 or byte_count: {min: 1, max: 100} """
+    name = 'ByteCountValidator'
+    expected = None
+    min_count = None
+    max_count = None
+
+    def start(self, context=None):
+        return [0]
+
+    def feed(self, state, chunk):
+        state[0] += len(chunk)
+
+    def finish(self, state, context=None):
+        count = state[0]
+        if self.expected is not None and count != self.expected:
+            return stream_failure(self, "Body has {} bytes, expected {}".format(
+                count, self.expected))
+        if self.min_count is not None and count < self.min_count:
+            return stream_failure(self, "Body has {} bytes, less than min {}".format(
+                count, self.min_count))
+        if self.max_count is not None and count > self.max_count:
+            return stream_failure(self, "Body has {} bytes, more than max {}".format(
+                count, self.max_count))
+        return True
+
+    def get_readable_config(self, context=None):
+        return "Byte count: expected {}, min {}, max {}".format(
+            self.expected, self.min_count, self.max_count)
+
+    @classmethod
+    def parse(cls, config):
+        output = ByteCountValidator()
+        if isinstance(config, (int, str)):
+            output.expected = int(config)
+            return output
+        config = parsing.lowercase_keys(parsing.flatten_dictionaries(config))
+        for key, value in config.items():
+            if key in ('eq', 'expected'):
+                output.expected = int(value)
+            elif key == 'min':
+                output.min_count = int(value)
+            elif key == 'max':
+                output.max_count = int(value)
+            else:
+                raise ValueError("Unknown byte_count option: {}".format(key))
+        return output
+
+
+class HashValidator(validators.AbstractStreamValidator):
+    """ Compare the hex digest of the body, hash: {algorithm: sha256, expected: ...} """
+    name = 'HashValidator'
+    algorithm = 'sha256'
+    expected = None
+
+    def start(self, context=None):
+        return hashlib.new(self.algorithm)
+
+    def feed(self, state, chunk):
+        state.update(chunk)
+
+    def finish(self, state, context=None):
+        expected = str(templated_var(self.expected, context)).strip().lower()
+        digest = state.hexdigest()
+        if digest != expected:
+            return stream_failure(self, "Body {} is {}, expected {}".format(
+                self.algorithm, digest, expected))
+        return True
+
+    def get_readable_config(self, context=None):
+        return "Hash: {} {}".format(self.algorithm, self.expected)
+
+    @classmethod
+    def parse(cls, config):
+        output = HashValidator()
+        config = parsing.lowercase_keys(parsing.flatten_dictionaries(config))
+        if 'expected' not in config:
+            raise ValueError("hash validator needs an expected digest")
+        output.expected = config['expected']
+        algorithm = str(config.get('algorithm', output.algorithm)).lower()
+        if algorithm not in hashlib.algorithms_available:
+            raise ValueError("Unknown hash algorithm: {}".format(algorithm))
+        output.algorithm = algorithm
+        return output
+
+
+class RegexStreamValidator(validators.AbstractStreamValidator):
+    """ Search a pattern in the body, regex: 'pattern' or regex: {pattern: ..., overlap: 65536}
+        The last overlap bytes of each chunk are searched again with the next one """
+    name = 'RegexStreamValidator'
+    pattern = None
+    overlap = DEFAULT_REGEX_OVERLAP
+
+    def start(self, context=None):
+        pattern = templated_var(self.pattern, context)
+        if isinstance(pattern, str):
+            pattern = pattern.encode('utf-8')
+        try:
+            regex = validators.compile_regex(pattern)
+        except re.error as e:  # A templated pattern, static ones are checked by parse
+            return {'error': e, 'matched': False}
+        return {'regex': regex, 'tail': b'', 'matched': False, 'error': None}
+
+    def feed(self, state, chunk):
+        if state['matched'] or state['error'] is not None:
+            return
+        data = state['tail'] + chunk
+        if state['regex'].search(data):
+            state['matched'] = True
+            state['tail'] = b''
+        else:
+            state['tail'] = data[-self.overlap:]
+
+    def finish(self, state, context=None):
+        if state['error'] is not None:
+            return stream_failure(self, "Invalid pattern {}: {}".format(
+                templated_var(self.pattern, context), state['error']))
+        if not state['matched']:
+            return stream_failure(self, "Pattern {} not found in body".format(
+                templated_var(self.pattern, context)))
+        return True
+
+    def get_readable_config(self, context=None):
+        return "Regex: {}".format(self.pattern)
+
+    @classmethod
+    def parse(cls, config):
+        output = RegexStreamValidator()
+        if isinstance(config, dict):
+            config = parsing.lowercase_keys(config)
+            output.pattern = config.get('pattern')
+            if 'overlap' in config:
+                output.overlap = int(config['overlap'])
+        else:
+            output.pattern = config
+        if not isinstance(output.pattern, str):
+            raise ValueError("regex validator needs a pattern string")
+        if "$" not in output.pattern:
+            validators.compile_regex(output.pattern.encode('utf-8'))
+        return output
+
+
+class NdjsonValidator(validators.AbstractStreamValidator):
+    """ Check every line of a newline delimited json body
+        ndjson: {min_lines: 1, max_lines: 1000, required_keys: [id]} """
+    name = 'NdjsonValidator'
+    min_lines = None
+    max_lines = None
+    required_keys = None
+
+    def start(self, context=None):
+        return {'partial': b'', 'lines': 0, 'errors': list(), 'error_count': 0}
+
+    @staticmethod
+    def add_error(state, error):
+        """ Count every error, keep only the first ones for the report """
+        state['error_count'] += 1
+        if len(state['errors']) < MAX_REPORTED_ERRORS:
+            state['errors'].append(error)
+
+    def check_line(self, state, line):
+        line = line.strip()
+        if not line:
+            return
+        state['lines'] += 1
+        try:
+            item = json_loads(line)
+        except ValueError as e:
+            self.add_error(state, "line {}: invalid json, {}".format(
+                state['lines'], e))
+            return
+        if self.required_keys:
+            if not isinstance(item, dict):
+                self.add_error(state, "line {}: not a json object".format(
+                    state['lines']))
+                return
+            missing = [k for k in self.required_keys if k not in item]
+            if missing:
+                self.add_error(state, "line {}: missing keys {}".format(
+                    state['lines'], missing))
+
+    def feed(self, state, chunk):
+        lines = (state['partial'] + chunk).split(b'\n')
+        state['partial'] = lines.pop()
+        for line in lines:
+            self.check_line(state, line)
+
+    def finish(self, state, context=None):
+        self.check_line(state, state['partial'])
+        state['partial'] = b''
+        count = state['lines']
+        if self.min_lines is not None and count < self.min_lines:
+            self.add_error(state, "{} lines, less than min {}".format(
+                count, self.min_lines))
+        if self.max_lines is not None and count > self.max_lines:
+            self.add_error(state, "{} lines, more than max {}".format(
+                count, self.max_lines))
+        if state['error_count']:
+            return stream_failure(
+                self, "NDJSON body has {} errors".format(state['error_count']),
+                details="\n".join(state['errors']))
+        return True
+
+    def get_readable_config(self, context=None):
+        return "NDJSON: min_lines {}, max_lines {}, required_keys {}".format(
+            self.min_lines, self.max_lines, self.required_keys)
+
+    @classmethod
+    def parse(cls, config):
+        output = NdjsonValidator()
+        if not config:
+            return output
+        config = parsing.lowercase_keys(parsing.flatten_dictionaries(config))
+        for key, value in config.items():
+            if key == 'min_lines':
+                output.min_lines = int(value)
+            elif key == 'max_lines':
+                output.max_lines = int(value)
+            elif key == 'required_keys':
+                if isinstance(value, str):
+                    value = [value]
+                output.required_keys = [str(k) for k in value]
+            else:
+                raise ValueError("Unknown ndjson option: {}".format(key))
+        return output
+
+
+VALIDATORS = {
+    'byte_count': ByteCountValidator.parse,
+    'hash': HashValidator.parse,
+    'regex': RegexStreamValidator.parse,
+    'ndjson': NdjsonValidator.parse
+}
@@ -0,0 +1,232 @@
+import time
+import math
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from notest.context import Context
+from notest.validators import Failure, FAILURE_BENCHMARK_FAILED
+from notest.test_result import BenchmarkResult
+from notest.lib.parsing import lowercase_keys, flatten_dictionaries
+from notest.http_test_runner.http_test_exec import run_http_test, run_http_test_async
+
+"""
+Benchmark execution for http tests:
+- Parse the benchmark block of a test
+- Run the realized test repeatedly, with warmup and concurrency
+- With the async client, all runs are coroutines of one event loop sharing its session
+- Compute latency percentiles, throughput and error rate
+"""
+
+logger = logging.getLogger('notest.http_benchmark')
+
+PERCENTILES = (50, 90, 99)
+
+
+class BenchmarkConfig:
+    """ Benchmark options of a test
+        - test:
+            url: "/tasks"
+            benchmark:
+                warmup_runs: 5
+                benchmark_runs: 100
+                concurrency: 4
+                duration: 10  # seconds, stop earlier when reached
+                max_error_rate: 0
+    """
+    warmup_runs = 0
+    benchmark_runs = 100
+    concurrency = 1
+    duration = None
+    max_error_rate = 0.0
+
+    @classmethod
+    def parse(cls, node):
+        config = BenchmarkConfig()
+        node = lowercase_keys(flatten_dictionaries(node))
+        if not isinstance(node, dict):
+            raise TypeError("benchmark must be a dictionary of options")
+        for key, value in node.items():
+            if key == 'warmup_runs':
+                config.warmup_runs = int(value)
+            elif key == 'benchmark_runs':
+                config.benchmark_runs = int(value)
+            elif key == 'concurrency':
+                config.concurrency = max(1, int(value))
+            elif key == 'duration':
+                config.duration = float(value)
+            elif key == 'max_error_rate':
+                config.max_error_rate = float(value)
+            else:
+                raise ValueError("Unknown benchmark option: {}".format(key))
+        if config.benchmark_runs <= 0 and not config.duration:
+            raise ValueError("benchmark needs benchmark_runs or duration")
+        return config
+
+
+def percentile(sorted_values, percent):
+    """ Nearest-rank percentile of an already sorted list """
+    if not sorted_values:
+        return None
+    rank = int(math.ceil(percent / 100.0 * len(sorted_values)))
+    return sorted_values[max(rank, 1) - 1]
+
+
+class BenchmarkRuns:
+    """ Runs left and latencies measured, shared by the workers of a benchmark """
+
+    def __init__(self, benchmark):
+        self.benchmark = benchmark
+        self.latencies = list()
+        self.errors = 0
+        self.lock = threading.Lock()
+        self.remaining = benchmark.benchmark_runs
+        self.deadline = None
+        self.start = None
+        self.elapsed = None
+
+    def begin(self):
+        self.start = time.perf_counter()
+        if self.benchmark.duration:
+            self.deadline = self.start + self.benchmark.duration
+
+    def end(self):
+        self.elapsed = time.perf_counter() - self.start
+
+    def next_run(self):
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            return False
+        with self.lock:
+            if self.benchmark.benchmark_runs > 0:
+                if self.remaining <= 0:
+                    return False
+                self.remaining -= 1
+            return True
+
+    def add(self, latency, passed):
+        with self.lock:
+            self.latencies.append(latency)
+            if not passed:
+                self.errors += 1
+
+
+def run_once(mytest, test_config, context, http_handler):
+    """ Run a realized copy of the test, return (latency, passed) """
+    test_run = mytest.ninja_copy()
+    start = time.perf_counter()
+    result = run_http_test(test_run, test_config, context,
+                           http_handler=http_handler)
+    return time.perf_counter() - start, bool(result.passed)
+
+
+async def run_once_async(mytest, test_config, context, http_handler):
+    test_run = mytest.ninja_copy()
+    start = time.perf_counter()
+    result = await run_http_test_async(test_run, test_config, context,
+                                       http_handler=http_handler)
+    return time.perf_counter() - start, bool(result.passed)
+
+
+def run_http_benchmark(mytest, test_config, context=None, http_handler=None):
+    """ Run the benchmark of a test and return a BenchmarkResult """
+    benchmark = mytest.benchmark
+    if context is None:
+        context = Context()
+    if test_config.request_client == "async":
+        # One loop for warmup and measured runs, so latencies do not include
+        # a new event loop and connection per run
+        from notest.clients.async_client import get_thread_loop
+        return get_thread_loop().run_until_complete(run_http_benchmark_async(
+            mytest, test_config, context, http_handler))
+
+    for i in range(benchmark.warmup_runs):
+        run_once(mytest, test_config, context, http_handler)
+
+    report_test = mytest.ninja_copy()
+    report_test.realize(context)
+
+    runs = BenchmarkRuns(benchmark)
+
+    def worker():
+        worker_context = context.fork()
+        while runs.next_run():
+            runs.add(*run_once(mytest, test_config, worker_context, http_handler))
+
+    runs.begin()
+    if benchmark.concurrency > 1:
+        with ThreadPoolExecutor(max_workers=benchmark.concurrency,
+                                thread_name_prefix="notest-benchmark") as executor:
+            futures = [executor.submit(worker)
+                       for i in range(benchmark.concurrency)]
+            for future in futures:
+                future.result()
+    else:
+        worker()
+    runs.end()
+
+    return build_benchmark_result(report_test, benchmark, runs.latencies,
+                                  runs.errors, runs.elapsed)
+
+
+async def run_http_benchmark_async(mytest, test_config, context, http_handler=None):
+    """ Benchmark with the async client, concurrency is the number of worker coroutines """
+    benchmark = mytest.benchmark
+    for i in range(benchmark.warmup_runs):
+        await run_once_async(mytest, test_config, context, http_handler)
+
+    report_test = mytest.ninja_copy()
+    report_test.realize(context)
+
+    runs = BenchmarkRuns(benchmark)
+
+    async def worker():
+        worker_context = context.fork()
+        while runs.next_run():
+            runs.add(*await run_once_async(mytest, test_config, worker_context,
+                                           http_handler))
+
+    runs.begin()
+    await asyncio.gather(*(worker() for i in range(benchmark.concurrency)))
+    runs.end()
+
+    return build_benchmark_result(report_test, benchmark, runs.latencies,
+                                  runs.errors, runs.elapsed)
+
+
+def build_benchmark_result(mytest, benchmark, latencies, error_count, elapsed):
+    """ mytest is the realized test, for url and method """
+    result = BenchmarkResult()
+    result.test_obj = mytest
+    latencies = sorted(latencies)
+    count = len(latencies)
+
+    result.add_key_field("url", mytest.url)
+    result.add_key_field("method", mytest.method)
+    result.add_key_field("benchmark_runs", count)
+    result.add_key_field("concurrency", benchmark.concurrency)
+    result.add_key_field("errors", error_count)
+    error_rate = float(error_count) / count if count else 0.0
+    result.add_key_field("error_rate", error_rate)
+    result.add_key_field("throughput",
+                         count / elapsed if elapsed > 0 else None)
+    result.add_key_field("elapsed", elapsed)
+    if count:
+        result.add_key_field("latency_min", latencies[0])
+        result.add_key_field("latency_mean", sum(latencies) / count)
+        for p in PERCENTILES:
+            result.add_key_field("latency_p{}".format(p),
+                                 percentile(latencies, p))
+        result.add_key_field("latency_max", latencies[-1])
+
+    result.passed = count > 0 and error_rate <= benchmark.max_error_rate
+    if not count:
+        result.failures.append(Failure(
+            message="No benchmark runs executed",
+            failure_type=FAILURE_BENCHMARK_FAILED))
+    elif not result.passed:
+        result.failures.append(Failure(
+            message="Benchmark error rate {:.4f} over max_error_rate {}".format(
+                error_rate, benchmark.max_error_rate),
+            failure_type=FAILURE_BENCHMARK_FAILED))
+    return result
@@ -0,0 +1,134 @@
+import time
+import random
+import logging
+
+from notest.validators import Failure, FAILURE_VALIDATOR_FAILED
+from notest.lib.parsing import lowercase_keys, flatten_dictionaries
+
+"""
+Polling of http tests with loop_until conditions:
+- Parse the loop_policy block of a test
+- Compute the delay before each poll, with backoff, jitter and max interval
+- Stop on max_polls or on the wall clock deadline, the test then fails
+"""
+
+logger = logging.getLogger('notest.http_loop')
+
+DEFAULT_LOOP_INTERVAL = 2  # seconds, when neither the test nor the testset sets it
+DEFAULT_MAX_POLLS = 100
+
+
+class LoopPolicy:
+    """ Polling options of a test with loop_until
+        - test:
+            url: "/delay_task"
+            loop_until:
+                - compare: {jsonpath_mini: "state", comparator: "str_eq", expected: 'ready'}
+            loop_policy:
+                interval: 0.2  # first delay, default loop_interval of the testset
+                backoff: 2  # delay multiplier after each poll
+                jitter: 0.1  # random +/- fraction of the delay
+                max_interval: 5
+                deadline: 60  # seconds since the first poll
+                max_polls: 100
+    """
+    interval = None
+    backoff = 1.0
+    jitter = 0.0
+    max_interval = None
+    deadline = None
+    max_polls = DEFAULT_MAX_POLLS
+
+    @classmethod
+    def parse(cls, node):
+        policy = LoopPolicy()
+        node = lowercase_keys(flatten_dictionaries(node))
+        if not isinstance(node, dict):
+            raise TypeError("loop_policy must be a dictionary of options")
+        for key, value in node.items():
+            if key == 'interval':
+                policy.interval = float(value)
+            elif key == 'backoff':
+                policy.backoff = float(value)
+            elif key == 'jitter':
+                policy.jitter = float(value)
+            elif key == 'max_interval':
+                policy.max_interval = float(value)
+            elif key == 'deadline':
+                policy.deadline = float(value)
+            elif key == 'max_polls':
+                policy.max_polls = int(value)
+            else:
+                raise ValueError("Unknown loop_policy option: {}".format(key))
+        if policy.backoff < 1:
+            raise ValueError("loop_policy backoff must be >= 1")
+        if not 0 <= policy.jitter <= 1:
+            raise ValueError("loop_policy jitter must be between 0 and 1")
+        if policy.max_polls <= 0:
+            raise ValueError("loop_policy max_polls must be > 0")
+        return policy
+
+
+def get_loop_interval(test):
+    """ Interval of the first poll, test loop_policy over testset loop_interval """
+    policy = test.loop_policy
+    if policy is not None and policy.interval is not None:
+        return policy.interval
+    interval = getattr(test.testset_config, "loop_interval", None)
+    if interval is not None:
+        return interval
+    return DEFAULT_LOOP_INTERVAL
+
+
+class LoopPoller:
+    """ Polling state of one test run, from its first run until loop_until is met """
+
+    def __init__(self, test):
+        self.policy = test.loop_policy or LoopPolicy()
+        self.next_interval = get_loop_interval(test)
+        self.start = time.perf_counter()
+        self.poll_count = 0
+        self.waited = 0.0
+
+    def get_delay(self):
+        """ Delay before the next poll, None if no poll is left """
+        policy = self.policy
+        if self.poll_count >= policy.max_polls:
+            return None
+        delay = self.next_interval
+        if policy.max_interval is not None:
+            delay = min(delay, policy.max_interval)
+        self.next_interval = delay * policy.backoff
+        if policy.jitter:
+            delay *= 1 + random.uniform(-policy.jitter, policy.jitter)
+        if policy.deadline is not None:
+            remaining = policy.deadline - (time.perf_counter() - self.start)
+            if remaining <= 0:
+                return None
+            delay = min(delay, remaining)
+        return max(delay, 0.0)
+
+    def poll(self, result):
+        """ Count the run of result, return the delay before the next poll
+            or None when polling is over. The last result gets the poll counters
+            and fails if the loop_until conditions were never met """
+        self.poll_count += 1
+        delay = None
+        if result.loop is True:
+            delay = self.get_delay()
+            if delay is None:
+                result.loop = False
+                result.passed = False
+                result.failures.append(Failure(
+                    message="loop_until not met after {} polls in {:.3f}s".format(
+                        self.poll_count, time.perf_counter() - self.start),
+                    failure_type=FAILURE_VALIDATOR_FAILED))
+            else:
+                self.waited += delay
+                logger.debug("Poll {} not ready, next in {:.3f}s".format(
+                    self.poll_count, delay))
+        if delay is None:
+            result.add_key_field("poll_count", self.poll_count)
+            result.add_key_field("poll_elapsed", time.perf_counter() - self.start)
+            result.add_key_field("poll_waited", self.waited)
+        return delay
@@ -0,0 +1,206 @@
+import re
+import sys
+import socket
+import random
+import asyncio
+import logging
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+"""
+Retries of http requests, configured in the testset config:
+- config:
+    retries: 3  # max retries of a request
+    retry_on: [connection, timeout, 5xx, 429]  # or status codes like 503
+    retry_backoff: 0.5  # first delay in seconds
+    retry_backoff_factor: 2
+    retry_max_delay: 30  # also caps Retry-After
+    retry_budget: 50  # max retries of all the tests of the testset run
+    retry_methods: [GET, HEAD, PUT, DELETE, OPTIONS]  # others may have side effects
+"""
+
+logger = logging.getLogger('notest.http_retry')
+
+RETRY_ON_CONNECTION = 'connection'
+RETRY_ON_TIMEOUT = 'timeout'
+RETRY_ON_5XX = '5xx'
+RETRY_ON_429 = '429'
+RETRY_CONDITIONS = (RETRY_ON_CONNECTION, RETRY_ON_TIMEOUT, RETRY_ON_5XX,
+                    RETRY_ON_429)
+
+DEFAULT_RETRY_BACKOFF = 0.5
+DEFAULT_RETRY_BACKOFF_FACTOR = 2.0
+DEFAULT_RETRY_MAX_DELAY = 30.0
+# Idempotent methods, a POST which timed out may have been processed already
+DEFAULT_RETRY_METHODS = frozenset(('GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS'))
+
+# libcurl error codes, pycurl.error args[0]
+CURL_TIMEOUT_CODES = (28,)
+CURL_CONNECTION_CODES = (5, 6, 7, 35, 52, 55, 56)
+
+RETRY_AFTER_REGEX = re.compile(rb'^retry-after:[ \t]*(.+?)\s*$', re.I | re.M)
+
+
+def parse_retry_on(value):
+    """ List or comma separated conditions, status codes are ints """
+    if isinstance(value, str):
+        value = value.split(',')
+    if not isinstance(value, (list, tuple)):
+        value = [value]
+    conditions = set()
+    for item in value:
+        item = str(item).strip().lower()
+        if item in RETRY_CONDITIONS:
+            conditions.add(item)
+        elif item.isdigit():
+            conditions.add(int(item))
+        else:
+            raise ValueError("Unknown retry_on condition: {}, must be one of {} or a status code".format(
+                item, ", ".join(RETRY_CONDITIONS)))
+    return frozenset(conditions)
+
+
+class RetryBudget:
+    """ Retries left for all the tests sharing a testset config, thread safe """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            if self.used >= self.limit:
+                return False
+            self.used += 1
+            return True
+
+
+def get_exception_types():
+    """ (timeout, connection) exception types of the clients, a client module
+        not imported yet has sent no request and raised none of its errors """
+    timeout_types = [socket.timeout, TimeoutError, asyncio.TimeoutError]
+    connection_types = [ConnectionError]
+    requests_exceptions = sys.modules.get('requests.exceptions')
+    if requests_exceptions is not None:
+        timeout_types.append(requests_exceptions.Timeout)
+        connection_types.append(requests_exceptions.ConnectionError)
+    aiohttp = sys.modules.get('aiohttp')
+    if aiohttp is not None:
+        timeout_types.append(aiohttp.ServerTimeoutError)
+        connection_types.append(aiohttp.ClientConnectionError)
+    return tuple(timeout_types), tuple(connection_types)
+
+
+def get_exception_condition(error):
+    """ timeout, connection or None for the exceptions of all clients """
+    pycurl = sys.modules.get('pycurl')
+    if pycurl is not None and isinstance(error, pycurl.error):
+        code = error.args[0] if error.args else None
+        if code in CURL_TIMEOUT_CODES:
+            return RETRY_ON_TIMEOUT
+        if code in CURL_CONNECTION_CODES:
+            return RETRY_ON_CONNECTION
+        return None
+    timeout_types, connection_types = get_exception_types()
+    if isinstance(error, timeout_types):
+        return RETRY_ON_TIMEOUT
+    if isinstance(error, connection_types):
+        return RETRY_ON_CONNECTION
+    return None
+
+
+def parse_retry_methods(value):
+    """ List or comma separated http methods """
+    if isinstance(value, str):
+        value = value.split(',')
+    if not isinstance(value, (list, tuple)):
+        raise ValueError("retry_methods must be a list of http methods")
+    return frozenset(str(m).strip().upper() for m in value if str(m).strip())
+
+
+def get_status_condition(status_code):
+    if status_code == 429:
+        return RETRY_ON_429
+    if status_code is not None and 500 <= status_code < 600:
+        return RETRY_ON_5XX
+    return None
+
+
+def get_retry_after(headers):
+    """ Seconds of a Retry-After header, delay or http date, None if missing """
+    value = None
+    if isinstance(headers, bytes):
+        match = RETRY_AFTER_REGEX.search(headers)
+        if match:
+            value = match.group(1).decode('latin-1')
+    elif isinstance(headers, dict):
+        headers = headers.items()
+    if headers and not isinstance(headers, bytes):
+        for k, v in headers:
+            if k.lower() == 'retry-after':
+                value = v
+    if value is None:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+class RetryState:
+    """ Retries of one test run, attempts is the number of requests sent
+        Requests of methods not in retry_methods are never retried """
+
+    def __init__(self, test_config, method='GET'):
+        self.config = test_config
+        self.attempts = 0
+        self.waited = 0.0
+        conditions = test_config.retry_on
+        if conditions is None:
+            conditions = frozenset(RETRY_CONDITIONS)
+        self.conditions = conditions
+        methods = test_config.retry_methods
+        if methods is None:
+            methods = DEFAULT_RETRY_METHODS
+        self.enabled = str(method).upper() in methods
+
+    def should_retry(self, condition):
+        return condition is not None and condition in self.conditions
+
+    def get_delay(self, error=None, http_response=None):
+        """ Delay before the next attempt after a failed one,
+            None if it must not be retried """
+        config = self.config
+        if not self.enabled or self.attempts > config.retries:
+            return None
+        retry_after = None
+        if error is not None:
+            if not self.should_retry(get_exception_condition(error)):
+                return None
+        else:
+            status_code = http_response.status_code
+            if not (self.should_retry(get_status_condition(status_code))
+                    or self.should_retry(status_code)):
+                return None
+            if status_code in (429, 503):
+                retry_after = get_retry_after(http_response.headers)
+        if config.retry_budget is not None and not config.retry_budget.acquire():
+            logger.warning("Retry budget of {} exhausted".format(
+                config.retry_budget.limit))
+            return None
+
+        delay = config.retry_backoff * config.retry_backoff_factor ** (self.attempts - 1)
+        delay *= random.uniform(0.5, 1.0)  # Spread retries of concurrent tests
+        if retry_after is not None:
+            delay = retry_after
+        delay = min(delay, config.retry_max_delay)
+        self.waited += delay
+        logger.warning("Attempt {} failed with {}, retry in {:.3f}s".format(
+            self.attempts,
+            error if error is not None else http_response.status_code, delay))
+        return delay
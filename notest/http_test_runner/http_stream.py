@@ -0,0 +1,67 @@
+import logging
+import tempfile
+
+from notest.lib.utils import ResponseBody
+
+"""
+Stream mode of http tests, stream: true
+- The client writes the body chunk by chunk into a ResponseStream
+- Chunks spill to a temporary file past spool_size bytes, never one big bytes object
+- Stream validators consume every chunk as it arrives
+- Other validators and extract_binds still get the whole body, read back from the file
+"""
+
+logger = logging.getLogger('notest.http_stream')
+
+DEFAULT_SPOOL_SIZE = 8 * 1024 * 1024  # Bytes kept in memory before spilling to disk
+
+
+def is_stream_validator(validator):
+    return getattr(validator, 'is_stream_validator', False)
+
+
+class ResponseStream:
+    """ Sink of a streamed response body, write() is called by the clients for each chunk """
+
+    def __init__(self, stream_validators, context=None,
+                 spool_size=DEFAULT_SPOOL_SIZE):
+        self.file = tempfile.SpooledTemporaryFile(max_size=spool_size)
+        self.context = context
+        self.byte_count = 0
+        self.states = [(v, v.start(context=context)) for v in stream_validators]
+        self.results = dict()  # id of validator to its result
+        self.body = None
+
+    def write(self, chunk):
+        self.byte_count += len(chunk)
+        self.file.write(chunk)
+        for validator, state in self.states:
+            validator.feed(state, chunk)
+
+    def finish(self):
+        """ Body complete, run the end checks of all stream validators """
+        for validator, state in self.states:
+            self.results[id(validator)] = validator.finish(
+                state, context=self.context)
+        self.states = list()
+
+    def get_result(self, validator):
+        return self.results[id(validator)]
+
+    def get_body(self):
+        """ Whole body, only read from the spooled file for validators/extractors
+            which can not stream """
+        if self.body is None:
+            logger.debug("Read {} streamed bytes for non stream validators".format(
+                self.byte_count))
+            self.file.seek(0)
+            body = self.file.read()
+            try:
+                self.body = ResponseBody(body.decode())
+            except UnicodeDecodeError:
+                self.body = body
+        return self.body
+
+    def close(self):
+        self.file.close()
+        self.body = None
@@ -1,19 +1,24 @@
 import json
 import logging
-import string
 import copy
+import asyncio
+import functools
+import weakref
 
 logger = logging.getLogger('notest.http_test')
 
 from notest.clients.request_client import get_client_class
+from notest.clients.connection_pool import ConnectionPoolManager
 from notest.clients.http_auth_type import HttpAuthType
-from notest.lib.utils import templated_var
+from notest.lib.utils import templated_var, compile_template
 from notest.common_test import CommonTest
 from notest.lib.parsing import lowercase_keys, flatten_dictionaries, safe_to_bool
 import notest.validators as validators
 
-from notest.http_test_runner.http_test_exec import run_http_test, \
+from notest.http_test_runner.http_test_exec import run_http_test, run_http_test_async, \
     coerce_string_to_ascii, coerce_to_string, coerce_list_of_ints, coerce_http_method
+from notest.http_test_runner.http_benchmark import BenchmarkConfig, run_http_benchmark
+from notest.http_test_runner.http_loop import LoopPolicy
 
 """
 Pull out the Test objects and logic associated with them
@@ -26,6 +31,28 @@ This module implements the internal responsibilities of a test object:
 DEFAULT_TIMEOUT = 10  # Seconds
 
 
+class HeaderTemplates:
+    """ Compiled templates of the headers of a parsed test, shared by its ninja_copy runs
+        The last expansion is reused while it is for the same context and mod_count,
+        the context is only weakly referenced """
+
+    def __init__(self, headers):
+        self.source = headers
+        self.templates = tuple((compile_template(str(k)), compile_template(str(v)))
+                               for k, v in headers.items())
+        self.last = None  # (weakref to context, mod_count, templated headers)
+
+    def expand(self, context):
+        last = self.last
+        if last is not None and last[0]() is context and last[1] == context.mod_count:
+            return dict(last[2])
+        mod_count = context.mod_count
+        vals = context.get_values()
+        headers = {k.substitute(vals): v.substitute(vals) for k, v in self.templates}
+        self.last = (weakref.ref(context), mod_count, headers)  # Replaced at once, thread safe
+        return dict(headers)
+
+
 class HttpTest(CommonTest):
     """ Describes a REST test """
     test_type = "http_test"
@@ -33,17 +60,23 @@ class HttpTest(CommonTest):
     expected_status = [200]  # expected HTTP status code or codes
     http_body = None
     http_headers = dict()  # HTTP Headers
+    header_templates = None  # HeaderTemplates of http_headers
+    realized_headers = None
     method = 'GET'
     group = 'Default'
     name = 'Unnamed'
     validators = None  # Validators for response body, IE regexes, etc
     loop_until_conditions = None
+    loop_policy = None  # LoopPolicy, polling options of loop_until
     stop_on_failure = True
     failures = None
     auth_username = None
     auth_password = None
     auth_type = HttpAuthType.HTTP_AUTH_BASIC
     delay = 0
+    benchmark = None  # BenchmarkConfig, run as benchmark if set
+    stream = False  # Stream the response body through stream validators, see http_stream
+    response_stream = None  # ResponseStream of a streamed run
 
     # Bind variables, generators, and contexts
     variable_binds = None
@@ -57,6 +90,7 @@ class HttpTest(CommonTest):
         self.http_client = None
         self.http_handler = None
         self.templates = dict()  # Dictionary of template to compiled template
+        self.realized_headers = None  # Templated headers of a run, set by realize()
         self.original_node = None  # used to save the original dict to reload this test
 
     @staticmethod
@@ -94,21 +128,22 @@ class HttpTest(CommonTest):
 
     def set_headers(self, value):
         self.http_headers = value
+        self.header_templates = HeaderTemplates(value) if isinstance(value, dict) else None
+        self.realized_headers = None
 
     def get_headers(self, context=None):
-        """ Get headers, applying template if pertinent """
+        """ Get headers, applying template if pertinent
+            Templates are compiled once by set_headers, realize() keeps the result of a run """
+        if self.realized_headers is not None:
+            return self.realized_headers
         if not context:
             context = self.context
         if not context:
             return self.http_headers
-
-        vals = context.get_values()
-
-        def template_tuple(tuple_input):
-            return (string.Template(str(tuple_item)).safe_substitute(vals)
-                    for tuple_item in tuple_input)
-
-        return dict(map(template_tuple, self.http_headers.items()))
+        templates = self.header_templates
+        if templates is None or templates.source is not self.http_headers:
+            templates = HeaderTemplates(self.http_headers)
+        return templates.expand(context)
 
     headers = property(get_headers, set_headers, None,
                        'Headers dictionary for request')
@@ -139,7 +174,8 @@ class HttpTest(CommonTest):
         self.url = templated_var(self.url, context)
         self.method = templated_var(self.method, context)
         self.body = templated_var(self.body, context)
-        self.headers = templated_var(self.headers, context)
+        self.realized_headers = None
+        self.realized_headers = self.get_headers(context)
 
     def send_request(self, timeout=DEFAULT_TIMEOUT, context=None,
                      handler=None, ssl_insecure=True, verbose=False):
@@ -150,19 +186,67 @@ class HttpTest(CommonTest):
         client = self.testset_config.request_client
         if not client:
             client = "requests"
+        pool = handler if isinstance(handler, ConnectionPoolManager) else None
+        if pool is not None:
+            handler = pool.get_handler(client, self.url, self.testset_config)
+        HttpClient = get_client_class(client)
+        self.http_client = HttpClient(handler)
+        self.http_handler = self.http_client.get_handler()
+        try:
+            return self.http_client.send_request(
+                test_obj=self,
+                timeout=timeout,
+                context=context,
+                ssl_insecure=ssl_insecure,
+                verbose=verbose
+            )
+        finally:
+            self.update_pooled_handler(pool)
+
+    async def send_request_async(self, timeout=DEFAULT_TIMEOUT, context=None,
+                                 handler=None, ssl_insecure=True, verbose=False):
+        """ Await the request with an asyncio client, blocking clients run in the default executor """
+        if not context:
+            context = self.context
+        self.realize(context)
+
+        client = self.testset_config.request_client
+        if not client:
+            client = "requests"
+        pool = handler if isinstance(handler, ConnectionPoolManager) else None
+        if pool is not None:
+            handler = pool.get_handler(client, self.url, self.testset_config)
         HttpClient = get_client_class(client)
         self.http_client = HttpClient(handler)
         self.http_handler = self.http_client.get_handler()
-        return self.http_client.send_request(
+        request_kwargs = dict(
             test_obj=self,
             timeout=timeout,
             context=context,
             ssl_insecure=ssl_insecure,
             verbose=verbose
         )
+        try:
+            if hasattr(self.http_client, "send_request_async"):
+                return await self.http_client.send_request_async(**request_kwargs)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, functools.partial(
+                self.http_client.send_request, **request_kwargs))
+        finally:
+            self.update_pooled_handler(pool)
+
+    def update_pooled_handler(self, pool):
+        """ A handle the client recreated, e.g. after a curl error, replaces the old one in the pool """
+        handler = self.http_client.get_handler()
+        if pool is not None and handler is not self.http_handler:
+            pool.replace(self.http_handler, handler)
+            self.http_handler = handler
 
     def reload(self):
-        self.parse_from_dict(self.original_node, self)
+        """ Parse the test again from original_node, dropping any state """
+        output = self.parse_from_dict(self.original_node)
+        output.testset_config = self.testset_config
+        self.__dict__ = output.__dict__
 
     @classmethod
     def parse_from_dict(cls, node, input_test=None):
@@ -198,6 +282,7 @@ class HttpTest(CommonTest):
             u'name': [coerce_to_string],  # Test name
             u'expected_status': [coerce_list_of_ints],
             u'stop_on_failure': [safe_to_bool],
+            u'stream': [safe_to_bool],
 
             # Templated / special handling
             # u'body': [ContentHandler.parse_content]
@@ -312,6 +397,14 @@ class HttpTest(CommonTest):
                 else:
                     raise TypeError(
                         "Illegal header type: headers must be a dictionary or list of dictionary keys")
+            elif configelement == 'benchmark':
+                mytest.benchmark = BenchmarkConfig.parse(configvalue)
+            elif configelement == 'loop_policy':
+                mytest.loop_policy = LoopPolicy.parse(configvalue)
+            elif configelement == 'depends_on':
+                if not isinstance(configvalue, list):
+                    configvalue = [configvalue]
+                mytest.depends_on = [coerce_to_string(v) for v in configvalue]
             elif configelement == 'variable_binds':
                 mytest.variable_binds = flatten_dictionaries(configvalue)
             elif configelement == 'generator_binds':
@@ -336,4 +429,14 @@ class HttpTest(CommonTest):
         return mytest
 
     def run_test(self, test_config, context=None, handler=None, **kwargs):
-        return run_http_test(self, test_config, context, http_handler=handler)
+        """ The parsed test is never modified by a run, realized url/headers/body
+            and the request client live on a ninja_copy made for each run """
+        return run_http_test(self.ninja_copy(), test_config, context,
+                             http_handler=handler)
+
+    async def run_test_async(self, test_config, context=None, handler=None, **kwargs):
+        return await run_http_test_async(self.ninja_copy(), test_config, context,
+                                         http_handler=handler)
+
+    def run_benchmark(self, test_config, context=None, handler=None):
+        return run_http_benchmark(self, test_config, context, http_handler=handler)
@@ -1,10 +1,16 @@
 #!/usr/bin/env python
 import sys
 import os
+import time
+import asyncio
 import traceback
 import logging
 from notest.clients.request_client import get_client_class
+from notest.clients.connection_pool import ConnectionPoolManager
 from notest.test_result import TestResult
+from notest.lib.utils import ResponseBody
+from notest.http_test_runner.http_stream import ResponseStream, is_stream_validator
+from notest.http_test_runner.http_retry import RetryState
 from email import message_from_string
 
 ESCAPE_DECODING = 'unicode_escape'
@@ -131,8 +137,8 @@ def parse_headers(header_string):
     return [(k.lower(), v) for k, v in header_msg.items()]
 
 
-def run_http_test(mytest, test_config, context=None, http_handler=None):
-    """ Put together test pieces: configure & run actual test, return results """
+def start_http_test(mytest, test_config, context=None):
+    """ Bind context and create the result of a test run, before sending the request """
     # assert isinstance(mytest, HttpTest)
 
     # Initialize a context if not supplied
@@ -143,7 +149,7 @@ def run_http_test(mytest, test_config, context=None, http_handler=None):
     mytest.update_context_before()
 
     result = TestResult()
-    result.ref_test_obj = mytest
+    result.test_obj = mytest
     result.passed = None
 
     if test_config.interactive:
@@ -159,37 +165,199 @@ def run_http_test(mytest, test_config, context=None, http_handler=None):
 
         input("Press ENTER when ready")
 
-    # send request
-    try:
-        mytest.realize(my_context)
-        result.add_key_field("url", mytest.url)
-        result.add_key_field("method", mytest.method)
-        result.add_verbose_field("request_headers", mytest.headers)
-        result.add_verbose_field("request_body", mytest.body)
-
-        http_response = mytest.send_request(
-            timeout=test_config.timeout,
-            context=my_context,
-            handler=http_handler,
-            ssl_insecure=test_config.ssl_insecure,
-            verbose=test_config.verbose
-        )
-    except Exception as e:
-        trace = traceback.format_exc()
-        result.failures.append(
-            Failure(message="Http Request Exception: {0}".format(e),
-                    details=trace,
-                    failure_type=validators.FAILURE_CURL_EXCEPTION))
-        result.passed = False
-        client = mytest.testset_config.request_client
-        if not client:
-            client = "requests"
-        HttpClient = get_client_class(client)
-        HttpClient.close_handler(http_handler)
+    return result, my_context
+
+
+def realize_http_test(mytest, result, context):
+    mytest.realize(context)
+    result.add_key_field("url", mytest.url)
+    result.add_key_field("method", mytest.method)
+    result.add_verbose_field("request_headers", mytest.headers)
+    result.add_verbose_field("request_body", mytest.body)
+
+
+def discard_pooled_handler(mytest, http_handler):
+    """ Drop the pooled handle of a failed request, others stay open """
+    if isinstance(http_handler, ConnectionPoolManager):
+        http_handler.discard(mytest.http_handler)
+        return True
+    return False
+
+
+def fail_http_request(mytest, result, http_handler=None):
+    """ Record the exception raised while sending the request """
+    trace = traceback.format_exc()
+    result.failures.append(
+        Failure(message="Http Request Exception: {0}".format(sys.exc_info()[1]),
+                details=trace,
+                failure_type=validators.FAILURE_CURL_EXCEPTION))
+    result.passed = False
+    if discard_pooled_handler(mytest, http_handler):
         return result
+    client = mytest.testset_config.request_client
+    if not client:
+        client = "requests"
+    HttpClient = get_client_class(client)
+    HttpClient.close_handler(http_handler)
+    return result
+
+
+def open_response_stream(mytest, context):
+    """ Body sink of a test with stream: true, given to the client through the test """
+    if not mytest.stream:
+        return None
+    conditions = (mytest.validators or list()) + (mytest.loop_until_conditions or list())
+    mytest.response_stream = ResponseStream(
+        [v for v in conditions if is_stream_validator(v)], context=context)
+    return mytest.response_stream
+
+
+def close_response_stream(mytest):
+    if mytest.response_stream is not None:
+        mytest.response_stream.close()
+        mytest.response_stream = None
+
+
+def get_response_retry_delay(mytest, retry, http_response):
+    """ Expected status codes are never retried, even 5xx """
+    if http_response.status_code in mytest.expected_status:
+        return None
+    return retry.get_delay(http_response=http_response)
+
+
+def add_retry_fields(result, retry, test_config):
+    if test_config.retries:
+        result.add_key_field("attempts", retry.attempts)
+        result.add_key_field("retry_waited", retry.waited)
+
+
+def run_http_test(mytest, test_config, context=None, http_handler=None):
+    """ Put together test pieces: configure & run actual test, return results """
+    result, my_context = start_http_test(mytest, test_config, context)
+    try:
+        realize_http_test(mytest, result, my_context)
+    except Exception:
+        return fail_http_request(mytest, result, http_handler)
+
+    # send request, retried on the retry_on conditions of test_config
+    retry = RetryState(test_config, mytest.method)
+    while True:
+        retry.attempts += 1
+        try:
+            open_response_stream(mytest, my_context)
+            http_response = mytest.send_request(
+                timeout=test_config.timeout,
+                context=my_context,
+                handler=http_handler,
+                ssl_insecure=test_config.ssl_insecure,
+                verbose=test_config.verbose
+            )
+        except Exception as e:
+            close_response_stream(mytest)
+            delay = retry.get_delay(error=e)
+            if delay is None:
+                add_retry_fields(result, retry, test_config)
+                return fail_http_request(mytest, result, http_handler)
+            discard_pooled_handler(mytest, http_handler)
+            time.sleep(delay)
+            continue
+        delay = get_response_retry_delay(mytest, retry, http_response)
+        if delay is None:
+            break
+        close_response_stream(mytest)
+        time.sleep(delay)
+    add_retry_fields(result, retry, test_config)
+
+    try:
+        return check_http_response(mytest, test_config, result, http_response,
+                                   my_context)
+    finally:
+        close_response_stream(mytest)
+
+
+async def run_http_test_async(mytest, test_config, context=None,
+                              http_handler=None):
+    """ Coroutine version of run_http_test, the request and retry delays are awaited """
+    result, my_context = start_http_test(mytest, test_config, context)
+    try:
+        realize_http_test(mytest, result, my_context)
+    except Exception:
+        return fail_http_request(mytest, result, http_handler)
+
+    retry = RetryState(test_config, mytest.method)
+    while True:
+        retry.attempts += 1
+        try:
+            open_response_stream(mytest, my_context)
+            http_response = await mytest.send_request_async(
+                timeout=test_config.timeout,
+                context=my_context,
+                handler=http_handler,
+                ssl_insecure=test_config.ssl_insecure,
+                verbose=test_config.verbose
+            )
+        except Exception as e:
+            close_response_stream(mytest)
+            delay = retry.get_delay(error=e)
+            if delay is None:
+                add_retry_fields(result, retry, test_config)
+                return fail_http_request(mytest, result, http_handler)
+            discard_pooled_handler(mytest, http_handler)
+            await asyncio.sleep(delay)
+            continue
+        delay = get_response_retry_delay(mytest, retry, http_response)
+        if delay is None:
+            break
+        close_response_stream(mytest)
+        await asyncio.sleep(delay)
+    add_retry_fields(result, retry, test_config)
+
+    try:
+        return check_http_response(mytest, test_config, result, http_response,
+                                   my_context)
+    finally:
+        close_response_stream(mytest)
+
+
+def run_validator(validator, stream, body, headers, context):
+    """ Stream validators of a streamed response already consumed the body,
+        other validators read it back from the stream """
+    if stream is None:
+        return validator.validate(body=body, headers=headers, context=context)
+    if is_stream_validator(validator):
+        return stream.get_result(validator)
+    return validator.validate(body=stream.get_body(), headers=headers,
+                              context=context)
+
+
+def check_http_response(mytest, test_config, result, http_response,
+                        my_context):
+    """ Check the response with expected status, validators and loop_until conditions """
+    # Retrieve Body, json is decoded lazily once for all validators and extractors
+    stream = mytest.response_stream
+    body = None
+    if stream is not None:
+        # Streamed body is not kept in the result, only its size
+        stream.finish()
+        result.add_key_field('response_size', stream.byte_count)
+    else:
+        body = http_response.body
+        if isinstance(body, bytes):
+            body = body.decode()
+        if isinstance(body, str):
+            body = ResponseBody(body)
+            # The result keeps a plain str, not the json parsed by the validators
+            result.add_verbose_field('response_body', str(body))
+        else:
+            result.add_verbose_field('response_body', body)
 
-    # Retrieve Body
-    result.add_verbose_field('response_body', http_response.body)
+    # Retrieve phase timings and transfer sizes, if the client measured them
+    if http_response.timings is not None:
+        result.add_key_field('timings', http_response.timings)
+    if http_response.bytes_sent is not None:
+        result.add_key_field('bytes_sent', http_response.bytes_sent)
+    if http_response.bytes_received is not None:
+        result.add_key_field('bytes_received', http_response.bytes_received)
 
     # Retrieve Headers
     headers = http_response.headers
@@ -244,15 +412,14 @@ def run_http_test(mytest, test_config, context=None, http_handler=None):
 
     # execute validator
     if result.passed is True:
-        body = result.response_body
         if mytest.validators is not None and isinstance(mytest.validators,
                                                         list):
             logger.debug("executing validators: " +
                          str(len(mytest.validators)))
             failures = result.failures
             for validator in mytest.validators:
-                validate_result = validator.validate(
-                    body=body, headers=headers, context=my_context)
+                validate_result = run_validator(
+                    validator, stream, body, headers, my_context)
                 if not validate_result:
                     result.passed = False
                 # Proxy for checking if it is a Failure object, because of
@@ -264,18 +431,19 @@ def run_http_test(mytest, test_config, context=None, http_handler=None):
             logger.debug("no validators found")
 
         # Only do context updates if test was successful
-        mytest.update_context_after(result.response_body, headers)
+        if stream is not None and mytest.extract_binds:
+            body = stream.get_body()
+        mytest.update_context_after(body, headers)
 
     # execute loop_until_conditions
     if result.passed is True:
-        body = result.response_body
         if mytest.loop_until_conditions is not None and isinstance(mytest.loop_until_conditions, list):
             logger.debug("executing loop_until_conditions: " +
                          str(len(mytest.loop_until_conditions)))
             result.loop = False
             for validator in mytest.loop_until_conditions:
-                validate_result = validator.validate(
-                    body=body, headers=headers, context=my_context)
+                validate_result = run_validator(
+                    validator, stream, body, headers, my_context)
                 if isinstance(validate_result, validators.Failure):
                     result.loop = True
                     logger.error(validate_result)
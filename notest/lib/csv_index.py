@@ -0,0 +1,210 @@
+import os
+import json
+import csv
+import mmap
+import array
+import struct
+import logging
+import threading
+
+"""
+Row offset index of csv files, for data driven tests on big files
+- The file is scanned once through mmap, the byte offset of each row is kept in an array
+- The index can be saved next to the file, and is reused while size and mtime match
+- Any row range is then read by seeking to its first row, without parsing the rows before it
+- shard i/N and start_row/limit split one file between workers or machines
+"""
+
+logger = logging.getLogger('notest.csv_index')
+
+INDEX_SUFFIX = ".idx"  # Index file saved next to the csv file
+INDEX_MAGIC = b"NTCSVID1"
+INDEX_HEADER = struct.Struct("<8sQQQ")  # magic, file size, mtime_ns, row count
+
+DEFAULT_ENCODING = 'utf-8-sig'  # Drops the BOM some editors write at the start of csv files
+INDEXES = dict()  # realpath to CsvIndex, shared by the generators of a run
+INDEXES_LOCK = threading.Lock()
+
+
+def parse_shard(value):
+    """ 'i/N' to (i, N), i from 1 to N """
+    try:
+        index, count = (int(v) for v in str(value).split('/'))
+    except ValueError:
+        raise ValueError("shard must be i/N, like 1/4, not {}".format(value))
+    if count <= 0 or not 1 <= index <= count:
+        raise ValueError("shard {} out of range, i must be from 1 to N".format(value))
+    return index, count
+
+
+def get_row_range(row_count, start_row=0, limit=None, shard=None):
+    """ (start, stop) rows to read: start_row and limit select a window,
+        shard (i, N) then takes the i-th of N contiguous parts of it """
+    start = min(max(start_row, 0), row_count)
+    stop = row_count if limit is None else min(start + max(limit, 0), row_count)
+    if shard is not None:
+        index, count = shard
+        size = stop - start
+        start, stop = (start + size * (index - 1) // count,
+                       start + size * index // count)
+    return start, stop
+
+
+class MmapLines:
+    """ Lines of a mmap from its current position, decoded for csv.reader """
+
+    def __init__(self, mm, encoding):
+        self.mm = mm
+        self.encoding = encoding
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self.mm.readline()
+        if not line:
+            raise StopIteration
+        return line.decode(self.encoding)
+
+
+class CsvIndex:
+    """ Header and row offsets of a csv file, rows are read through mmap """
+
+    def __init__(self, path, encoding=DEFAULT_ENCODING, dialect='excel'):
+        self.path = path
+        self.encoding = encoding
+        self.dialect = dialect
+        self.header = None
+        self.offsets = array.array('Q')  # Start of each row, then the end of the last one
+        self.size = 0
+        self.mtime_ns = 0
+        self.saved = False  # Index file written or read for this size and mtime
+
+    def __len__(self):
+        return max(len(self.offsets) - 1, 0)
+
+    def build(self):
+        """ Scan the file once, blank lines are skipped like csv.DictReader does """
+        stat = os.stat(self.path)
+        self.size = stat.st_size
+        self.mtime_ns = stat.st_mtime_ns
+        self.offsets = array.array('Q')
+        self.header = None
+        if self.size == 0:
+            return self
+        with open(self.path, 'rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            reader = csv.reader(MmapLines(mm, self.encoding), self.dialect)
+            while True:
+                offset = mm.tell()  # csv.reader never reads past the row it returns
+                try:
+                    row = next(reader)
+                except StopIteration:
+                    break
+                if not row:
+                    continue
+                if self.header is None:
+                    self.header = row
+                else:
+                    self.offsets.append(offset)
+            self.offsets.append(mm.tell())
+        if self.header is None:
+            self.offsets = array.array('Q')
+        logger.debug("Indexed {} rows of {}".format(len(self), self.path))
+        return self
+
+    def get_index_path(self):
+        return self.path + INDEX_SUFFIX
+
+    def save(self):
+        """ Write the index next to the csv file, header and offsets only """
+        index_path = self.get_index_path()
+        tmp_path = "{}.{}.tmp".format(index_path, os.getpid())
+        header = json.dumps(self.header).encode('utf-8')
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(INDEX_HEADER.pack(INDEX_MAGIC, self.size, self.mtime_ns,
+                                          len(self.offsets)))
+                f.write(struct.pack("<Q", len(header)))
+                f.write(header)
+                self.offsets.tofile(f)
+            os.replace(tmp_path, index_path)
+            self.saved = True
+        except OSError as e:
+            logger.warning("Can not write csv index {}: {}".format(index_path, e))
+
+    def load(self):
+        """ Read the saved index, False if missing or stale """
+        index_path = self.get_index_path()
+        stat = os.stat(self.path)
+        try:
+            with open(index_path, 'rb') as f:
+                magic, size, mtime_ns, count = INDEX_HEADER.unpack(
+                    f.read(INDEX_HEADER.size))
+                if magic != INDEX_MAGIC or size != stat.st_size \
+                        or mtime_ns != stat.st_mtime_ns:
+                    return False
+                header_size, = struct.unpack("<Q", f.read(8))
+                header = f.read(header_size).decode('utf-8')
+                offsets = array.array('Q')
+                offsets.fromfile(f, count)
+        except FileNotFoundError:
+            return False
+        except (OSError, EOFError, struct.error, ValueError) as e:
+            logger.debug("Ignore broken csv index {}: {}".format(index_path, e))
+            return False
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.header = json.loads(header)
+        self.offsets = offsets
+        self.saved = True
+        return True
+
+    def is_fresh(self):
+        stat = os.stat(self.path)
+        return stat.st_size == self.size and stat.st_mtime_ns == self.mtime_ns
+
+    def iter_rows(self, start=0, stop=None):
+        """ Dicts of rows start to stop, like csv.DictReader """
+        stop = len(self) if stop is None else min(stop, len(self))
+        if start >= stop:
+            return
+        header = self.header
+        with open(self.path, 'rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            mm.seek(self.offsets[start])
+            reader = csv.reader(MmapLines(mm, self.encoding), self.dialect)
+            count = stop - start
+            for row in reader:
+                if not row:
+                    continue
+                line = dict(zip(header, row))
+                if len(row) > len(header):
+                    line[None] = row[len(header):]
+                elif len(row) < len(header):
+                    for key in header[len(row):]:
+                        line[key] = None
+                yield line
+                count -= 1
+                if count == 0:
+                    break
+
+
+def get_csv_index(path, encoding=DEFAULT_ENCODING, dialect='excel', save_index=False):
+    """ Index of a csv file, built once per run,
+        from or to the saved index file if save_index """
+    path = os.path.realpath(path)
+    with INDEXES_LOCK:
+        index = INDEXES.get(path)
+        if index is not None and index.encoding == encoding \
+                and index.dialect == dialect and index.is_fresh():
+            if save_index and not index.saved:
+                index.save()
+            return index
+        index = CsvIndex(path, encoding=encoding, dialect=dialect)
+        if not (save_index and index.load()):
+            index.build()
+            if save_index:
+                index.save()
+        INDEXES[path] = index
+        return index
@@ -0,0 +1,98 @@
+import os
+import json
+import pickle
+import hashlib
+import logging
+import yaml
+
+"""
+Cache of parsed test files, read_test_file goes through it
+- In process memo: a file included by many testsets is parsed once per run
+- On disk cache in cache_dir, if set: parsed files are reused between runs
+- Entries are valid for the same path, mtime and size, or else the same content hash
+- Parsed structures are stored pickled, every read returns a new copy callers can change
+"""
+
+logger = logging.getLogger('notest.file_cache')
+
+SafeLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)  # libyaml if available
+
+CACHE_VERSION = 1  # Bump when the cached structures change
+cache_dir = None  # On disk cache folder, disabled if None, set with --parse-cache-dir
+
+MEMO = dict()  # realpath to (mtime_ns, size, digest, pickled structure)
+
+
+def yaml_load(content):
+    return yaml.load(content, Loader=SafeLoader)
+
+
+def parse_test_content(content):
+    """ Test structure of yaml or json content """
+    try:
+        return yaml_load(content)
+    except yaml.YAMLError:
+        return json.loads(content)
+
+
+def get_cache_path(path):
+    name = hashlib.sha1(path.encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, "{}.v{}.pickle".format(name, CACHE_VERSION))
+
+
+def load_cache_entry(path):
+    """ Entry of the on disk cache, None if missing or unreadable """
+    if not cache_dir:
+        return None
+    try:
+        with open(get_cache_path(path), 'rb') as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.debug("Ignore broken parse cache of {}: {}".format(path, e))
+        return None
+
+
+def save_cache_entry(path, entry):
+    if not cache_dir:
+        return
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        cache_path = get_cache_path(path)
+        tmp_path = "{}.{}.tmp".format(cache_path, os.getpid())
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)  # Atomic, concurrent runs never read half an entry
+    except OSError as e:
+        logger.warning("Can not write parse cache of {}: {}".format(path, e))
+
+
+def read_cached_test_file(path):
+    """ Parsed test file at path, from the memo, the on disk cache or parsed """
+    path = os.path.realpath(path)
+    stat = os.stat(path)
+    entry = MEMO.get(path)
+    if entry is None:
+        entry = load_cache_entry(path)
+    if entry is not None and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+        MEMO[path] = entry
+        return pickle.loads(entry[3])
+
+    with open(path, 'rb') as f:
+        raw = f.read()
+    digest = hashlib.sha256(raw).hexdigest()
+    if entry is not None and entry[2] == digest:
+        structure = pickle.loads(entry[3])  # Touched but unchanged, e.g. by a checkout
+    else:
+        logger.debug("Parse test file {}".format(path))
+        structure = parse_test_content(raw.decode('utf-8'))
+    entry = (stat.st_mtime_ns, stat.st_size, digest,
+             pickle.dumps(structure, protocol=pickle.HIGHEST_PROTOCOL))
+    MEMO[path] = entry
+    save_cache_entry(path, entry)
+    return structure
+
+
+def clear_memo():
+    MEMO.clear()
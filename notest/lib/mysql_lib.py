@@ -1,43 +1,225 @@
+import json
+import time
+import atexit
+import threading
+from functools import lru_cache
+
 import mysql.connector
 from mysql.connector import errorcode
 import logging
 
 logger = logging.Logger("mysql_lib")
 
+POOL_MAX_SIZE = 5  # Max open connections per config
+POOL_IDLE_TIMEOUT = 300  # seconds, idle connections older than this are closed
+POOL_CHECK_INTERVAL = 30  # seconds, idle connections older than this are pinged before reuse
+POOL_WAIT_TIMEOUT = 60  # seconds to wait for a connection when all are in use
+CONFIG_CACHE_SIZE = 128
+
+POOLS = dict()  # Pool key of a config to MysqlConnectionPool
+POOLS_LOCK = threading.Lock()
+
+
+@lru_cache(maxsize=CONFIG_CACHE_SIZE)
+def parse_mysql_config(text):
+    """ Json config string decoded once, the dict must not be changed """
+    return json.loads(text)
+
+
+@lru_cache(maxsize=CONFIG_CACHE_SIZE)
+def get_text_pool_key(text):
+    """ Pool key of a json config string, computed once per string """
+    return get_pool_key(parse_mysql_config(text))
+
+
+def get_pool_key(config):
+    """ Hashable key of the connection fields of a config dict """
+    key = tuple(sorted(config.items()))
+    try:
+        hash(key)
+    except TypeError:  # Nested options such as ssl settings
+        key = json.dumps(config, sort_keys=True, default=str)
+    return key
+
+
+def open_connection(config):
+    """ New MySQL connection, errors are logged with a readable reason """
+    try:
+        return mysql.connector.connect(**config)
+    except mysql.connector.Error as err:
+        if err.errno == errorcode.ER_ACCESS_DENIED_ERROR:
+            logger.error(
+                "Something is wrong with your user name or password")
+        elif err.errno == errorcode.ER_BAD_DB_ERROR:
+            logger.error("Database does not exist")
+        elif err.errno == errorcode.CR_CONN_HOST_ERROR:
+            logger.error("Host Connection Error")
+        else:
+            logger.error(err.errno)
+        raise err
+
+
+def load_mysql_config(config):
+    """ MySQL connection config from a dict or a json string """
+    if isinstance(config, str):
+        config = parse_mysql_config(config)
+    if not config:
+        raise Exception("No MySQL config")
+    return config
+
+
+class MysqlConnectionPool:
+    """ Connections of one MySQL config, shared by the extractor, generator and operations
+        At most max_size connections are open, idle ones are kept for idle_timeout seconds """
+
+    def __init__(self, config, max_size=POOL_MAX_SIZE,
+                 idle_timeout=POOL_IDLE_TIMEOUT):
+        self.config = config
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.idle = list()  # (connection, release time), last released at the end
+        self.open_count = 0
+        self.condition = threading.Condition()
+
+    def close_connection(self, connection):
+        try:
+            connection.close()
+        except Exception as e:
+            logger.debug("Close pooled connection: {}".format(e))
+
+    def is_healthy(self, connection, idle_time):
+        if idle_time < POOL_CHECK_INTERVAL:
+            return True
+        try:
+            return connection.is_connected()  # Pings the server, no reconnect
+        except Exception:
+            return False
+
+    def acquire(self, timeout=POOL_WAIT_TIMEOUT):
+        """ Idle connection of the pool, or a new one when under max_size """
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while True:
+                while self.idle:
+                    connection, released = self.idle.pop()
+                    idle_time = time.monotonic() - released
+                    if idle_time <= self.idle_timeout \
+                            and self.is_healthy(connection, idle_time):
+                        return connection
+                    self.open_count -= 1
+                    self.close_connection(connection)
+                if self.open_count < self.max_size:
+                    self.open_count += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise Exception("No MySQL connection available in {}s, pool size {}".format(
+                        timeout, self.max_size))
+                self.condition.wait(remaining)
+        try:
+            return open_connection(self.config)
+        except Exception:
+            with self.condition:
+                self.open_count -= 1
+                self.condition.notify()
+            raise
+
+    def release(self, connection, broken=False):
+        """ Give back a connection, broken ones are closed """
+        if not broken:
+            try:
+                if connection.unread_result:
+                    # A stream stopped early, reading the rest of a big result costs more than a new connection
+                    broken = True
+                elif connection.in_transaction:
+                    connection.rollback()
+            except Exception as e:
+                logger.debug("Reset pooled connection: {}".format(e))
+                broken = True
+        with self.condition:
+            if broken:
+                self.open_count -= 1
+            else:
+                self.idle.append((connection, time.monotonic()))
+            self.condition.notify()
+        if broken:
+            self.close_connection(connection)
+
+    def close(self):
+        with self.condition:
+            idle = self.idle
+            self.idle = list()
+            self.open_count -= len(idle)
+        for connection, released in idle:
+            self.close_connection(connection)
+
+
+def get_pool(config):
+    """ Process wide pool of a config, dict or json string """
+    if isinstance(config, str):
+        key = get_text_pool_key(config)
+    else:
+        key = get_pool_key(load_mysql_config(config))
+    with POOLS_LOCK:
+        pool = POOLS.get(key)
+        if pool is None:
+            pool = MysqlConnectionPool(load_mysql_config(config))
+            POOLS[key] = pool
+    return pool
+
+
+def close_pools():
+    with POOLS_LOCK:
+        pools = list(POOLS.values())
+        POOLS.clear()
+    for pool in pools:
+        pool.close()
+
+
+atexit.register(close_pools)
+
+
+def pooled_client(config):
+    """ MysqlClient using a pooled connection, for with statements """
+    return MysqlClient(load_mysql_config(config), pool=get_pool(config))
+
 
 class MysqlClient:
-    def __init__(self, config):
+    def __init__(self, config, pool=None):
         self.connection = None
         self.cursor = None
         if not config:
             raise Exception("No MySQL config")
         self.config = config
+        self.pool = pool  # MysqlConnectionPool, connections are borrowed instead of opened
 
     def __enter__(self):
-        self.connect(self.config)
+        if self.pool is not None:
+            self.connection = self.pool.acquire()
+        else:
+            self.connect(self.config)
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.close()
+        if self.pool is None:
+            self.close()
+            return
+        broken = exc_type is not None and issubclass(
+            exc_type, (mysql.connector.errors.InterfaceError,
+                       mysql.connector.errors.OperationalError))
+        if self.cursor is not None:
+            try:
+                self.cursor.close()
+            except Exception:
+                broken = True
+        self.pool.release(self.connection, broken=broken)
+        self.connection = None
+        self.cursor = None
 
     def connect(self, config=None):
         if not config:
             config = self.config
-        try:
-            connection = mysql.connector.connect(**config)
-            self.connection = connection
-            self.cursor = self.get_cursor()
-        except mysql.connector.Error as err:
-            if err.errno == errorcode.ER_ACCESS_DENIED_ERROR:
-                logger.error(
-                    "Something is wrong with your user name or password")
-            elif err.errno == errorcode.ER_BAD_DB_ERROR:
-                logger.error("Database does not exist")
-            elif err.errno == errorcode.CR_CONN_HOST_ERROR:
-                logger.error("Host Connection Error")
-            else:
-                logger.error(err.errno)
-            raise err
+        self.connection = open_connection(config)
         return self.connection
 
     def close(self):
@@ -63,6 +245,36 @@ class MysqlClient:
             logger.error(str(e))
             raise e
 
+    def execute_many(self, sql, rows, batch_size=1000):
+        """ executemany of a parameterized statement over rows, batch_size rows at a time,
+            all batches in one transaction. Returns (rows, rows affected, batches) """
+        cursor = self.get_cursor()
+        row_count = 0
+        affected = 0
+        batches = 0
+        try:
+            self.connection.start_transaction()
+            batch = list()
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    cursor.executemany(sql, batch)
+                    affected += max(cursor.rowcount, 0)
+                    row_count += len(batch)
+                    batches += 1
+                    batch = list()
+            if batch:
+                cursor.executemany(sql, batch)
+                affected += max(cursor.rowcount, 0)
+                row_count += len(batch)
+                batches += 1
+            self.connection.commit()
+        except Exception as e:
+            logger.error(str(e))
+            self.connection.rollback()
+            raise e
+        return row_count, affected, batches
+
     def query(self, sql, return_dict_list=False):
         cursor = self.get_cursor()
         cursor.execute(sql)
@@ -76,6 +288,29 @@ class MysqlClient:
             ret = r
         return ret
 
+    def iter_query(self, sql, batch_size=1000, return_dict_list=False):
+        """ Rows of a query read batch_size at a time with an unbuffered cursor,
+            the whole result is never held in memory """
+        if not self.connection:
+            self.connect(None)
+        cursor = self.connection.cursor(buffered=False)
+        try:
+            cursor.execute(sql)
+            col_names = cursor.column_names
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    if return_dict_list is True:
+                        row = dict(zip(col_names, row))
+                    yield row
+        finally:
+            try:
+                cursor.close()
+            except Exception as e:
+                logger.debug("Close streaming cursor: {}".format(e))
+
 
 if __name__ == '__main__':
     # docker run -it --name mysql -p 3306:3306 -p 33060:33060 -e MYSQL_ROOT_PASSWORD=password -e MYSQLOST=0.0.0.0 mysql:5.7
@@ -2,6 +2,8 @@ from __future__ import absolute_import
 import sys
 import string
 
+from notest.lib.utils import compile_template
+
 """
 Parsing utilities, pulled out so they can be used in multiple modules
 """
@@ -26,7 +28,9 @@ def safe_substitute_unicode_template(templated_string, variable_map):
         Catch: cannot accept unicode variable names, just values
         Returns a Unicode type output, if you want UTF-8 bytes, do encode_unicode_bytes on it
     """
-    return string.Template(templated_string).safe_substitute(variable_map)
+    if "$" not in templated_string:
+        return templated_string
+    return compile_template(templated_string).substitute(variable_map)
 
 
 def safe_to_json(in_obj):
@@ -1,15 +1,70 @@
 
 import string
-import yaml
 import json
+from functools import lru_cache
+from collections.abc import Mapping
+
+from notest.lib.file_cache import read_cached_test_file
+
+try:  # Optional faster json decoder
+    import orjson
+except ImportError:
+    orjson = None
+
+TEMPLATE_CACHE_SIZE = 4096  # Max compiled templates kept
+
+
+class CompiledTemplate:
+    """ string.Template parsed once into literal parts and (name, placeholder) parts,
+        substitute behaves as string.Template.safe_substitute """
+    __slots__ = ("parts",)
+
+    def __init__(self, src):
+        parts = list()
+        pos = 0
+        for match in string.Template.pattern.finditer(src):
+            if match.start() > pos:
+                parts.append(src[pos:match.start()])
+            name = match.group('named') or match.group('braced')
+            if name is not None:
+                parts.append((name, match.group()))
+            elif match.group('escaped') is not None:
+                parts.append(string.Template.delimiter)
+            else:  # invalid placeholder stays as it is
+                parts.append(match.group())
+            pos = match.end()
+        if pos < len(src):
+            parts.append(src[pos:])
+        self.parts = tuple(parts)
+
+    def substitute(self, mapping):
+        output = list()
+        for part in self.parts:
+            if part.__class__ is str:
+                output.append(part)
+                continue
+            name, placeholder = part
+            try:
+                output.append('%s' % (mapping[name],))
+            except KeyError:
+                output.append(placeholder)
+        return ''.join(output)
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def compile_template(src):
+    """ Parse a template string once, LRU cached """
+    return CompiledTemplate(src)
 
 
 def templated_string(src, context=None):
     if not context:
         return src
-    if not isinstance(context, dict):
+    if "$" not in src:
+        return src
+    if not isinstance(context, Mapping):
         context = context.get_values()
-    src = string.Template(src).safe_substitute(context)
+    src = compile_template(src).substitute(context)
     return src
 
 
@@ -34,6 +89,39 @@ def templated_var(data, context=None):
         return data
 
 
+def json_loads(data):
+    """ json.loads, with orjson if installed
+        Falls back to json for what orjson rejects, such as NaN or big integers """
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+
+class ResponseBody(str):
+    """ Response body text, decoded as json at most once per response,
+        shared by all extractors and validators of the response.
+        The parsed value is shared too, so it must be treated as read only """
+
+    def json(self):
+        try:
+            return self.parsed_json
+        except AttributeError:
+            self.parsed_json = json_loads(self)
+            return self.parsed_json
+
+
+def parse_json_body(body):
+    """ Parsed json of a response body, cached if body is a ResponseBody """
+    if isinstance(body, ResponseBody):
+        return body.json()
+    if isinstance(body, bytes):
+        body = body.decode('utf-8')  # Default JSON encoding
+    return json_loads(body)
+
+
 def read_file(path):
     """ Read an input into a file, doing necessary conversions around relative path handling """
     with open(path, "r") as f:
@@ -43,10 +131,5 @@ def read_file(path):
 
 
 def read_test_file(path):
-    """ Read test file at 'path' in yaml/yml or json"""
-    content = read_file(path)
-    try:
-        teststruct = yaml.safe_load(content)
-    except:
-        teststruct = json.loads(content)
-    return teststruct
\ No newline at end of file
+    """ Read test file at 'path' in yaml/yml or json, parsed once and cached, see file_cache """
+    return read_cached_test_file(path)
\ No newline at end of file
@@ -4,13 +4,13 @@ import os
 import json
 import logging
 from optparse import OptionParser
-from notest.lib.utils import read_test_file
 
 sys.path.append(os.path.dirname(os.path.dirname(
     os.path.realpath(__file__))))
 
 from notest.notest_lib import notest_run
-from notest.test_result import TestResultsAnalyzer, show_total_results
+from notest.test_result import TestResultsAnalyzer, ResultsWriter, \
+    show_total_results
 
 
 """
@@ -44,6 +44,7 @@ def main(args):
 
     Keys allowed for args:
         test_file          - REQUIRED - Test file (yaml)
+        test_files         - OPTIONAL - All test files, test_file is the first one
         log           - OPTIONAL - set logging level {debug,info,warning,error,critical} (default=warning)
         interactive   - OPTIONAL - mode that prints info before and after test exectuion and pauses for user input for each test
         config_file
@@ -52,6 +53,10 @@ def main(args):
         default_base_url
         request_client
         loop_interval
+        workers
+        results_file  - OPTIONAL - results file path, default test_results.json or test_results.jsonl
+        results_format - OPTIONAL - json (default) or jsonl, jsonl writes each result when it completes
+        parse_cache_dir - OPTIONAL - folder of the on disk cache of parsed test files
 
     """
 
@@ -60,17 +65,28 @@ def main(args):
         logging_config['level'] = level
     logging.basicConfig(**logging_config)
 
-    test_file = args['test_file']
-    test_structure = read_test_file(test_file)
-
-    args['test_structure'] = test_structure
-    args['working_directory'] = os.path.dirname(test_file)
+    # Each test file is parsed to testsets in its own folder by notest_run
+    if not args.get('test_files'):
+        args['test_files'] = [args['test_file']]
 
     # Execute all testsets
-    total_results = notest_run(args)
-    show_total_results(total_results)
-    analyzer = TestResultsAnalyzer(total_results)
-    analyzer.save()
+    results_format = (args.get('results_format') or 'json').lower()
+    if results_format == 'jsonl':
+        results_file = args.get('results_file') or "test_results.jsonl"
+        with ResultsWriter(results_file) as writer:
+            args['test_results'] = writer
+            notest_run(args)
+        show_total_results(writer)
+        print("\n+++++++++++++++++++++++++++++++++++++")
+        print("Test Results saved in {}".format(writer.file_path))
+        analyzer = writer.summary
+    elif results_format == 'json':
+        total_results = notest_run(args)
+        show_total_results(total_results)
+        analyzer = TestResultsAnalyzer(total_results)
+        analyzer.save(args.get('results_file'))
+    else:
+        raise ValueError("Unknown results format: {}".format(results_format))
     if analyzer.get_failed_cases_count() > 0:
         sys.exit(1)
     else:
@@ -80,7 +96,7 @@ def main(args):
 def parse_command_line_args(args_in):
     """ Runs everything needed to execute from the command line, so main method is callable without arg parsing """
     parser = OptionParser(
-        usage="usage: notest test_filen.yaml [options] ")
+        usage="usage: notest test_filen.yaml [test_file2.yaml ...] [options] ")
     parser.add_option("--log", help="Logging level",
                       action="store", type="string")
     parser.add_option("-i", "--interactive", help="Interactive mode",
@@ -117,8 +133,9 @@ def parse_command_line_args(args_in):
                       action='store',
                       dest="loop_interval")
     parser.add_option("-r", '--request-client',
-                      help='request_client, select one in [requests, pycurl], default requests. '
-                           'If use pycurl, you should install pycurl first by "pip install -U pycurl"',
+                      help='request_client, select one in [requests, pycurl, async], default requests. '
+                           'If use pycurl, you should install pycurl first by "pip install -U pycurl". '
+                           'If use async, you should install aiohttp first by "pip install -U aiohttp"',
                       action='store',
                       dest="request_client")
     parser.add_option('--libcurl-path',
@@ -129,6 +146,26 @@ def parse_command_line_args(args_in):
                       help='pycurl request_client need libcurl ca/cert file specified in win os',
                       action='store',
                       dest="libcurl_ca_file")
+    parser.add_option("-w", '--workers',
+                      help='run test files concurrently with N workers, default 1',
+                      action='store', type="int",
+                      dest="workers")
+    parser.add_option('--results-file',
+                      help='test results file, default test_results.json, '
+                           'or test_results.jsonl with --results-format jsonl, '
+                           'jsonl files ending with .gz are gzip compressed',
+                      action='store',
+                      dest="results_file")
+    parser.add_option('--results-format',
+                      help='test results format, select one in [json, jsonl], default json. '
+                           'jsonl writes each result when it completes, without keeping results in memory',
+                      action='store',
+                      dest="results_format")
+    parser.add_option('--parse-cache-dir',
+                      help='folder of the cache of parsed test files, reused while files are unchanged, '
+                           'default no cache on disk',
+                      action='store',
+                      dest="parse_cache_dir")
     parser.add_option("-v", '--override-config-variable-binds',
                       help='override_config_variable_binds, format -o key1=value1 -o key2=value2',
                       action='append',
@@ -140,11 +177,13 @@ def parse_command_line_args(args_in):
     # Handle url/test as named, or, failing that, positional arguments
     if not args['test_file']:
         if len(unparsed_args) > 0:
-            args['test_file'] = unparsed_args[0]
+            args['test_file'] = unparsed_args.pop(0)
         else:
             parser.print_help()
             parser.error(
                 "wrong number of arguments, need test filename, either as 1st parameters or via --test")
+    # Remaining positional arguments are extra test files
+    args['test_files'] = [args['test_file']] + unparsed_args
 
     # So modules can be loaded from current folder
     args['cwd'] = os.path.realpath(os.path.abspath(os.getcwd()))
@@ -4,10 +4,15 @@ import os
 import time
 import logging
 import threading
+import asyncio
+import functools
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from notest.lib.utils import templated_var
 from notest.lib.utils import read_test_file
 from notest.operations import get_operation_function
-from notest.test_result import TestResult
+from notest.test_result import TestResult, RETAIN_BODIES_POLICIES
 from notest.testset import TestSet, TestSetConfig
 
 
@@ -18,8 +23,14 @@ sys.path.append(os.path.dirname(os.path.dirname(
 from notest.context import Context
 from notest.generators import parse_generator
 from notest.operations import Operation
+from notest.validators import Failure, FAILURE_TEST_EXCEPTION
 from notest.lib.parsing import flatten_dictionaries, lowercase_keys
 from notest.test_runners import get_test_runner_parser
+from notest.clients.connection_pool import ConnectionPoolManager
+from notest.http_test_runner.http_loop import LoopPoller
+from notest.http_test_runner.http_retry import RetryBudget, parse_retry_on, \
+    parse_retry_methods
+from notest.scheduler import TestScheduler, find_template_vars, has_file_reference
 
 
 """
@@ -87,6 +98,18 @@ def parse_configuration(node, base_config=None):
             test_config.timeout = int(value)
         elif key == 'retries':
             test_config.retries = int(value)
+        elif key == 'retry_on':
+            test_config.retry_on = parse_retry_on(value)
+        elif key == 'retry_backoff':
+            test_config.retry_backoff = float(value)
+        elif key == 'retry_backoff_factor':
+            test_config.retry_backoff_factor = float(value)
+        elif key == 'retry_max_delay':
+            test_config.retry_max_delay = float(value)
+        elif key == 'retry_budget':
+            test_config.retry_budget_limit = int(value)
+        elif key == 'retry_methods':
+            test_config.retry_methods = parse_retry_methods(value)
         elif key == 'collect_import_result':
             if isinstance(value, str):
                 value = True if value.lower() == 'true' else False
@@ -95,6 +118,20 @@ def parse_configuration(node, base_config=None):
             pass
         elif key == 'request_client':
             test_config.request_client = str(value)
+        elif key == 'pool_size':
+            test_config.pool_size = int(value)
+        elif key == 'keep_alive':
+            if isinstance(value, str):
+                value = True if value.lower() == 'true' else False
+            test_config.keep_alive = value
+        elif key == 'test_concurrency':
+            test_config.test_concurrency = max(1, int(value))
+        elif key == 'retain_bodies':
+            value = str(value).lower()
+            if value not in RETAIN_BODIES_POLICIES:
+                raise ValueError("retain_bodies must be one of {}".format(
+                    ", ".join(RETAIN_BODIES_POLICIES)))
+            test_config.retain_bodies = value
         elif key == 'generators':
             flat = flatten_dictionaries(value)
             gen_map = dict()
@@ -103,7 +140,8 @@ def parse_configuration(node, base_config=None):
                     configuration=generator_config,
                     variable_binds={
                         **test_config.variable_binds,
-                        'working_directory': test_config.working_directory
+                        'working_directory': test_config.working_directory,
+                        'template_vars': test_config.template_vars
                     })
                 gen_map[str(generator_name)] = gen
             test_config.generators = gen_map
@@ -114,11 +152,40 @@ def parse_configuration(node, base_config=None):
         generator_obj = test_config.generators[generator_name]
         test_config.data_driven_generator = generator_obj
         test_config.data_driven_generator_name = generator_name
+        if value.get('concurrency'):
+            test_config.data_driven_concurrency = int(value['concurrency'])
 
     return test_config
 
 
-def parse_testsets(test_structure, test_files=set(), working_directory=None):
+def find_testset_vars(test_structure, working_directory, included=None):
+    """ Names of the $variables used in a testset file and the files it includes,
+        None if a test reads a file which may use more of them """
+    if included is None:
+        included = set()
+    found = set()
+    for node in test_structure:
+        if not isinstance(node, dict):
+            continue
+        node = lowercase_keys(node)
+        if isinstance(node.get('test'), dict) and has_file_reference(node['test']):
+            return None
+        includefile = node.get('include')
+        if isinstance(includefile, str):
+            if includefile[0] != "/":
+                includefile = os.path.join(working_directory, includefile)
+            if includefile not in included:
+                included.add(includefile)
+                subnodes = read_test_file(includefile)
+                sub_found = find_testset_vars(subnodes, working_directory, included)
+                if sub_found is None:
+                    return None
+                found.update(sub_found)
+        find_template_vars(node, found)
+    return found
+
+
+def parse_testsets(test_structure, test_files=None, working_directory=None):
     """ Convert a Python data structure read from validated YAML to a set of structured testsets
     The data structure is assumed to be a list of dictionaries, each of which describes:
         - a tests (test structure)
@@ -136,9 +203,14 @@ def parse_testsets(test_structure, test_files=set(), working_directory=None):
     test_config = TestSetConfig()
     testsets = list()
 
+    if test_files is None:
+        test_files = set()
     if working_directory is None:
-        working_directory = os.path.abspath(os.getcwd())
+        working_directory = os.getcwd()
+    # Always keep an absolute path, so nothing depends on the process cwd at run time
+    working_directory = os.path.abspath(working_directory)
     test_config.working_directory = working_directory
+    test_config.template_vars = find_testset_vars(test_structure, working_directory)
 
     # returns a testconfig and collection of testsets
     assert isinstance(test_structure, list)
@@ -187,24 +259,24 @@ def parse_testsets(test_structure, test_files=set(), working_directory=None):
                         logger.info("Importing test sets: " + importfile)
                         test_files.add(importfile)
                         import_test_structure = read_test_file(importfile)
-                        with CD(os.path.dirname(
-                                os.path.realpath(importfile))):
-                            try:
-                                import_testsets = parse_testsets(
-                                    import_test_structure, test_files)
-                            except Exception as e:
-                                error_info = "Import SubTestSet {} ERROR, msg: {}".format(importfile, str(e))
-                                logger.error(error_info)
-                                raise Exception(error_info)
-                            assert len(import_testsets) == 1
-                            import_testsets[0].config.extract = extract
-                            testset.subtestsets[importfile] = import_testsets[0]
-
-                            subtestset = TestSet()
-                            subtestset.input = input
-                            subtestset.extract = extract
-                            subtestset.file_path = importfile
-                            tests_list.append(subtestset)  # call sub testset is also a test step
+                        try:
+                            import_testsets = parse_testsets(
+                                import_test_structure, test_files,
+                                working_directory=os.path.dirname(
+                                    os.path.realpath(importfile)))
+                        except Exception as e:
+                            error_info = "Import SubTestSet {} ERROR, msg: {}".format(importfile, str(e))
+                            logger.error(error_info)
+                            raise Exception(error_info)
+                        assert len(import_testsets) == 1
+                        import_testsets[0].config.extract = extract
+                        testset.subtestsets[importfile] = import_testsets[0]
+
+                        subtestset = TestSet()
+                        subtestset.input = input
+                        subtestset.extract = extract
+                        subtestset.file_path = importfile
+                        tests_list.append(subtestset)  # call sub testset is also a test step
 
                 # elif key == 'url':  # Simple test, just a GET to a URL
                 #     mytest = HttpTest()
@@ -224,6 +296,8 @@ def parse_testsets(test_structure, test_files=set(), working_directory=None):
                 elif key == 'operation':  # Complex test with additional parameters
                     operation = Operation()
                     operation.config = flatten_dictionaries(node[key])
+                    # Files of operations are relative to the testset file, like generators
+                    operation.config.setdefault('working_directory', working_directory)
                     tests_list.append(operation)
                 elif key == 'config' or key == 'configuration':
                     test_config = parse_configuration(
@@ -248,10 +322,401 @@ def log_failure(failure, context=None, test_config=TestSetConfig()):
         logger.error("Validator/Error details:" + str(failure.details))
 
 
-def run_testset(testset, request_handle=None, test_results=None):
+def run_operation_step(testset, test, context):
+    logger.info("do operation {}, config:{}".format(
+        test.config.get('type'),
+        test.config
+    ))
+    result = TestResult()
+    # result.test_type = "operation"
+    result.testset_name = testset.name
+    result.test_obj = test
+    try:
+        opt_name = test.config.get('type')
+        opt_func = get_operation_function(opt_name)
+        if opt_func is None:
+            raise ValueError("Unknown operation type: {}".format(opt_name))
+        stats = opt_func(test.config, context)
+        if isinstance(stats, dict):  # Counters reported by the operation
+            for key, value in stats.items():
+                result.add_key_field(key, value)
+        result.passed = True
+    except Exception as e:
+        logger.error("Operation {} failed".format(test.config.get('type')))
+        failure = Failure(
+            message=str(e), details=traceback.format_exc(),
+            failure_type=FAILURE_TEST_EXCEPTION)
+        result.failures.append(failure)
+        result.passed = False
+        log_failure(failure, context=context, test_config=testset.config)
+    return result
+
+
+def run_subtestset_step(testset, test, context, request_handle=None,
+                        test_results=None):
+    logger.info("call subtestset {}".format(test.file_path))
+    file_path = test.file_path
+    input = test.input
+    extract = test.extract
+    subtestset = testset.subtestsets.get(file_path)
+    result = TestResult()
+    # result.test_type = "testset"
+    result.test_obj = test
+    result.testset_name = testset.name
+    if subtestset:
+        input = templated_var(input, context)
+        if testset.config.collect_import_result is True:
+            sub_test_results_list = test_results
+        else:
+            sub_test_results_list = None
+        _, extract_data = run_testset(
+            subtestset, request_handle, test_results=sub_test_results_list,
+            input_binds=input)
+        if extract_data:
+            context.bind_variables(extract_data)
+        result.passed = True
+    else:
+        result.passed = False
+    return result
+
+
+def report_test_result(testset, test, result, context, ddt_data=None):
+    """ Log the result of a test run """
+    myconfig = testset.config
+    result.testset_name = testset.name
+    result.data_driven_fields = ddt_data
+    result.test_obj = test
+
+    if not result.passed:  # Print failure, increase failure counts for that test group
+        error_info = result.to_str(verbose=True)
+        logger.error(error_info)
+
+        # Print test failure reasons
+        if result.failures:
+            for failure in result.failures:
+                log_failure(failure, context=context,
+                            test_config=myconfig)
+
+    else:  # Test passed, print results
+        logger.info(result.to_str(verbose=False))
+
+    # Bodies are only needed until the result is logged
+    result.retain_bodies(myconfig.retain_bodies)
+
+
+def stop_on_failure(test, result):
+    if not result.passed and getattr(test, 'stop_on_failure', None):
+        logger.info(
+            'STOP ON FAILURE! stopping test set execution, continuing with other test sets')
+        return True
+    return False
+
+
+def run_test_step(testset, test, context, request_handle=None,
+                  test_results=None, ddt_data=None):
+    """ Run one test of a testset, polling it until its loop_until conditions are met,
+        append its results to test_results and return True to stop the testset """
+    myconfig = testset.config
+
+    if test.test_type == "operation":
+        result = run_operation_step(testset, test, context)
+        test_results.append(result)
+        return False
+
+    if test.test_type == "testset":
+        result = run_subtestset_step(testset, test, context,
+                                     request_handle, test_results)
+        test_results.append(result)
+        return False
+
+    if getattr(test, 'benchmark', None):
+        logger.info("Run benchmark {}".format(test.name))
+        result = test.run_benchmark(test_config=myconfig, context=context,
+                                    handler=request_handle)
+        report_test_result(testset, test, result, context, ddt_data)
+        test_results.append(result)
+        return False
+
+    poller = None  # LoopPoller of a test with loop_until
+    while True:
+        logger.debug("Run {}".format(test.test_type))
+        result = test.run_test(test_config=myconfig, context=context,
+                               handler=request_handle)
+        delay = None
+        if test.loop_until_conditions:
+            if poller is None:
+                poller = LoopPoller(test)
+            delay = poller.poll(result)
+        report_test_result(testset, test, result, context, ddt_data)
+        if result.loop is not True:
+            test_results.append(result)
+            return stop_on_failure(test, result)
+        time.sleep(delay)
+
+
+async def run_test_step_async(testset, test, context, request_handle=None,
+                              test_results=None, ddt_data=None):
+    """ Coroutine version of run_test_step, http tests are awaited
+        and blocking steps run in the default executor """
+    myconfig = testset.config
+    loop = asyncio.get_running_loop()
+
+    if test.test_type == "operation":
+        result = await loop.run_in_executor(None, functools.partial(
+            run_operation_step, testset, test, context))
+        test_results.append(result)
+        return False
+
+    if test.test_type == "testset":
+        result = await loop.run_in_executor(None, functools.partial(
+            run_subtestset_step, testset, test, context,
+            request_handle, test_results))
+        test_results.append(result)
+        return False
+
+    if getattr(test, 'benchmark', None):
+        logger.info("Run benchmark {}".format(test.name))
+        result = await loop.run_in_executor(None, functools.partial(
+            test.run_benchmark, test_config=myconfig, context=context,
+            handler=request_handle))
+        report_test_result(testset, test, result, context, ddt_data)
+        test_results.append(result)
+        return False
+
+    poller = None
+    while True:
+        logger.debug("Run {}".format(test.test_type))
+        result = await test.run_test_async(test_config=myconfig,
+                                           context=context,
+                                           handler=request_handle)
+        delay = None
+        if test.loop_until_conditions:
+            if poller is None:
+                poller = LoopPoller(test)
+            delay = poller.poll(result)
+        report_test_result(testset, test, result, context, ddt_data)
+        if result.loop is not True:
+            test_results.append(result)
+            return stop_on_failure(test, result)
+        await asyncio.sleep(delay)
+
+
+def run_tests(testset, tests, context, request_handle=None, test_results=None,
+              ddt_data=None):
+    """ Run the tests of a testset in order against one context,
+        ddt_data is the data driven row bound to context, if any """
+    if test_results is None:
+        test_results = list()
+    for test in tests:
+        if run_test_step(testset, test, context, request_handle,
+                         test_results, ddt_data):
+            break
+    return test_results
+
+
+async def run_tests_async(testset, tests, context, request_handle=None,
+                          test_results=None, ddt_data=None):
+    """ Coroutine version of run_tests """
+    if test_results is None:
+        test_results = list()
+    for test in tests:
+        if await run_test_step_async(testset, test, context, request_handle,
+                                     test_results, ddt_data):
+            break
+    return test_results
+
+
+def run_tests_concurrent(testset, tests, context, request_handle=None,
+                         test_results=None, ddt_data=None):
+    """ Run the tests of a testset in a thread pool of test_concurrency threads,
+        a test starts when the tests it depends on are done, see scheduler.
+        Results are appended in test order """
+    if test_results is None:
+        test_results = list()
+    concurrency = testset.config.test_concurrency
+    scheduler = TestScheduler(tests)
+    step_results = [list() for t in tests]
+    running = dict()  # Future to test index
+    stopped = False
+
+    with ThreadPoolExecutor(max_workers=concurrency,
+                            thread_name_prefix="notest-test") as executor:
+        while True:
+            if not stopped:
+                for index in scheduler.start_ready(concurrency - len(running)):
+                    future = executor.submit(
+                        run_test_step, testset, tests[index], context,
+                        request_handle, step_results[index], ddt_data)
+                    running[future] = index
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                scheduler.finish(running.pop(future))
+                if future.result():
+                    stopped = True
+
+    for results in step_results:
+        test_results.extend(results)
+    return test_results
+
+
+async def run_tests_concurrent_async(testset, tests, context,
+                                     request_handle=None, test_results=None,
+                                     ddt_data=None):
+    """ Coroutine version of run_tests_concurrent, at most test_concurrency tests in flight """
+    if test_results is None:
+        test_results = list()
+    concurrency = testset.config.test_concurrency
+    scheduler = TestScheduler(tests)
+    step_results = [list() for t in tests]
+    running = dict()  # Task to test index
+    stopped = False
+
+    try:
+        while True:
+            if not stopped:
+                for index in scheduler.start_ready(concurrency - len(running)):
+                    task = asyncio.ensure_future(run_test_step_async(
+                        testset, tests[index], context, request_handle,
+                        step_results[index], ddt_data))
+                    running[task] = index
+            if not running:
+                break
+            done, _ = await asyncio.wait(running,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                scheduler.finish(running.pop(task))
+                if task.result():
+                    stopped = True
+    finally:
+        for task in running:
+            task.cancel()
+
+    for results in step_results:
+        test_results.extend(results)
+    return test_results
+
+
+def run_tests_scheduled(testset, tests, context, request_handle=None,
+                        test_results=None, ddt_data=None):
+    """ Run the tests of a testset, concurrently if test_concurrency > 1 """
+    myconfig = testset.config
+    if (myconfig.test_concurrency or 1) <= 1 or len(tests) <= 1 \
+            or myconfig.interactive:
+        return run_tests(testset, tests, context, request_handle,
+                         test_results=test_results, ddt_data=ddt_data)
+    if myconfig.request_client != "async":
+        return run_tests_concurrent(testset, tests, context, request_handle,
+                                    test_results=test_results,
+                                    ddt_data=ddt_data)
+
+    from notest.clients.async_client import close_loop_session
+
+    async def run_all():
+        try:
+            return await run_tests_concurrent_async(
+                testset, tests, context, request_handle,
+                test_results=test_results, ddt_data=ddt_data)
+        finally:
+            await close_loop_session()
+
+    return asyncio.run(run_all())
+
+
+def check_data_driven_row(ddt_data):
+    if not isinstance(ddt_data, dict):
+        raise Exception("Data Driven Generator must return a dict, not {}".format(type(ddt_data)))
+    logger.info("*************************")
+    logger.info("Data Driven: {}".format(ddt_data))
+
+
+def run_data_driven_rows(testset, context, request_handle=None,
+                         test_results=None, concurrency=1):
+    """ Run the data driven rows of a testset concurrently in a thread pool.
+        Each row runs on a fork of context and forks of the tests,
+        results are appended in row order """
+    if test_results is None:
+        test_results = list()
+
+    def run_row(ddt_data):
+        row_context = context.fork()
+        row_context.bind_variables(ddt_data)
+        row_tests = [t.fork() for t in testset.tests]
+        row_results = run_tests(testset, row_tests, row_context,
+                                request_handle, list(), ddt_data)
+        return row_results, row_context
+
+    last_context = None
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=concurrency,
+                            thread_name_prefix="notest-ddt") as executor:
+        for ddt_data in testset.config.data_driven_generator:
+            check_data_driven_row(ddt_data)
+            pending.append(executor.submit(run_row, ddt_data))
+            # Keep a bounded number of rows in flight, large sources are not read ahead
+            while len(pending) > concurrency * 2:
+                row_results, last_context = pending.popleft().result()
+                test_results.extend(row_results)
+        while pending:
+            row_results, last_context = pending.popleft().result()
+            test_results.extend(row_results)
+
+    # Like a sequential run, variables of the last row are visible afterwards
+    if last_context is not None:
+        context.bind_variables(last_context.variables.maps[0])
+    return test_results
+
+
+def run_data_driven_rows_async(testset, context, request_handle=None,
+                               test_results=None, concurrency=1):
+    """ Run the data driven rows of a testset as coroutines on one event loop,
+        at most concurrency rows in flight, results are appended in row order """
+    from notest.clients.async_client import close_loop_session
+
+    if test_results is None:
+        test_results = list()
+
+    async def run_row(ddt_data):
+        row_context = context.fork()
+        row_context.bind_variables(ddt_data)
+        row_tests = [t.fork() for t in testset.tests]
+        row_results = await run_tests_async(testset, row_tests, row_context,
+                                            request_handle, list(), ddt_data)
+        return row_results, row_context
+
+    async def run_rows():
+        last_context = None
+        pending = deque()
+        try:
+            for ddt_data in testset.config.data_driven_generator:
+                check_data_driven_row(ddt_data)
+                pending.append(asyncio.ensure_future(run_row(ddt_data)))
+                while len(pending) >= concurrency:
+                    row_results, last_context = await pending.popleft()
+                    test_results.extend(row_results)
+            while pending:
+                row_results, last_context = await pending.popleft()
+                test_results.extend(row_results)
+        finally:
+            for task in pending:
+                task.cancel()
+            await close_loop_session()
+        return last_context
+
+    last_context = asyncio.run(run_rows())
+    if last_context is not None:
+        context.bind_variables(last_context.variables.maps[0])
+    return test_results
+
+
+def run_testset(testset, request_handle=None, test_results=None,
+                input_binds=None):
     mytests = testset.tests
     myconfig = testset.config
     context = Context()
+    if myconfig.retry_budget_limit is not None:  # Each run of the testset gets the whole budget
+        myconfig.retry_budget = RetryBudget(myconfig.retry_budget_limit)
 
     if test_results is None:
         test_results = list()
@@ -259,6 +724,8 @@ def run_testset(testset, request_handle=None, test_results=None):
     # Bind variables & add generators if pertinent
     if myconfig.variable_binds:
         context.bind_variables(myconfig.variable_binds)
+    if input_binds:
+        context.bind_variables(input_binds)
     if myconfig.generators:
         for key, value in myconfig.generators.items():
             context.add_generator(key, value)
@@ -269,124 +736,25 @@ def run_testset(testset, request_handle=None, test_results=None):
         # test set
         return
 
-    def none_generator():
-        yield None
-
-    data_driven_generator = None
-    if myconfig.data_driven_generator:
-        data_driven_generator = myconfig.data_driven_generator
-    else:
-        data_driven_generator = none_generator()
-
-    for ddt_data in data_driven_generator:
-        if ddt_data:
-            if not isinstance(ddt_data, dict):
-                raise Exception("Data Driven Generator must return a dict, not {}".format(type(ddt_data)))
-            logger.info("*************************")
-            logger.info("Data Driven: {}".format(ddt_data))
+    concurrency = myconfig.data_driven_concurrency or 1
+    if myconfig.data_driven_generator and concurrency > 1 \
+            and myconfig.request_client == "async":
+        run_data_driven_rows_async(testset, context, request_handle,
+                                   test_results=test_results,
+                                   concurrency=concurrency)
+    elif myconfig.data_driven_generator and concurrency > 1:
+        run_data_driven_rows(testset, context, request_handle,
+                             test_results=test_results,
+                             concurrency=concurrency)
+    elif myconfig.data_driven_generator:
+        for ddt_data in myconfig.data_driven_generator:
+            check_data_driven_row(ddt_data)
             context.bind_variables(ddt_data)
-
-        # Run tests, collecting statistics as needed
-        index = 0
-        loop_count = 0
-
-        while index < len(mytests) and loop_count < 100:
-            test = mytests[index]
-            if hasattr(test.testset_config, "loop_interval"):
-                loop_interval = test.testset_config.loop_interval
-            else:
-                loop_interval = 2
-
-            result = None
-
-            if test.test_type == "operation":
-                logger.info("do operation {}, config:{}".format(
-                    test.config.get('type'),
-                    test.config
-                ))
-                result = TestResult()
-                # result.test_type = "operation"
-                result.testset_name = testset.name
-                result.test_obj = test
-                try:
-                    opt_name = test.config.get('type')
-                    opt_func = get_operation_function(opt_name)
-                    opt_func(test.config, context)
-                    result.passed = True
-                except Exception as e:
-                    result.passed = False
-                test_results.append(result)
-
-            elif test.test_type == "testset":
-                logger.info("call subtestset {}".format(test.file_path))
-                file_path = test.file_path
-                input = test.input
-                extract = test.extract
-                subtestset = testset.subtestsets.get(file_path)
-                result = TestResult()
-                # result.test_type = "testset"
-                result.test_obj = test
-                result.testset_name = testset.name
-                if subtestset:
-                    input = templated_var(input, context)
-                    if input:
-                        if not subtestset.config.variable_binds:
-                            subtestset.config.variable_binds = input
-                        else:
-                            subtestset.config.variable_binds.update(input)
-                    if myconfig.collect_import_result is True:
-                        sub_test_results_list = test_results
-                    else:
-                        sub_test_results_list = None
-                    _, extract_data = run_testset(
-                        subtestset, request_handle, test_results=sub_test_results_list)
-                    if extract_data:
-                        context.variables.update(extract_data)
-                    result.passed = True
-                else:
-                    result.passed = False
-                test_results.append(result)
-
-            else:
-                logger.debug("Run {}".format(test.test_type))
-                test.reload()
-                result = test.run_test(test_config=myconfig, context=context,
-                                       handler=request_handle)
-
-                result.testset_name = testset.name
-                result.data_driven_fields = ddt_data
-                result.test_obj = test
-
-                if not result.passed:  # Print failure, increase failure counts for that test group
-                    error_info = result.to_str(verbose=True)
-                    logger.error(error_info)
-
-                    # Print test failure reasons
-                    if result.failures:
-                        for failure in result.failures:
-                            log_failure(failure, context=context,
-                                        test_config=myconfig)
-
-                else:  # Test passed, print results
-                    logger.info(result.to_str(verbose=False))
-
-                # Add results to the resultset
-                if result.loop is False:
-                    test_results.append(result)
-
-                # handle stop_on_failure flag
-                if not result.passed and test.stop_on_failure is not None and test.stop_on_failure:
-                    logger.info(
-                        'STOP ON FAILURE! stopping test set execution, continuing with other test sets')
-                    break
-
-            if result and result.loop is True:
-                loop_count += 1
-                time.sleep(loop_interval)
-                continue
-            else:
-                index += 1
-                continue
+            run_tests_scheduled(testset, mytests, context, request_handle,
+                                test_results=test_results, ddt_data=ddt_data)
+    else:
+        run_tests_scheduled(testset, mytests, context, request_handle,
+                            test_results=test_results)
 
     extract_data = dict()
     if testset.config.extract:
@@ -399,13 +767,56 @@ def run_testset(testset, request_handle=None, test_results=None):
     return test_results, extract_data
 
 
-def run_testsets(testsets):
-    """ Execute a set of tests, using given TestSet list input """
-    request_handle = None
-    total_results = list()
-
-    for testset in testsets:
-        run_testset(testset, request_handle=request_handle, test_results=total_results)
+def run_isolated_testset(testset, request_handle=None):
+    """ Run one testset with its own Context and result list,
+        used as the unit of work of the run_testsets worker pool """
+    test_results = list()
+    run_testset(testset, request_handle=request_handle, test_results=test_results)
+    return test_results
+
+
+def run_testsets(testsets, workers=None, test_results=None):
+    """ Execute a set of tests, using given TestSet list input
+        With workers > 1, testsets run concurrently in a thread pool,
+        results are merged into total_results in the order of testsets.
+        test_results may be a results sink such as ResultsWriter instead of a list.
+        One ConnectionPoolManager is shared by the whole run and closed at the end """
+    request_handle = ConnectionPoolManager()
+    try:
+        return run_testsets_with_handle(testsets, request_handle, workers,
+                                        test_results=test_results)
+    finally:
+        request_handle.close()
+
+
+def run_testsets_with_handle(testsets, request_handle, workers=None,
+                             test_results=None):
+    total_results = test_results if test_results is not None else list()
+
+    workers = int(workers) if workers else 1
+    if workers > 1 and any(t.config.interactive for t in testsets):
+        logger.warning("Interactive mode can not run with workers, run testsets one by one")
+        workers = 1
+
+    if workers <= 1 or len(testsets) <= 1:
+        for testset in testsets:
+            run_testset(testset, request_handle=request_handle, test_results=total_results)
+        return total_results
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(testsets)),
+                            thread_name_prefix="notest-worker") as executor:
+        futures = [executor.submit(run_isolated_testset, testset, request_handle)
+                   for testset in testsets]
+        errors = list()
+        for testset, future in zip(testsets, futures):
+            # A testset raising does not drop the results of the others
+            try:
+                total_results.extend(future.result())
+            except Exception as e:
+                logger.error("Testset {} failed: {}".format(testset.name, e))
+                errors.append(e)
+    if errors:
+        raise errors[0]
 
     return total_results
 
@@ -5,6 +5,8 @@ import logging
 
 from notest.master import run_testsets, parse_testsets
 from notest.config_loader import load_args, load_config_file
+from notest.lib.utils import read_test_file
+from notest.lib import file_cache
 
 sys.path.append(os.path.dirname(os.path.dirname(
     os.path.realpath(__file__))))
@@ -39,7 +41,8 @@ def notest_run(args):
         Execute a test against the given base url.
 
         Keys allowed for args:
-            test_structure          - REQUIRED - Test file (yaml/json)
+            test_structure          - REQUIRED - Test file (yaml/json), unless test_files is set
+            test_files          - OPTIONAL - list of test file paths, each one parsed as its own testset
             working_directory      - OPTIONAL
             override_config_variable_binds  - OPTIONAL - override variable_binds of config in test file
             interactive   - OPTIONAL - mode that prints info before and after test exectuion and pauses for user input for each test
@@ -52,12 +55,16 @@ def notest_run(args):
             default_base_url   - OPTIONAL
             request_client   - OPTIONAL  default requests
             loop_interval   - OPTIONAL   default 2s
+            workers   - OPTIONAL   default 1, run testsets concurrently with N workers
+            test_results   - OPTIONAL   results sink with append/extend, such as ResultsWriter, default a list
+            parse_cache_dir   - OPTIONAL   folder of the on disk cache of parsed test files, disabled by default
         """
     # import pprint
     # pprint.pprint(args)
 
+    test_files = args.get("test_files")
     test_structure = args.get("test_structure")
-    assert test_structure
+    assert test_structure or test_files
 
     config_file = None
     if 'config_file' in args and args['config_file'] is not None:
@@ -71,18 +78,29 @@ def notest_run(args):
                 config_from_file[k] = v
         args = config_from_file
 
+    if args.get('parse_cache_dir'):
+        file_cache.cache_dir = os.path.abspath(args['parse_cache_dir'])
+
     working_directory = None
     if 'working_directory' in args and args['working_directory']:
         working_directory = args['working_directory']
 
-    testsets = parse_testsets(test_structure,
-                              working_directory=working_directory)
+    if test_files:
+        testsets = list()
+        for test_file in test_files:
+            testsets.extend(parse_testsets(
+                read_test_file(test_file),
+                working_directory=os.path.dirname(os.path.abspath(test_file))))
+    else:
+        testsets = parse_testsets(test_structure,
+                                  working_directory=working_directory)
 
     # Override configs from command line if config set
     for testset in testsets:
         load_args(testset, args)
 
     # Execute all testsets
-    total_results = run_testsets(testsets)
+    total_results = run_testsets(testsets, workers=args.get('workers'),
+                                 test_results=args.get('test_results'))
 
     return total_results
\ No newline at end of file
@@ -1,6 +1,8 @@
 import sys
 import os
+import ast
 import logging
+import threading
 
 logger = logging.Logger("plugin_registry")
 
@@ -17,6 +19,20 @@ from notest import test_runners
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 
+def get_extension_applies():
+    """ Extensions are registered by applying a register function to sets of
+        registry name/function pairs inside an object """
+    return {
+        'TEST_RUNNERS': test_runners.register_test_runner,
+        'VALIDATORS': validators.register_validator,
+        'COMPARATORS': validators.register_comparator,
+        'VALIDATOR_TESTS': validators.register_test,
+        'EXTRACTORS': validators.register_extractor,
+        'GENERATORS': generators.register_generator,
+        'OPERATIONS': operations.register_operations
+    }
+
+
 def register_extensions(modules):
     """ Import the modules and register their respective extensions """
     if isinstance(modules, str):  # Catch supplying just a string arg
@@ -29,20 +45,8 @@ def register_extensions(modules):
         # Necessary to get the root module back
         module = __import__(ext, globals(), locals(), package)
 
-        # Extensions are registered by applying a register function to sets of
-        # registry name/function pairs inside an object
-        extension_applies = {
-            'TEST_RUNNERS': test_runners.register_test_runner,
-            'VALIDATORS': validators.register_validator,
-            'COMPARATORS': validators.register_comparator,
-            'VALIDATOR_TESTS': validators.register_test,
-            'EXTRACTORS': validators.register_extractor,
-            'GENERATORS': generators.register_generator,
-            'OPERATIONS': operations.register_operations
-        }
-
         has_registry = False
-        for registry_name, register_function in extension_applies.items():
+        for registry_name, register_function in get_extension_applies().items():
             if hasattr(module, registry_name):
                 registry = getattr(module, registry_name)
                 for key, val in registry.items():
@@ -59,20 +63,110 @@ def register_extensions(modules):
                     ext))
 
 
+def get_literal_string(node):
+    """ Value of a string literal node, None for anything else
+        Python < 3.8 parses string literals as ast.Str """
+    if sys.version_info < (3, 8):
+        return node.s if isinstance(node, ast.Str) else None
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    return None
+
+
+def read_registry_keys(path):
+    """ Registry names of an extension module, read from its source without importing it
+        Registries must be module level dict literals with string keys, like
+        VALIDATORS = {'json_schema': JsonSchemaValidator.parse}
+        Returns None if a registry is built any other way """
+    with open(path, 'r') as f:
+        tree = ast.parse(f.read(), filename=path)
+    registry_names = get_extension_applies()
+    manifest = dict()
+    for node in tree.body:
+        if not isinstance(node, ast.Assign):
+            continue
+        for target in node.targets:
+            if not isinstance(target, ast.Name) or target.id not in registry_names:
+                continue
+            if not isinstance(node.value, ast.Dict):
+                return None
+            keys = list()
+            for key in node.value.keys:
+                name = get_literal_string(key) if key is not None else None
+                if name is None:
+                    return None
+                keys.append(name)
+            manifest[target.id] = keys
+    return manifest
+
+
+class LazyExtension:
+    """ Extension module imported on first use of one of its registry entries """
+
+    def __init__(self, name):
+        self.name = name
+        self.module = None
+        self.lock = threading.Lock()
+
+    def load(self):
+        with self.lock:
+            if self.module is None:
+                logger.info("Load extension {}".format(self.name))
+                self.module = __import__(self.name)
+        return self.module
+
+    def get(self, registry_name, key):
+        return getattr(self.load(), registry_name)[key]
+
+
+class LazyRegistryEntry:
+    """ Registered in place of an extension function, imports the extension when called """
+
+    def __init__(self, extension, registry_name, key):
+        self.extension = extension
+        self.registry_name = registry_name
+        self.key = key
+        self.function = None
+
+    def __call__(self, *args, **kwargs):
+        if self.function is None:
+            self.function = self.extension.get(self.registry_name, self.key)
+        return self.function(*args, **kwargs)
+
+
+def register_lazy_extension(name, manifest):
+    """ Register the entries of an extension module without importing it """
+    if not any(manifest.values()):
+        raise ImportError(
+            "Extension to register did not contain any registries: {0}".format(
+                name))
+    extension = LazyExtension(name)
+    for registry_name, register_function in get_extension_applies().items():
+        for key in manifest.get(registry_name, list()):
+            register_function(key, LazyRegistryEntry(extension, registry_name, key))
+            logger.info("Register lazy {} {} to module {}".format(
+                registry_name.lower(), key, name))
+
+
 def auto_load_ext(ext_dir=os.path.join(BASE_DIR, "ext")):
+    """ Register the extension modules of ext_dir, modules are imported on first use
+        unless their registries can not be read from their source """
     if not os.path.isdir(ext_dir):
         return
     sys.path.append(ext_dir)
-    for fname in os.listdir(ext_dir):
+    for fname in sorted(os.listdir(ext_dir)):
         path = os.path.join(ext_dir, fname)
         if os.path.isfile(path) and fname.endswith(".py") and \
                 fname != "__init__.py":
-            module_name = fname[:-3].split(os.path.sep)
+            module_name = fname[:-3]
             try:
-                register_extensions(".".join(module_name))
-            except ImportError as e:
+                manifest = read_registry_keys(path)
+                if manifest is None:
+                    register_extensions(module_name)
+                else:
+                    register_lazy_extension(module_name, manifest)
+            except (ImportError, SyntaxError) as e:
                 logger.error(str(e))
-    print()
 
 
 auto_load_ext(ext_dir=os.path.join(BASE_DIR, "ext"))
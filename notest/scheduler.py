@@ -0,0 +1,138 @@
+import re
+import logging
+
+"""
+Dependency graph of the tests of a testset, for test_concurrency > 1
+- A test reads the $variables templated anywhere in its definition
+- A test writes its variable_binds, generator_binds and extract_binds
+- Http requests read the server state, requests with unsafe methods (POST, DELETE...) write it
+- A test runs after every earlier test it reads from, writes over, or names in depends_on
+- Operations, imported testsets, benchmarks and bodies read from files can not be analyzed,
+  they run alone, after every earlier test and before every later one
+"""
+
+logger = logging.getLogger('notest.scheduler')
+
+# $var or ${var}, same identifiers as string.Template, $$ is an escaped $
+TEMPLATE_VAR_REGEX = re.compile(
+    r'\$(?:\$|\{([_a-zA-Z][_a-zA-Z0-9]*)\}|([_a-zA-Z][_a-zA-Z0-9]*))')
+
+GENERATOR_PREFIX = "generator:"  # Generators are read and written by each test binding them
+SERVER_STATE = "server:"  # Server side state, changed by unsafe http methods
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+def find_template_vars(node, found=None):
+    """ Names of the variables templated in the strings of a parsed yaml node """
+    if found is None:
+        found = set()
+    if isinstance(node, str):
+        if '$' in node:
+            for match in TEMPLATE_VAR_REGEX.finditer(node):
+                name = match.group(1) or match.group(2)
+                if name:
+                    found.add(name)
+    elif isinstance(node, dict):
+        for key, value in node.items():
+            find_template_vars(key, found)
+            find_template_vars(value, found)
+    elif isinstance(node, (list, tuple)):
+        for item in node:
+            find_template_vars(item, found)
+    return found
+
+
+def has_file_reference(node):
+    """ Content read from a file may be templated with variables we can not see """
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if str(key).lower() == 'file' or has_file_reference(value):
+                return True
+    elif isinstance(node, (list, tuple)):
+        return any(has_file_reference(item) for item in node)
+    return False
+
+
+class TestAccess:
+    """ Variables read and written by a test, barrier if they are unknown """
+
+    def __init__(self, test):
+        self.name = getattr(test, 'name', None)
+        self.depends_on = getattr(test, 'depends_on', None) or list()
+        self.reads = set()
+        self.writes = set()
+        node = getattr(test, 'original_node', None)
+        self.barrier = test.test_type in ("operation", "testset") \
+            or node is None \
+            or bool(getattr(test, 'benchmark', None)) \
+            or has_file_reference(node)
+        if self.barrier:
+            return
+
+        find_template_vars(node, self.reads)
+        url = getattr(test, 'url', None)
+        if isinstance(url, str) and url.startswith('/'):
+            self.reads.add('default_base_url')
+        if url is not None:
+            self.reads.add(SERVER_STATE)
+            if str(getattr(test, 'method', 'GET')).upper() not in SAFE_METHODS:
+                self.writes.add(SERVER_STATE)
+        for key in (getattr(test, 'variable_binds', None) or dict()):
+            self.writes.add(str(key))
+        for key, generator in (getattr(test, 'generator_binds', None) or dict()).items():
+            self.writes.add(str(key))
+            self.reads.add(GENERATOR_PREFIX + str(generator))
+            self.writes.add(GENERATOR_PREFIX + str(generator))
+        for key in (getattr(test, 'extract_binds', None) or dict()):
+            self.writes.add(str(key))
+
+    def conflicts(self, later):
+        """ True if the later test must wait for this one """
+        if self.barrier or later.barrier:
+            return True
+        return bool(self.writes & later.reads
+                    or self.writes & later.writes
+                    or self.reads & later.writes)
+
+
+def build_dependencies(tests):
+    """ List of the indexes of the earlier tests each test depends on """
+    accesses = [TestAccess(test) for test in tests]
+    dependencies = list()
+    for index, access in enumerate(accesses):
+        depends = set()
+        for name in access.depends_on:
+            named = [i for i in range(index) if accesses[i].name == name]
+            if not named:
+                raise ValueError("Test {} depends_on {}, no such test before it".format(
+                    access.name, name))
+            depends.update(named)
+        for earlier in range(index):
+            if accesses[earlier].conflicts(access):
+                depends.add(earlier)
+        dependencies.append(depends)
+    return dependencies
+
+
+class TestScheduler:
+    """ Hands out the indexes of tests whose dependencies are done, not thread safe """
+
+    def __init__(self, tests):
+        self.dependencies = build_dependencies(tests)
+        self.waiting = list(range(len(tests)))
+        self.done = set()
+
+    def start_ready(self, limit=None):
+        """ Mark up to limit ready tests as started and return their indexes, in test order """
+        ready = list()
+        for index in self.waiting:
+            if limit is not None and len(ready) >= limit:
+                break
+            if self.dependencies[index] <= self.done:
+                ready.append(index)
+        for index in ready:
+            self.waiting.remove(index)
+        return ready
+
+    def finish(self, index):
+        self.done.add(index)
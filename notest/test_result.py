@@ -1,23 +1,37 @@
+import gzip
 import json
 import os
+import time
+import threading
+
+
+RETAIN_BODIES_NEVER = "never"
+RETAIN_BODIES_ON_FAILURE = "on_failure"
+RETAIN_BODIES_ALWAYS = "always"
+RETAIN_BODIES_POLICIES = (RETAIN_BODIES_NEVER, RETAIN_BODIES_ON_FAILURE,
+                          RETAIN_BODIES_ALWAYS)
+BODY_FIELDS = ("request_body", "response_body")
 
 
 class TestResult:
-    """ Encapsulates everything about a test response """
-    testset_name = None
-    test_name = None
-    test_type = None
-    group = "default"
-    data_driven_fields = None
-    ref_test_obj = None  # Test run obj
-    passed = False
-    failures = None
-    loop = False
-    key_fields = dict()   # key fields such as url for http request
-    verbose_fields = dict()   # verbose fields such as headers for http request
+    """ Encapsulates everything about a test response
+        Slots based and per instance fields, name/type/group of the test are copied
+        so the result keeps no reference to the test object """
+    __slots__ = ("testset_name", "test_name", "test_type", "group",
+                 "data_driven_fields", "passed", "failures", "loop",
+                 "key_fields", "verbose_fields")
 
     def __init__(self):
+        self.testset_name = None
+        self.test_name = None
+        self.test_type = None
+        self.group = "default"
+        self.data_driven_fields = None
+        self.passed = False
         self.failures = list()
+        self.loop = False
+        self.key_fields = dict()   # key fields such as url for http request
+        self.verbose_fields = dict()   # verbose fields such as headers for http request
 
     def add_key_field(self, key, value):
         if isinstance(value, bytes):
@@ -29,18 +43,27 @@ class TestResult:
             value = value.decode()
         self.verbose_fields[key] = value
 
-    @property
-    def test_obj(self):
-        return self.ref_test_obj
-
-    @test_obj.setter
-    def test_obj(self, test_obj):
-        self.ref_test_obj = test_obj
+    def set_test_obj(self, test_obj):
         self.test_type = test_obj.test_type
         self.group = test_obj.group
         self.test_name = test_obj.name
 
+    test_obj = property(fset=set_test_obj,
+                        doc="Write only, copies the fields of the test run obj")
+
+    def retain_bodies(self, policy=RETAIN_BODIES_ALWAYS):
+        """ Drop request/response bodies once the result is reported,
+            policy is one of never, on_failure, always """
+        if policy == RETAIN_BODIES_ALWAYS:
+            return
+        if policy == RETAIN_BODIES_ON_FAILURE and self.passed is False:
+            return
+        for field in BODY_FIELDS:
+            self.verbose_fields.pop(field, None)
+
     def __getattr__(self, attribute):
+        if attribute in TestResult.__slots__:  # unset slot, e.g. while copying
+            raise AttributeError(attribute)
         if attribute in self.key_fields:
             return self.key_fields[attribute]
         if attribute in self.verbose_fields:
@@ -70,11 +93,6 @@ class TestResult:
 
     def to_str(self, verbose=False):
         msg = list()
-        if self.ref_test_obj:
-            self.test_type = self.ref_test_obj.test_type
-            self.group = self.ref_test_obj.group
-            self.test_name = self.ref_test_obj.name
-
         msg.append("\n====================")
         if self.test_name:
             msg.append("Name: {}".format(self.test_name))
@@ -99,6 +117,38 @@ class TestResult:
         return self.to_str(verbose=True)
 
 
+class BenchmarkResult(TestResult):
+    """ Result of a benchmark: latency percentiles (seconds), throughput (runs/second)
+        and error rate of repeated runs of one test, all stored as key fields """
+    __slots__ = ()
+
+    def __init__(self):
+        super().__init__()
+        self.test_type = "benchmark"
+
+    def set_test_obj(self, test_obj):
+        self.group = test_obj.group
+        self.test_name = test_obj.name
+
+    test_obj = property(fset=set_test_obj,
+                        doc="Write only, copies the fields of the benchmarked test")
+
+    def to_str(self, verbose=False):
+        msg = list()
+        msg.append("\n====================")
+        msg.append("Benchmark: {}".format(self.test_name))
+        msg.append("TestSet: {}".format(self.testset_name))
+        if not self.passed:
+            msg.append("Failures : {}".format([str(f) for f in self.failures]))
+        for k, v in self.key_fields.items():
+            if isinstance(v, float):
+                v = round(v, 6)
+            msg.append("{}: {}".format(k, v))
+        msg.append("Passed : {}".format(self.passed))
+        msg.append("====================\n")
+        return "\n".join(msg)
+
+
 class TestResultsAnalyzer:
     def __init__(self, total_results):
         self.total_results = total_results
@@ -161,17 +211,139 @@ class TestResultsAnalyzer:
         print("Test Results saved in {}".format(file_path))
 
 
-def show_total_results(total_results):
-    analyzer = TestResultsAnalyzer(total_results)
-    cases_by_groups = analyzer.get_cases_group_by("group")
+class ResultsSummary:
+    """ Pass/fail counts per group, all show_total_results needs to print """
 
-    # Print summary results
-    for group in sorted(cases_by_groups.keys()):
-        failed_count = len(cases_by_groups[group]["failed"])
-        passed_count = len(cases_by_groups[group]["passed"])
+    def __init__(self):
+        self.groups = dict()  # {"group1": {"passed": 3, "failed": 1}, ...}
+        self.test_count = 0
+        self.failed_cases_count = 0
+
+    def add(self, group, passed):
+        counts = self.groups.get(group)
+        if counts is None:
+            counts = self.groups[group] = {"passed": 0, "failed": 0}
+        self.test_count += 1
+        if passed is False:
+            counts["failed"] += 1
+            self.failed_cases_count += 1
+        else:
+            counts["passed"] += 1
+
+    def add_result(self, result):
+        self.add(result.group, result.passed)
+
+    def get_failed_cases_count(self):
+        return self.failed_cases_count
+
+    def show(self):
+        # Print summary results
+        for group in sorted(self.groups.keys(), key=str):
+            failed_count = self.groups[group]["failed"]
+            passed_count = self.groups[group]["passed"]
+
+            passfail = {True: 'SUCCEEDED: ', False: 'FAILED: '}
+            output_string = "Test Group {0} {1}: {2}/{3} Tests Passed!".format(
+                group, passfail[failed_count == 0], passed_count, passed_count+failed_count)
+
+            print(output_string)
+
+
+class ResultsWriter:
+    """ Incremental results sink, writes each result as one json line when it completes
+        Only a ResultsSummary is kept in memory, so it can replace the results list of a run
+        File is gzip compressed if compress is True or file_path ends with .gz
+        Lines are flushed every flush_every results or flush_interval seconds, and on failures
+    """
+
+    def __init__(self, file_path="test_results.jsonl", compress=None,
+                 flush_every=100, flush_interval=5.0):
+        self.file_path = os.path.abspath(file_path)
+        if compress is None:
+            compress = file_path.endswith(".gz")
+        if compress:
+            self.fd = gzip.open(self.file_path, "wt", encoding="utf-8")
+        else:
+            self.fd = open(self.file_path, "w", encoding="utf-8")
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.summary = ResultsSummary()
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.last_flush = time.monotonic()
 
-        passfail = {True: 'SUCCEEDED: ', False: 'FAILED: '}
-        output_string = "Test Group {0} {1}: {2}/{3} Tests Passed!".format(
-            group, passfail[failed_count == 0], passed_count, passed_count+failed_count)
+    def append(self, result):
+        line = json.dumps(result.to_dict(dict_failures=True), default=str)
+        with self.lock:
+            self.fd.write(line)
+            self.fd.write("\n")
+            self.summary.add_result(result)
+            self.pending += 1
+            if result.passed is False or self.pending >= self.flush_every \
+                    or time.monotonic() - self.last_flush >= self.flush_interval:
+                self.flush_locked()
 
-        print(output_string)
\ No newline at end of file
+    def extend(self, results):
+        for result in results:
+            self.append(result)
+
+    def flush(self):
+        with self.lock:
+            self.flush_locked()
+
+    def flush_locked(self):
+        self.fd.flush()
+        self.pending = 0
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        with self.lock:
+            if not self.fd.closed:
+                self.fd.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, etype, value, traceback):
+        self.close()
+
+
+def read_results(file_path):
+    """ Iterate over the result dicts of a json lines results file, gzip or not
+        Lines truncated by a killed run are skipped """
+    with open(file_path, "rb") as fd:
+        compressed = fd.read(2) == b"\x1f\x8b"
+    opener = gzip.open if compressed else open
+    with opener(file_path, "rt", encoding="utf-8") as fd:
+        try:
+            for line in fd:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+        except EOFError:  # gzip stream of a killed run
+            return
+
+
+def load_results_summary(file_path):
+    """ Rebuild the summary of a run from its json lines results file """
+    summary = ResultsSummary()
+    for result in read_results(file_path):
+        summary.add(result.get("group"), result.get("passed"))
+    return summary
+
+
+def show_total_results(total_results):
+    if isinstance(total_results, ResultsWriter):
+        total_results.summary.show()
+        return
+    if isinstance(total_results, ResultsSummary):
+        total_results.show()
+        return
+    summary = ResultsSummary()
+    for result in total_results:
+        summary.add_result(result)
+    summary.show()
\ No newline at end of file
@@ -2,6 +2,8 @@ import json
 
 from notest.common_test import CommonTest
 from notest.lib.parsing import safe_to_json
+from notest.http_test_runner.http_retry import DEFAULT_RETRY_BACKOFF, \
+    DEFAULT_RETRY_BACKOFF_FACTOR, DEFAULT_RETRY_MAX_DELAY
 
 DEFAULT_TIMEOUT = 30
 
@@ -11,10 +13,20 @@ class TestSetConfig:
     testset_name = None
     timeout = DEFAULT_TIMEOUT  # timeout of tests, in seconds
     request_client = None  # requests or pycurl
-    retries = 0  # Retries on failures
+    retries = 0  # Retries of a request on connection errors, timeouts, 5xx and 429
+    retry_on = None  # Conditions to retry on, see http_retry, all if None
+    retry_backoff = DEFAULT_RETRY_BACKOFF  # seconds, first retry delay
+    retry_backoff_factor = DEFAULT_RETRY_BACKOFF_FACTOR
+    retry_max_delay = DEFAULT_RETRY_MAX_DELAY
+    retry_budget_limit = None  # Max retries of one testset run, unlimited if None
+    retry_budget = None  # RetryBudget of the current run, shared by its tests
+    retry_methods = None  # Http methods retried, idempotent ones if None
+    pool_size = 10  # Max pooled connections per host
+    keep_alive = True  # Reuse connections between requests
     interactive = False
     verbose = False
     ssl_insecure = True
+    retain_bodies = "always"  # Keep request/response bodies in results: never, on_failure, always
 
     # Binding and creation of generators
     collect_import_result = False
@@ -23,7 +35,10 @@ class TestSetConfig:
     extract = None  # extract several variable in context after this test set run
     data_driven_generator = None
     data_driven_generator_name = None
+    data_driven_concurrency = 1  # Data driven rows run in parallel if > 1
+    test_concurrency = 1  # Independent tests run in parallel if > 1, see scheduler
     working_directory = None
+    template_vars = None  # $variables used by the tests, for generators with columns: auto, None if unknown
 
     def set_default_base_url(self, url):
         self.variable_binds['default_base_url'] = url
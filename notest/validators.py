@@ -1,13 +1,15 @@
 import logging
 import json
+import copy
 import operator
 import traceback
 import os
 import re
+from functools import lru_cache
 
 # Local module imports
 from notest.lib import parsing
-from notest.lib.utils import templated_var
+from notest.lib.utils import templated_var, parse_json_body
 
 """
 Validator/Extractor logic for utility use
@@ -48,7 +50,7 @@ COMPARATORS = {
     'greater_than': operator.gt,
     'contains': lambda x, y: x and operator.contains(x, y),  # is y in x
     'contained_by': lambda x, y: y and operator.contains(y, x),  # is x in y
-    'regex': lambda x, y: regex_compare(str(x), str(y)),
+    'regex': lambda x, y: regex_compare(x, y),
     'type': lambda x, y: test_type(x, y)
 }
 COMPARATORS['length_eq'] = COMPARATORS['count_eq']
@@ -110,8 +112,27 @@ def safe_length(var):
     return output
 
 
+REGEX_CACHE_SIZE = 512  # Max compiled regex patterns kept
+
+
+@lru_cache(maxsize=REGEX_CACHE_SIZE)
+def compile_regex(regex):
+    """ Compiled pattern, templated patterns are memoized by their rendered string """
+    return re.compile(regex)
+
+
 def regex_compare(input, regex):
-    return bool(re.search(regex, input))
+    """ Search regex in input, bytes input is searched with a bytes pattern, not decoded """
+    if isinstance(input, bytes):
+        if isinstance(regex, str):
+            regex = regex.encode('utf-8')
+    elif not isinstance(input, str):
+        input = str(input)
+    if isinstance(input, str) and isinstance(regex, bytes):
+        regex = regex.decode('utf-8')
+    elif not isinstance(regex, (str, bytes)):
+        regex = str(regex)
+    return bool(compile_regex(regex).search(input))
 
 
 # Validator Failure Reasons
@@ -121,6 +142,7 @@ FAILURE_TEST_EXCEPTION = 'Test Execution Exception'
 FAILURE_VALIDATOR_FAILED = 'Validator Failed'
 FAILURE_VALIDATOR_EXCEPTION = 'Validator Exception'
 FAILURE_EXTRACTOR_EXCEPTION = 'Extractor Exception'
+FAILURE_BENCHMARK_FAILED = 'Benchmark Failed'
 
 
 class Failure(object):
@@ -166,6 +188,23 @@ class Failure(object):
         self.failure_type = failure_type
 
 
+QUERY_CACHE_SIZE = 1024  # Max compiled extractor queries kept, templated queries vary per run
+
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def compile_json_path(query, delimiter='.'):
+    """ Compile a jsonpath_mini query to a tuple of segments, int for array indexes """
+    segments = list()
+    stripped_query = query.strip(delimiter)
+    if stripped_query:
+        for x in stripped_query.split(delimiter):
+            try:
+                segments.append(int(x))
+            except ValueError:
+                segments.append(x)
+    return tuple(segments)
+
+
 class AbstractExtractor(object):
     """ Basic extractor, you only need to implement full_extract """
 
@@ -183,9 +222,14 @@ class AbstractExtractor(object):
         pass
 
     def extract(self, body=None, headers=None, context=None):
-        """ Extract data """
-        self.query = templated_var(data=self.query, context=context)
-        return self.extract_internal(body=body, headers=headers, context=context)
+        """ Extract data, a templated query is realized on a copy,
+            parsed extractors are shared between runs and never modified """
+        extractor = self
+        query = templated_var(data=self.query, context=context)
+        if query is not self.query:
+            extractor = copy.copy(self)
+            extractor.query = query
+        return extractor.extract_internal(body=body, headers=headers, context=context)
 
     def get_readable_config(self, context=None):
         """ Print a human-readable version of the configuration """
@@ -203,11 +247,8 @@ class MiniJsonExtractor(AbstractExtractor):
     is_body_extractor = True
 
     def extract_internal(self, body=None, headers=None, context=None):
-        if isinstance(body, bytes):
-            body = body.decode('utf-8')  # Default JSON encoding
-
         try:
-            body = json.loads(body)
+            body = parse_json_body(body)
             return self.query_dictionary(self.query, body)
         except ValueError:
             raise ValueError("Not legal JSON!")
@@ -219,14 +260,8 @@ class MiniJsonExtractor(AbstractExtractor):
         # http://stackoverflow.com/questions/7320319/xpath-like-query-for-nested-python-dictionaries
 
         try:
-            stripped_query = query.strip(delimiter)
-            if stripped_query:
-                for x in stripped_query.split(delimiter):
-                    try:
-                        x = int(x)
-                        dictionary = dictionary[x]
-                    except ValueError:
-                        dictionary = dictionary[x]
+            for x in compile_json_path(query, delimiter):
+                dictionary = dictionary[x]
         except:
             return None
         return dictionary
@@ -235,6 +270,8 @@ class MiniJsonExtractor(AbstractExtractor):
     def parse(cls, config):
         base = MiniJsonExtractor()
         base.query = config
+        if isinstance(config, str) and "$" not in config:
+            compile_json_path(config, '.')  # Templated queries compile once rendered
         return base
 
 
@@ -244,7 +281,7 @@ class HeaderExtractor(AbstractExtractor):
     is_header_extractor = True
 
     def extract_internal(self, body=None, headers=None, context=None):
-        low = query.lower()
+        low = self.query.lower()
         # Value for all matching key names
         extracted = [y[1] for y in filter(lambda x: x[0] == low, headers)]
         if len(extracted) == 0:
@@ -302,6 +339,34 @@ class AbstractValidator(object):
         pass
 
 
+class AbstractStreamValidator(AbstractValidator):
+    """ Validator consuming the response body chunk by chunk, so it can check
+        tests with stream: true without loading the body in memory.
+        Per response state comes from start(), parsed validators are shared between runs """
+    is_stream_validator = True
+
+    def start(self, context=None):
+        """ Return a new state for one response """
+        raise NotImplementedError()
+
+    def feed(self, state, chunk):
+        """ Consume a bytes chunk of the body """
+        raise NotImplementedError()
+
+    def finish(self, state, context=None):
+        """ Body complete, return true or a Failure """
+        raise NotImplementedError()
+
+    def validate(self, body=None, headers=None, context=None):
+        """ Non streamed body, fed as one chunk """
+        state = self.start(context=context)
+        if body:
+            if isinstance(body, str):
+                body = body.encode('utf-8')
+            self.feed(state, body)
+        return self.finish(state, context=context)
+
+
 class ComparatorValidator(AbstractValidator):
     """ Does extract and compare from request body   """
 
@@ -359,7 +424,14 @@ class ComparatorValidator(AbstractValidator):
         if isinstance(extracted_val, bytes) and isinstance(
                 expected_val, str):
             expected_val = expected_val.encode('utf-8')
-        comparison = self.comparator(extracted_val, expected_val)
+        try:
+            comparison = self.comparator(extracted_val, expected_val)
+        except Exception as e:  # Such as a templated regex rendered to an invalid pattern
+            trace = traceback.format_exc()
+            return Failure(
+                message="Comparator {0} threw exception: {1}".format(self.comparator_name, e),
+                details=trace, validator=self,
+                failure_type=FAILURE_VALIDATOR_EXCEPTION)
 
         if not comparison:
             failure = Failure(validator=self)
@@ -427,6 +499,11 @@ class ComparatorValidator(AbstractValidator):
                     raise ValueError(
                         "Can't supply a non-template, non-extract dictionary to comparator-validator")
 
+        # Static patterns are compiled, and checked, at parse time
+        if output.comparator_name == 'regex' and isinstance(output.expected, str) \
+                and not isinstance(expected, dict) and "$" not in output.expected:
+            compile_regex(output.expected)
+
         return output
 
 
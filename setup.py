@@ -29,15 +29,18 @@ setuptools.setup(name='notest',
           'Environment :: Console',
           'License :: OSI Approved :: Apache Software License',
           'Natural Language :: English',
-          'Programming Language :: Python :: 3.5',
-          'Programming Language :: Python :: 3.6',
           'Programming Language :: Python :: 3.7',
+          'Programming Language :: Python :: 3.8',
+          'Programming Language :: Python :: 3.9',
+          'Programming Language :: Python :: 3.10',
+          'Programming Language :: Python :: 3.11',
           'Topic :: Software Development :: Testing',
           'Topic :: Software Development :: Quality Assurance',
           'Topic :: Utilities'
       ],
       packages=setuptools.find_packages(where='.', exclude=(), include=('notest*', 'tools')),
       license='Apache License, Version 2.0',
+      python_requires='>=3.7',  # asyncio.run and get_running_loop
       install_requires=install_requires,
       dependency_links=dependency_links,
       include_package_data=True,
@@ -0,0 +1,122 @@
+import gc
+import threading
+import unittest
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from notest import master, testset as testsets
+from notest.test_runners import get_test_runner_parser
+from notest.clients import async_client
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_testset(name, url, count=3):
+    testset = testsets.TestSet()
+    testset.name = name
+    testset.config = testsets.TestSetConfig()
+    testset.config.request_client = 'async'
+    testset.tests = [get_test_runner_parser('http_test')(
+        {'name': '{}-{}'.format(name, i), 'url': url}) for i in range(count)]
+    for test in testset.tests:
+        test.testset_config = testset.config
+    return testset
+
+
+class ThreadLoopTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        cls.server.daemon_threads = True
+        cls.server.lock = threading.Lock()
+        cls.server.connections = 0
+        cls.url = 'http://127.0.0.1:{}/tasks'.format(cls.server.server_address[1])
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.server.connections = 0
+        self.sessions = list()  # (thread name, loop, session)
+        get_loop_session = async_client.get_loop_session
+
+        def record_session(*args, **kwargs):
+            session = get_loop_session(*args, **kwargs)
+            entry = (threading.current_thread().name, async_client.asyncio.get_running_loop(),
+                     session)
+            if entry not in self.sessions:
+                self.sessions.append(entry)
+            return session
+
+        patcher = mock.patch.object(async_client, 'get_loop_session', record_session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_testsets_on_threads(self):
+        results = master.run_testsets([make_testset('a', self.url),
+                                       make_testset('b', self.url)], workers=2)
+        self.assertEqual(6, len(results))
+        self.assertTrue(all(r.passed for r in results), [r.failures for r in results])
+        # One loop and session per worker thread, reused by all its requests
+        self.assertEqual(2, len(self.sessions))
+        self.assertEqual(2, len({name for name, loop, session in self.sessions}))
+        self.assertEqual(2, self.server.connections)
+        # Loops and sessions are closed with their threads
+        gc.collect()
+        for name, loop, session in self.sessions:
+            self.assertTrue(loop.is_closed(), name)
+            self.assertTrue(session.closed, name)
+            self.assertNotIn(loop, async_client.LOOP_SESSIONS)
+
+    def test_thread_loop_reused(self):
+        loops = list()
+
+        def run():
+            loops.append(async_client.get_thread_loop())
+            loops.append(async_client.get_thread_loop())
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+        self.assertIs(loops[0], loops[1])
+        self.assertIsNot(loops[0], async_client.get_thread_loop())
+        self.assertFalse(loops[0].is_closed())
+        del thread
+        gc.collect()
+        self.assertTrue(loops[0].is_closed())
+
+    def test_close_thread_loop_in_running_loop(self):
+        loop = async_client.asyncio.new_event_loop()
+
+        async def close():
+            # Called from a thread running another loop, as by a finalizer
+            async_client.close_thread_loop(loop)
+
+        async_client.asyncio.run(close())
+        self.assertTrue(loop.is_closed())
+
+
+if __name__ == '__main__':
+    unittest.main()
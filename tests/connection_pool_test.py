@@ -0,0 +1,160 @@
+import sys
+import types
+import asyncio
+import unittest
+from unittest import mock
+
+from notest import testset as testsets
+from notest.test_runners import get_test_runner_parser
+from notest.clients import async_client
+from notest.clients.connection_pool import ConnectionPoolManager
+from notest.clients.requests_client import RequestsClient
+
+
+def make_config(**kwargs):
+    config = testsets.TestSetConfig()
+    for key, value in kwargs.items():
+        setattr(config, key, value)
+    return config
+
+
+class FakeCurlError(Exception):
+    pass
+
+
+class FakeCurl:
+    """ pycurl.Curl stand-in, options are named by strings """
+
+    def __getattr__(self, name):
+        if name.isupper():
+            return name
+        raise AttributeError(name)
+
+    def __init__(self):
+        self.options = dict()
+        self.closed = False
+        self.performed = 0
+
+    def setopt(self, option, value):
+        self.options[option] = value
+
+    def getinfo(self, info):
+        if self.closed:
+            raise FakeCurlError("handle closed")
+        return 200 if info == 'RESPONSE_CODE' else 0
+
+    def reset(self):
+        self.options = dict()
+
+    def perform(self):
+        self.performed += 1
+        self.options['WRITEFUNCTION'](b'{}')
+
+    def close(self):
+        self.closed = True
+
+
+class FakePycurl(types.ModuleType):
+
+    def __init__(self):
+        super().__init__('pycurl')
+        self.Curl = FakeCurl
+        self.error = FakeCurlError
+
+    def __getattr__(self, name):
+        if name.isupper():
+            return name
+        raise AttributeError(name)
+
+
+class AsyncClientPoolTest(unittest.TestCase):
+
+    def test_create_handler(self):
+        config = async_client.AsyncClient.create_handler(pool_size=3, keep_alive=False)
+        self.assertEqual(async_client.SessionConfig(3, True), config)
+        self.assertEqual(async_client.SessionConfig(10, False),
+                         async_client.AsyncClient.create_handler(pool_size=10))
+
+    def test_pool_manager_settings(self):
+        pool = ConnectionPoolManager()
+        handler = pool.get_handler('async', 'http://localhost:5000/tasks',
+                                   make_config(pool_size=4, keep_alive=False))
+        self.assertEqual(async_client.SessionConfig(4, True), handler)
+        self.assertIs(handler, async_client.AsyncClient(handler).get_handler())
+
+    def test_loop_sessions(self):
+        async def get_sessions():
+            small = async_client.SessionConfig(2, True)
+            sessions = [async_client.get_loop_session(small),
+                        async_client.get_loop_session(async_client.SessionConfig(2, True)),
+                        async_client.get_loop_session()]
+            settings = [(s.connector.limit_per_host, s.connector.force_close)
+                        for s in sessions]
+            loop = asyncio.get_running_loop()
+            self.assertEqual(2, len(async_client.LOOP_SESSIONS[loop]))
+            await async_client.close_loop_session()
+            self.assertNotIn(loop, async_client.LOOP_SESSIONS)
+            return sessions, settings
+
+        (small, same, default), settings = asyncio.run(get_sessions())
+        self.assertIs(small, same)
+        self.assertIsNot(small, default)
+        self.assertEqual((2, True), settings[0])
+        self.assertEqual((async_client.DEFAULT_LIMIT_PER_HOST, False), settings[2])
+        self.assertTrue(small.closed and default.closed)
+
+
+class RequestsClientPoolTest(unittest.TestCase):
+
+    def test_create_handler(self):
+        session = RequestsClient.create_handler(pool_size=4, keep_alive=False)
+        adapter = session.get_adapter('http://localhost')
+        self.assertEqual(4, adapter._pool_maxsize)
+        self.assertEqual('close', session.headers['Connection'])
+        session = RequestsClient.create_handler(pool_size=2)
+        self.assertEqual('keep-alive', session.headers['Connection'])
+        self.assertIs(session.get_adapter('https://localhost'),
+                      session.get_adapter('http://localhost'))
+
+
+class PycurlClientPoolTest(unittest.TestCase):
+    """ pycurl is an optional dependency, the client runs against a fake module """
+
+    def setUp(self):
+        patcher = mock.patch.dict(sys.modules, {'pycurl': FakePycurl()})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        sys.modules.pop('notest.clients.pycurl_client', None)
+
+    def send(self, pool, config):
+        test = get_test_runner_parser('http_test')({'url': 'http://localhost/tasks'})
+        test.testset_config = config
+        test.send_request(handler=pool)
+        return test
+
+    def test_pool_settings(self):
+        pool = ConnectionPoolManager()
+        config = make_config(request_client='pycurl', pool_size=3, keep_alive=False)
+        test = self.send(pool, config)
+        curl = test.http_handler
+        self.assertIsInstance(curl, FakeCurl)
+        self.assertEqual(3, curl.options['MAXCONNECTS'])
+        self.assertIn('Connection: close', curl.options['HTTPHEADER'])
+        self.assertIs(curl, self.send(pool, config).http_handler)  # Reused
+
+    def test_recreated_handle_pooled(self):
+        pool = ConnectionPoolManager()
+        config = make_config(request_client='pycurl')
+        broken = self.send(pool, config).http_handler
+        broken.close()
+        test = self.send(pool, config)
+        curl = test.http_handler
+        self.assertIsNot(broken, curl)
+        self.assertEqual(1, curl.performed)
+        self.assertIs(curl, pool.get_handler('pycurl', 'http://localhost/other', config))
+        self.assertIs(curl, self.send(pool, config).http_handler)
+        self.assertEqual(2, curl.performed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import os
+import csv
+import shutil
+import tempfile
+import unittest
+
+from notest.lib import csv_index
+from notest.lib.csv_index import CsvIndex, get_csv_index, get_row_range, \
+    parse_shard
+
+CSV_CONTENT = ('\ufeffid,name,note\r\n'
+               '1,a,"two\nlines"\r\n'
+               '\r\n'
+               '2,b\r\n'
+               '3,c,x,extra\r\n'
+               '4,"d ""quoted""",\u00e9\r\n'
+               '5,e,last')
+
+
+class CsvIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'data.csv')
+        self.write(CSV_CONTENT)
+        csv_index.INDEXES.clear()
+
+    def tearDown(self):
+        csv_index.INDEXES.clear()
+        shutil.rmtree(self.dir)
+
+    def write(self, content, mtime_ns=None):
+        with open(self.path, 'w', encoding='utf-8', newline='') as f:
+            f.write(content)
+        if mtime_ns is not None:
+            os.utime(self.path, ns=(mtime_ns, mtime_ns))
+
+    def read_reference(self):
+        with open(self.path, encoding='utf-8-sig', newline='') as f:
+            return list(csv.DictReader(f))
+
+    def test_rows_match_dict_reader(self):
+        index = get_csv_index(self.path)
+        self.assertEqual(5, len(index))
+        self.assertEqual(self.read_reference(), list(index.iter_rows()))
+
+    def test_parse_shard(self):
+        self.assertEqual((2, 4), parse_shard('2/4'))
+        for value in ('0/4', '5/4', '1/0', 'a/b', '3'):
+            self.assertRaises(ValueError, parse_shard, value)
+
+    def test_row_range(self):
+        self.assertEqual((0, 10), get_row_range(10))
+        self.assertEqual((3, 10), get_row_range(10, start_row=3))
+        self.assertEqual((3, 5), get_row_range(10, start_row=3, limit=2))
+        self.assertEqual((10, 10), get_row_range(10, start_row=20))
+        self.assertEqual((2, 4), get_row_range(10, start_row=2, limit=6,
+                                               shard=(1, 3)))
+        self.assertEqual((6, 8), get_row_range(10, start_row=2, limit=6,
+                                               shard=(3, 3)))
+
+    def test_shards_cover_all_rows(self):
+        reference = self.read_reference()
+        index = get_csv_index(self.path)
+        for count in (1, 2, 3, 5, 7):
+            rows = list()
+            for i in range(1, count + 1):
+                start, stop = get_row_range(len(index), shard=(i, count))
+                rows.extend(index.iter_rows(start, stop))
+            self.assertEqual(reference, rows, "{} shards".format(count))
+
+    def test_window(self):
+        reference = self.read_reference()
+        index = get_csv_index(self.path)
+        start, stop = get_row_range(len(index), start_row=1, limit=3)
+        self.assertEqual(reference[1:4], list(index.iter_rows(start, stop)))
+
+    def test_saved_index_reused(self):
+        get_csv_index(self.path, save_index=True)
+        self.assertTrue(os.path.exists(self.path + csv_index.INDEX_SUFFIX))
+        index = CsvIndex(self.path)
+        self.assertTrue(index.load())
+        self.assertEqual(5, len(index))
+        self.assertEqual(['id', 'name', 'note'], index.header)
+        self.assertEqual(self.read_reference(), list(index.iter_rows()))
+
+    def test_saved_index_invalidated(self):
+        stat = os.stat(self.path)
+        get_csv_index(self.path, save_index=True)
+        # Same size, other mtime
+        self.write(CSV_CONTENT.replace('5,e', '6,f'), stat.st_mtime_ns + 10 ** 9)
+        self.assertFalse(CsvIndex(self.path).load())
+        # Same mtime, other size
+        self.write(CSV_CONTENT + '\r\n7,g,h', stat.st_mtime_ns)
+        self.assertFalse(CsvIndex(self.path).load())
+
+        index = get_csv_index(self.path, save_index=True)
+        self.assertEqual(6, len(index))
+        self.assertEqual(self.read_reference(), list(index.iter_rows()))
+        self.assertTrue(CsvIndex(self.path).load())
+
+    def test_broken_index_ignored(self):
+        with open(self.path + csv_index.INDEX_SUFFIX, 'wb') as f:
+            f.write(b'broken')
+        self.assertFalse(CsvIndex(self.path).load())
+        index = get_csv_index(self.path, save_index=True)
+        self.assertEqual(5, len(index))
+        self.assertTrue(CsvIndex(self.path).load())
+
+    def test_memo_rebuilt_when_file_changes(self):
+        index = get_csv_index(self.path)
+        self.assertIs(index, get_csv_index(self.path))
+        stat = os.stat(self.path)
+        self.write('id\r\n1\r\n', stat.st_mtime_ns + 10 ** 9)
+        index = get_csv_index(self.path)
+        self.assertEqual([{'id': '1'}], list(index.iter_rows()))
+
+    def test_empty_file(self):
+        self.write('')
+        index = get_csv_index(self.path)
+        self.assertEqual(0, len(index))
+        self.assertEqual([], list(index.iter_rows()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+
+import jmespath
+
+from notest import plugin_registery  # Puts the ext folder on sys.path
+from notest.context import Context
+from notest.validators import FAILURE_EXTRACTOR_EXCEPTION, parse_extractor, parse_validator
+
+import extractor_jmespath
+from extractor_jmespath import compile_jmespath
+
+BODY = '{"items": [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}]}'
+
+
+class JMESPathTest(unittest.TestCase):
+
+    def setUp(self):
+        compile_jmespath.cache_clear()
+
+    def test_compiled_at_parse(self):
+        extractor = parse_extractor('jmespath', 'items[?id==`2`].name | [0]')
+        self.assertIsInstance(extractor, extractor_jmespath.JMESPathExtractor)
+        self.assertEqual(1, compile_jmespath.cache_info().currsize)
+        for _ in range(3):
+            self.assertEqual('b', extractor.extract(body=BODY))
+        self.assertEqual(3, compile_jmespath.cache_info().hits)
+
+    def test_templated_query(self):
+        extractor = parse_extractor('jmespath', {'template': 'items[$index].name'})
+        self.assertEqual(0, compile_jmespath.cache_info().currsize)  # Compiled once rendered
+        query = extractor.query
+        context = Context()
+        for index, name in ((0, 'a'), (1, 'b'), (0, 'a')):
+            context.bind_variable('index', index)
+            self.assertEqual(name, extractor.extract(body=BODY, context=context))
+            self.assertIs(query, extractor.query)  # Realized on a copy
+        info = compile_jmespath.cache_info()
+        self.assertEqual((2, 1), (info.currsize, info.hits))
+
+    def test_bad_expression(self):
+        self.assertRaises(jmespath.exceptions.ParseError,
+                          parse_extractor, 'jmespath', 'items[')
+        validator = parse_validator('compare', {
+            'jmespath': {'template': 'items[$index'}, 'expected': 'a'})
+        context = Context()
+        context.bind_variable('index', 0)
+        failure = validator.validate(body=BODY, context=context)
+        self.assertFalse(failure)
+        self.assertEqual(FAILURE_EXTRACTOR_EXCEPTION, failure.failure_type)
+        self.assertIn("Invalid query: items[0 : ", failure.details)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from notest.lib import file_cache
+from notest.lib.utils import read_test_file
+
+TEST_FILE = '''
+- config:
+    testset: "cached"
+- test:
+    name: "get"
+    url: "/tasks"
+'''
+
+
+class FileCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'test.yaml')
+        self.write(TEST_FILE)
+        file_cache.clear_memo()
+        patcher = mock.patch.object(file_cache, 'parse_test_content',
+                                    wraps=file_cache.parse_test_content)
+        self.parse = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(file_cache.clear_memo)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, content, mtime_ns=None):
+        with open(self.path, 'w') as f:
+            f.write(content)
+        if mtime_ns is not None:
+            os.utime(self.path, ns=(mtime_ns, mtime_ns))
+
+    def touch(self):
+        stat = os.stat(self.path)
+        mtime_ns = stat.st_mtime_ns + 10 ** 9
+        os.utime(self.path, ns=(mtime_ns, mtime_ns))
+
+    def test_memo(self):
+        first = read_test_file(self.path)
+        self.assertEqual('cached', first[0]['config']['testset'])
+        first[1]['test']['name'] = 'changed'  # Callers own their copy
+        second = read_test_file(os.path.join(self.dir, '.', 'test.yaml'))
+        self.assertEqual('get', second[1]['test']['name'])
+        self.assertEqual(1, self.parse.call_count)
+
+    def test_changed_file(self):
+        read_test_file(self.path)
+        self.write(TEST_FILE.replace('/tasks', '/users'))
+        self.touch()
+        self.assertEqual('/users', read_test_file(self.path)[1]['test']['url'])
+        self.assertEqual(2, self.parse.call_count)
+
+    def test_touched_file(self):
+        read_test_file(self.path)
+        self.touch()
+        self.assertEqual('/tasks', read_test_file(self.path)[1]['test']['url'])
+        self.assertEqual(1, self.parse.call_count)
+        read_test_file(self.path)  # Memo updated to the new mtime
+        self.assertEqual(1, self.parse.call_count)
+
+    def test_json_file(self):
+        path = os.path.join(self.dir, 'test.json')
+        with open(path, 'w') as f:
+            f.write('[{"test": {"url": "/tasks", "body": "a\\tb"}}]')
+        self.assertEqual([{'test': {'url': '/tasks', 'body': 'a\tb'}}],
+                         read_test_file(path))
+
+    def test_disk_cache(self):
+        cache_dir = os.path.join(self.dir, 'cache')
+        with mock.patch.object(file_cache, 'cache_dir', cache_dir):
+            read_test_file(self.path)
+            self.assertEqual(1, len(os.listdir(cache_dir)))
+            file_cache.clear_memo()  # As a new run would
+            self.assertEqual('/tasks', read_test_file(self.path)[1]['test']['url'])
+            self.assertEqual(1, self.parse.call_count)
+
+            file_cache.clear_memo()
+            self.write(TEST_FILE.replace('/tasks', '/users'))
+            self.touch()
+            self.assertEqual('/users', read_test_file(self.path)[1]['test']['url'])
+            self.assertEqual(2, self.parse.call_count)
+
+    def test_broken_disk_cache(self):
+        cache_dir = os.path.join(self.dir, 'cache')
+        with mock.patch.object(file_cache, 'cache_dir', cache_dir):
+            os.makedirs(cache_dir)
+            with open(file_cache.get_cache_path(os.path.realpath(self.path)), 'wb') as f:
+                f.write(b'broken')
+            self.assertEqual('/tasks', read_test_file(self.path)[1]['test']['url'])
+            file_cache.clear_memo()
+            read_test_file(self.path)  # Cache entry rewritten
+            self.assertEqual(1, self.parse.call_count)
+
+
+if __name__ == '__main__':
+    unittest.main()
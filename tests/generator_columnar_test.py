@@ -0,0 +1,108 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from notest import generators
+from notest import plugin_registery  # Puts the ext folder on sys.path
+from notest.master import find_testset_vars, parse_testsets
+from notest.lib.utils import read_test_file
+
+import generator_columnar
+
+ROWS = [{'id': 1, 'title': 'a', 'comment': 'x'},
+        {'id': 2, 'title': 'b'},
+        {'id': 3, 'title': 'c', 'comment': None, 'nested': {'k': [1]}}]
+EXAMPLES_DIR = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'examples')
+
+
+class ColumnarGeneratorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'rows.ndjson')
+        with open(self.path, 'w') as f:
+            for row in ROWS:
+                f.write(json.dumps(row) + '\n')
+                f.write('\n')  # Blank lines are skipped
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def read_rows(self, template_vars=None, **config):
+        config = {'type': 'ndjson', 'file': 'rows.ndjson', **config}
+        return list(generators.parse_generator(config, {
+            'working_directory': self.dir, 'template_vars': template_vars}))
+
+    def test_all_columns(self):
+        self.assertEqual(ROWS, self.read_rows())
+        self.assertEqual(ROWS, self.read_rows(batch_size=1))
+
+    def test_auto_columns(self):
+        self.assertEqual([{'id': 1}, {'id': 2}, {'id': 3}],
+                         self.read_rows({'id', 'other'}, columns='auto'))
+        self.assertEqual([{'id': 1, 'title': 'a'}, {'id': 2, 'title': 'b'},
+                          {'id': 3, 'title': 'c'}],
+                         self.read_rows({'title', 'id'}, columns=' Auto '))
+
+    def test_auto_columns_unknown(self):
+        # All columns when no $variable matches, or the used ones are not known
+        self.assertEqual(ROWS, self.read_rows({'other'}, columns='auto'))
+        self.assertEqual(ROWS, self.read_rows(None, columns='auto'))
+
+    def test_listed_columns(self):
+        self.assertEqual([{'comment': 'x', 'id': 1}, {'comment': None, 'id': 2},
+                          {'comment': None, 'id': 3}],
+                         self.read_rows(columns=['comment', 'id']))
+        self.assertEqual([{'id': 1, 'title': 'a'}, {'id': 2, 'title': 'b'},
+                          {'id': 3, 'title': 'c'}],
+                         self.read_rows(columns='id, title'))
+
+    def test_bad_options(self):
+        self.assertRaises(ValueError, self.read_rows, columns=5)
+        self.assertRaises(ValueError, self.read_rows, batch_size=0)
+        with open(self.path, 'a') as f:
+            f.write('[1, 2]\n')
+        self.assertRaises(ValueError, self.read_rows)
+
+    def test_pyarrow_missing(self):
+        if generator_columnar.pyarrow is not None:
+            self.skipTest("pyarrow is installed")
+        for gen_type in ('parquet', 'arrow'):
+            self.assertRaises(ImportError, generators.parse_generator,
+                              {'type': gen_type, 'file': 'rows'}, {})
+
+    @unittest.skipIf(generator_columnar.pyarrow is None, "needs pyarrow")
+    def test_parquet_and_arrow(self):
+        pyarrow = generator_columnar.pyarrow
+        table = pyarrow.Table.from_pylist([{'id': r['id'], 'title': r['title']}
+                                           for r in ROWS])
+        pyarrow.parquet.write_table(table, os.path.join(self.dir, 'rows.parquet'))
+        with pyarrow.OSFile(os.path.join(self.dir, 'rows.arrow'), 'wb') as sink:
+            with pyarrow.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        for gen_type, extra in (('parquet', {'batch_size': 2}), ('arrow', {})):
+            self.assertEqual([{'id': 1}, {'id': 2}, {'id': 3}], self.read_rows(
+                {'id'}, type=gen_type, file='rows.' + gen_type, columns='auto',
+                **extra))
+            self.assertEqual(table.to_pylist(), self.read_rows(
+                type=gen_type, file='rows.' + gen_type))
+
+    def test_testset_vars(self):
+        structure = read_test_file(os.path.join(EXAMPLES_DIR, 'use_data_driven_ndjson.yaml'))
+        self.assertEqual({'title', 'task_id', 'done'},
+                         find_testset_vars(structure, EXAMPLES_DIR))
+        structure.append({'test': {'url': '/tasks', 'body': {'file': 'body.json'}}})
+        self.assertIsNone(find_testset_vars(structure, EXAMPLES_DIR))
+
+    def test_testset_data_driven(self):
+        structure = read_test_file(os.path.join(EXAMPLES_DIR, 'use_data_driven_ndjson.yaml'))
+        testset = parse_testsets(structure, working_directory=EXAMPLES_DIR)[0]
+        row = next(testset.config.data_driven_generator)
+        self.assertEqual({'task_id', 'title'}, set(row))
+
+
+if __name__ == '__main__':
+    unittest.main()
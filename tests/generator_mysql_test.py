@@ -0,0 +1,83 @@
+import unittest
+from unittest import mock
+
+from notest import generators
+from notest import plugin_registery  # Puts the ext folder on sys.path
+from notest.lib import mysql_lib
+from tests.mysql_lib_test import CONFIG, FakeConnector, patch_connector
+
+import generator_mysql
+
+ROWS = [(i, 'n{}'.format(i)) for i in range(5)]
+
+
+class MysqlGeneratorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.connector = patch_connector(self, FakeConnector(ROWS))
+        patcher = mock.patch.dict(mysql_lib.POOLS, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def generator(self, **config):
+        config = {'type': 'mysql', 'query': 'select id, name from sites',
+                  'config': CONFIG, **config}
+        return generators.parse_generator(config, {})
+
+    def test_cached(self):
+        gen = self.generator()
+        self.assertEqual([0, 1, 2, 3, 4, 0, 1], [next(gen) for _ in range(7)])
+        self.assertEqual(1, len(self.connector.connections))
+
+    def test_stream(self):
+        gen = self.generator(stream=True, batch_size=2, return_dict_list=True)
+        rows = list(gen)
+        self.assertEqual({'id': 4, 'name': 'n4'}, rows[4])
+        self.assertEqual(5, len(rows))
+        connection = self.connector.connections[0]
+        self.assertEqual([2, 2, 2, 2], connection.cursors[0].fetch_sizes)
+        self.assertTrue(connection.closed)
+        self.assertEqual(0, len(mysql_lib.POOLS))  # A stream does not use the pool
+
+    def test_stream_batch_boundary(self):
+        for batch_size, fetches in ((5, [5, 5]), (4, [4, 4, 4]), (6, [6, 6])):
+            self.connector.connections = list()
+            self.assertEqual([0, 1, 2, 3, 4], list(self.generator(
+                stream=True, batch_size=batch_size)))
+            self.assertEqual(fetches, self.connector.connections[0].cursors[0].fetch_sizes)
+
+    def test_stream_stopped_early(self):
+        gen = self.generator(stream=True, batch_size=2)
+        self.assertEqual([0, 1, 2], [next(gen) for _ in range(3)])
+        connection = self.connector.connections[0]
+        self.assertTrue(connection.unread_result)
+        self.assertFalse(connection.closed)
+        gen.close()
+        # Closed with the rest of the result unread, never given back for reuse
+        self.assertTrue(connection.closed)
+        self.assertTrue(connection.cursors[0].closed)
+        self.assertEqual([2, 2], connection.cursors[0].fetch_sizes)
+        self.assertEqual(0, len(mysql_lib.POOLS))
+
+    def test_stream_requery(self):
+        gen = self.generator(stream=True, batch_size=3, loop='requery')
+        self.assertEqual([0, 1, 2, 3, 4, 0, 1], [next(gen) for _ in range(7)])
+        connection = self.connector.connections[0]
+        self.assertEqual(2, len(connection.cursors))  # Same connection, queried again
+        gen.close()
+        self.assertTrue(connection.closed)
+
+    def test_stream_no_rows(self):
+        self.connector.rows = []
+        self.assertRaises(ValueError, list, self.generator(stream=True))
+
+    def test_options(self):
+        self.assertRaises(ValueError, self.generator, stream=True, loop='cache')
+        self.assertRaises(ValueError, self.generator, batch_size=0)
+        self.assertRaises(ValueError, self.generator, loop='sometimes')
+        self.assertEqual('false', generator_mysql.LOOP_NONE)
+        self.assertEqual([0, 1, 2, 3, 4], list(self.generator(loop=False)))
+
+
+if __name__ == '__main__':
+    unittest.main()
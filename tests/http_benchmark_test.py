@@ -0,0 +1,138 @@
+import asyncio
+import itertools
+import threading
+import unittest
+from unittest import mock
+from types import SimpleNamespace
+
+from notest import testset as testsets
+from notest.test_runners import get_test_runner_parser
+from notest.http_test_runner import http_benchmark
+from notest.http_test_runner.http_benchmark import BenchmarkConfig, \
+    build_benchmark_result, percentile
+
+
+def benchmark_test(**options):
+    return get_test_runner_parser('http_test')({
+        'name': 'bench', 'url': 'http://localhost/tasks',
+        'benchmark': options})
+
+
+class FakeRuns:
+    """ Results of the patched test runs, every fail_every-th run fails """
+
+    def __init__(self, fail_every=None):
+        self.count = itertools.count(1)
+        self.fail_every = fail_every
+        self.threads = set()
+        self.lock = threading.Lock()
+
+    def result(self):
+        with self.lock:
+            run = next(self.count)
+            self.threads.add(threading.get_ident())
+        passed = self.fail_every is None or run % self.fail_every != 0
+        return SimpleNamespace(passed=passed)
+
+    def run_http_test(self, test_run, test_config, context, http_handler=None):
+        return self.result()
+
+    async def run_http_test_async(self, test_run, test_config, context,
+                                  http_handler=None):
+        await asyncio.sleep(0)
+        return self.result()
+
+
+class BenchmarkTest(unittest.TestCase):
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(50, percentile(values, 50))
+        self.assertEqual(90, percentile(values, 90))
+        self.assertEqual(99, percentile(values, 99))
+        self.assertEqual(100, percentile(values, 100))
+        self.assertEqual(1, percentile(values, 0))
+        self.assertEqual(7, percentile([7], 99))
+        self.assertEqual(2, percentile([1, 2, 3], 50))
+        self.assertIsNone(percentile([], 50))
+
+    def test_parse_config(self):
+        config = BenchmarkConfig.parse({'benchmark_runs': '10', 'concurrency': 0,
+                                        'max_error_rate': 0.1})
+        self.assertEqual((10, 1, 0.1), (config.benchmark_runs,
+                                        config.concurrency, config.max_error_rate))
+        self.assertEqual(10.0, BenchmarkConfig.parse({'benchmark_runs': 0,
+                                                      'duration': 10}).duration)
+        self.assertRaises(ValueError, BenchmarkConfig.parse, {'benchmark_runs': 0})
+        self.assertRaises(ValueError, BenchmarkConfig.parse, {'runs': 10})
+        self.assertEqual(5, benchmark_test(warmup_runs=5).benchmark.warmup_runs)
+
+    def test_result(self):
+        test = benchmark_test(max_error_rate=0.25)
+        latencies = [0.004, 0.001, 0.003, 0.002]
+        result = build_benchmark_result(test, test.benchmark, latencies, 1, 2.0)
+        self.assertTrue(result.passed)
+        self.assertEqual('benchmark', result.test_type)
+        self.assertEqual('bench', result.test_name)
+        self.assertEqual(4, result.benchmark_runs)
+        self.assertEqual(2.0, result.throughput)
+        self.assertEqual(0.25, result.error_rate)
+        self.assertEqual(0.001, result.latency_min)
+        self.assertAlmostEqual(0.0025, result.latency_mean)
+        self.assertEqual((0.002, 0.004, 0.004, 0.004),
+                         (result.latency_p50, result.latency_p90,
+                          result.latency_p99, result.latency_max))
+
+    def test_result_error_rate(self):
+        test = benchmark_test()
+        result = build_benchmark_result(test, test.benchmark, [0.1, 0.1], 1, 1.0)
+        self.assertFalse(result.passed)
+        self.assertEqual("Benchmark error rate 0.5000 over max_error_rate 0.0",
+                         result.failures[0].message)
+
+    def test_result_without_runs(self):
+        test = benchmark_test()
+        result = build_benchmark_result(test, test.benchmark, [], 0, 0.0)
+        self.assertFalse(result.passed)
+        self.assertIsNone(result.throughput)
+        self.assertIsNone(result.latency_p50)
+        self.assertEqual("No benchmark runs executed", result.failures[0].message)
+
+    def run_benchmark(self, runs, test, request_client=None):
+        config = testsets.TestSetConfig()
+        config.request_client = request_client
+        with mock.patch.object(http_benchmark, 'run_http_test', runs.run_http_test), \
+                mock.patch.object(http_benchmark, 'run_http_test_async',
+                                  runs.run_http_test_async):
+            return http_benchmark.run_http_benchmark(test, config)
+
+    def test_run_benchmark(self):
+        runs = FakeRuns(fail_every=10)
+        test = benchmark_test(warmup_runs=3, benchmark_runs=40, concurrency=4,
+                              max_error_rate=0.1)
+        result = self.run_benchmark(runs, test)
+        self.assertEqual(43, next(runs.count) - 1)
+        self.assertEqual(40, result.benchmark_runs)
+        self.assertEqual(4, result.concurrency)
+        self.assertEqual(4, result.errors)  # Warmup runs are not counted
+        self.assertTrue(result.passed)
+
+    def test_run_benchmark_async(self):
+        runs = FakeRuns()
+        test = benchmark_test(warmup_runs=2, benchmark_runs=30, concurrency=5)
+        result = self.run_benchmark(runs, test, request_client="async")
+        self.assertEqual(32, next(runs.count) - 1)
+        self.assertEqual(30, result.benchmark_runs)
+        self.assertEqual({threading.get_ident()}, runs.threads)  # One event loop
+        self.assertTrue(result.passed)
+
+    def test_run_benchmark_duration(self):
+        runs = FakeRuns()
+        test = benchmark_test(benchmark_runs=0, duration=0.05)
+        result = self.run_benchmark(runs, test)
+        self.assertGreater(result.benchmark_runs, 0)
+        self.assertTrue(result.passed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import unittest
+from unittest import mock
+from types import SimpleNamespace
+
+from notest import test_result, testset as testsets
+from notest.test_runners import get_test_runner_parser
+from notest.http_test_runner import http_loop
+from notest.http_test_runner.http_loop import LoopPolicy, LoopPoller, \
+    get_loop_interval
+
+
+def loop_test(policy=None, loop_interval=None):
+    config = testsets.TestSetConfig()
+    if loop_interval is not None:
+        config.loop_interval = loop_interval
+    if policy is not None:
+        policy = LoopPolicy.parse(policy)
+    return SimpleNamespace(loop_policy=policy, testset_config=config)
+
+
+def loop_result(loop=True):
+    result = test_result.TestResult()
+    result.passed = True
+    result.loop = loop
+    return result
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class LoopPollerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(http_loop.time, 'perf_counter', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def poll_delays(self, poller, count):
+        return [poller.poll(loop_result()) for _ in range(count)]
+
+    def test_parse_policy(self):
+        policy = LoopPolicy.parse({'interval': '0.5', 'backoff': 2,
+                                   'max_polls': 3})
+        self.assertEqual((0.5, 2.0, 3), (policy.interval, policy.backoff,
+                                         policy.max_polls))
+        self.assertIsNone(policy.deadline)
+        for node in ({'backoff': 0.5}, {'jitter': 2}, {'max_polls': 0},
+                     {'wait': 1}):
+            self.assertRaises(ValueError, LoopPolicy.parse, node)
+        self.assertRaises(TypeError, LoopPolicy.parse, 'fast')
+
+    def test_parse_http_test(self):
+        test = get_test_runner_parser('http_test')({
+            'url': '/task', 'loop_until': [{'compare': {
+                'jsonpath_mini': 'state', 'comparator': 'str_eq',
+                'expected': 'ready'}}],
+            'loop_policy': {'interval': 0.1, 'deadline': 5}})
+        self.assertEqual(1, len(test.loop_until_conditions))
+        self.assertEqual((0.1, 5.0), (test.loop_policy.interval,
+                                      test.loop_policy.deadline))
+
+    def test_interval(self):
+        self.assertEqual(http_loop.DEFAULT_LOOP_INTERVAL,
+                         get_loop_interval(loop_test()))
+        self.assertEqual(0.5, get_loop_interval(loop_test(loop_interval=0.5)))
+        self.assertEqual(0.1, get_loop_interval(
+            loop_test({'interval': 0.1}, loop_interval=0.5)))
+        poller = LoopPoller(loop_test(loop_interval=0.5))
+        self.assertEqual([0.5, 0.5, 0.5], self.poll_delays(poller, 3))
+
+    def test_backoff_and_max_interval(self):
+        poller = LoopPoller(loop_test({'interval': 1, 'backoff': 2,
+                                       'max_interval': 5}))
+        self.assertEqual([1, 2, 4, 5, 5], self.poll_delays(poller, 5))
+        self.assertEqual(17, poller.waited)
+
+    def test_jitter(self):
+        poller = LoopPoller(loop_test({'interval': 1, 'jitter': 0.2}))
+        for delay in self.poll_delays(poller, 20):
+            self.assertTrue(0.8 <= delay <= 1.2, delay)
+
+    def test_max_polls(self):
+        poller = LoopPoller(loop_test({'interval': 0.1, 'max_polls': 3}))
+        self.assertEqual([0.1, 0.1], self.poll_delays(poller, 2))
+        result = loop_result()
+        self.assertIsNone(poller.poll(result))
+        self.assertFalse(result.loop)
+        self.assertFalse(result.passed)
+        self.assertEqual("loop_until not met after 3 polls in 0.000s",
+                         result.failures[0].message)
+        self.assertEqual(3, result.poll_count)
+
+    def test_deadline(self):
+        poller = LoopPoller(loop_test({'interval': 2, 'deadline': 5}))
+        self.assertEqual(2, poller.poll(loop_result()))
+        self.clock.now += 4
+        self.assertEqual(1, poller.poll(loop_result()))  # Capped by the deadline
+        self.clock.now += 1
+        result = loop_result()
+        self.assertIsNone(poller.poll(result))
+        self.assertFalse(result.passed)
+        self.assertEqual("loop_until not met after 3 polls in 5.000s",
+                         result.failures[0].message)
+        self.assertEqual(5.0, result.poll_elapsed)
+        self.assertEqual(3, result.poll_waited)
+
+    def test_condition_met(self):
+        poller = LoopPoller(loop_test({'interval': 1}))
+        self.assertEqual(1, poller.poll(loop_result()))
+        self.clock.now += 1
+        result = loop_result(loop=False)
+        self.assertIsNone(poller.poll(result))
+        self.assertTrue(result.passed)
+        self.assertEqual([], result.failures)
+        self.assertEqual((2, 1.0, 1), (result.poll_count, result.poll_elapsed,
+                                       result.poll_waited))
+
+
+if __name__ == '__main__':
+    unittest.main()
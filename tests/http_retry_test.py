@@ -0,0 +1,211 @@
+import sys
+import time
+import socket
+import asyncio
+import unittest
+from unittest import mock
+from types import SimpleNamespace
+from email.utils import formatdate
+
+import aiohttp
+import requests
+
+from notest import testset as testsets
+from notest.master import parse_configuration, run_testset
+from notest.test_runners import get_test_runner_parser
+from notest.http_test_runner import http_retry, http_test
+from notest.http_test_runner.http_test_exec import run_http_test
+from notest.http_test_runner.http_retry import RetryBudget, RetryState, \
+    get_exception_condition, get_retry_after, parse_retry_methods, parse_retry_on
+
+
+def make_config(**kwargs):
+    config = testsets.TestSetConfig()
+    config.retries = 3
+    config.retry_backoff = 1.0
+    config.retry_backoff_factor = 2.0
+    config.retry_max_delay = 30.0
+    for key, value in kwargs.items():
+        setattr(config, key, value)
+    return config
+
+
+def http_response(status_code, headers=b''):
+    return SimpleNamespace(status_code=status_code, headers=headers)
+
+
+class RetryTest(unittest.TestCase):
+
+    def test_parse_retry_on(self):
+        self.assertEqual(frozenset({'5xx', '429', 'timeout'}),
+                         parse_retry_on('5xx, 429,Timeout'))
+        self.assertEqual(frozenset({'connection', 503}),
+                         parse_retry_on(['connection', 503]))
+        self.assertEqual(frozenset({502}), parse_retry_on(502))
+        self.assertRaises(ValueError, parse_retry_on, 'sometimes')
+
+    def test_parse_configuration(self):
+        config = parse_configuration({'retries': 2, 'retry_on': '5xx',
+                                      'retry_budget': 5})
+        self.assertEqual(2, config.retries)
+        self.assertEqual(frozenset({'5xx'}), config.retry_on)
+        self.assertEqual(5, config.retry_budget_limit)
+        self.assertIsNone(config.retry_budget)  # Created by each testset run
+        self.assertIsNone(config.retry_methods)
+        config = parse_configuration({'retry_methods': 'get, post'})
+        self.assertEqual(frozenset({'GET', 'POST'}), config.retry_methods)
+        self.assertEqual(frozenset({'PATCH'}), parse_retry_methods(['patch']))
+        self.assertRaises(ValueError, parse_retry_methods, 5)
+
+    def test_get_retry_after(self):
+        self.assertEqual(7.0, get_retry_after(
+            b'HTTP/1.1 503 Unavailable\r\nRetry-After: 7\r\n\r\n'))
+        self.assertEqual(3.0, get_retry_after({'Retry-After': '3'}))
+        self.assertEqual(3.0, get_retry_after([('retry-after', ' 3 ')]))
+        self.assertIsNone(get_retry_after(b'HTTP/1.1 503 Unavailable\r\n\r\n'))
+        self.assertIsNone(get_retry_after({'Retry-After': 'soon'}))
+        self.assertIsNone(get_retry_after(None))
+        date = formatdate(0, usegmt=True)  # In the past
+        self.assertEqual(0.0, get_retry_after({'Retry-After': date}))
+        delay = get_retry_after({'Retry-After': formatdate(time.time() + 60, usegmt=True)})
+        self.assertTrue(55 < delay <= 60)
+
+    def test_backoff_with_jitter(self):
+        retry = RetryState(make_config())
+        for attempt, base in ((1, 1.0), (2, 2.0), (3, 4.0)):
+            retry.attempts = attempt
+            delay = retry.get_delay(http_response=http_response(502))
+            self.assertGreaterEqual(delay, base * 0.5)
+            self.assertLessEqual(delay, base)
+        retry.attempts = 4  # Past the retries
+        self.assertIsNone(retry.get_delay(http_response=http_response(502)))
+
+    def test_max_delay(self):
+        retry = RetryState(make_config(retry_max_delay=1.5))
+        retry.attempts = 3
+        with mock.patch.object(http_retry.random, 'uniform', return_value=1.0):
+            self.assertEqual(1.5, retry.get_delay(http_response=http_response(500)))
+        self.assertEqual(1.5, retry.waited)
+
+    def test_retry_after(self):
+        retry = RetryState(make_config(retry_max_delay=10.0))
+        retry.attempts = 1
+        headers = b'HTTP/1.1 429 Too Many Requests\r\nRetry-After: 4\r\n\r\n'
+        self.assertEqual(4.0, retry.get_delay(http_response=http_response(429, headers)))
+        headers = b'HTTP/1.1 503 Unavailable\r\nRetry-After: 3600\r\n\r\n'
+        self.assertEqual(10.0, retry.get_delay(http_response=http_response(503, headers)))
+        # Only 429 and 503 carry a meaningful Retry-After
+        headers = b'HTTP/1.1 500 Error\r\nRetry-After: 4\r\n\r\n'
+        self.assertLessEqual(retry.get_delay(http_response=http_response(500, headers)), 1.0)
+
+    def test_conditions(self):
+        retry = RetryState(make_config(retry_on=parse_retry_on('503, timeout')))
+        retry.attempts = 1
+        self.assertIsNotNone(retry.get_delay(http_response=http_response(503)))
+        self.assertIsNone(retry.get_delay(http_response=http_response(500)))
+        self.assertIsNone(retry.get_delay(http_response=http_response(429)))
+        self.assertIsNotNone(retry.get_delay(error=socket.timeout()))
+        self.assertIsNone(retry.get_delay(error=ConnectionRefusedError()))
+        self.assertIsNone(retry.get_delay(error=ValueError()))
+
+    def test_exception_conditions(self):
+        retry = RetryState(make_config())
+        retry.attempts = 1
+        self.assertIsNotNone(retry.get_delay(error=ConnectionRefusedError()))
+        self.assertIsNotNone(retry.get_delay(error=TimeoutError()))
+        self.assertIsNone(retry.get_delay(error=KeyError('url')))
+
+    def test_client_exceptions(self):
+        cases = [
+            (requests.exceptions.ReadTimeout(), 'timeout'),
+            (requests.exceptions.ConnectTimeout(), 'timeout'),
+            (requests.exceptions.ConnectionError(), 'connection'),
+            (requests.exceptions.InvalidURL(), None),
+            (asyncio.TimeoutError(), 'timeout'),
+            (aiohttp.ServerTimeoutError(), 'timeout'),
+            (aiohttp.ServerDisconnectedError(), 'connection'),
+            (aiohttp.ClientPayloadError(), None),
+            (socket.timeout(), 'timeout'),
+            (ConnectionResetError(), 'connection'),
+        ]
+        for error, condition in cases:
+            self.assertEqual(condition, get_exception_condition(error), repr(error))
+
+    def test_exception_names_not_matched(self):
+        class Timeout(Exception):
+            pass
+
+        class ConnectionError(Exception):
+            pass
+
+        self.assertIsNone(get_exception_condition(Timeout()))
+        self.assertIsNone(get_exception_condition(ConnectionError()))
+
+    def test_pycurl_errors(self):
+        class error(Exception):
+            pass
+
+        with mock.patch.dict(sys.modules, {'pycurl': SimpleNamespace(error=error)}):
+            self.assertEqual('timeout', get_exception_condition(error(28, 'timed out')))
+            self.assertEqual('connection', get_exception_condition(error(7, 'refused')))
+            self.assertIsNone(get_exception_condition(error(3, 'bad url')))
+        self.assertIsNone(get_exception_condition(error(28, 'timed out')))
+
+    def test_methods(self):
+        for method in ('GET', 'head', 'PUT', 'DELETE', 'OPTIONS'):
+            retry = RetryState(make_config(), method)
+            retry.attempts = 1
+            self.assertIsNotNone(retry.get_delay(error=socket.timeout()), method)
+        for method in ('POST', 'PATCH'):
+            retry = RetryState(make_config(), method)
+            retry.attempts = 1
+            self.assertIsNone(retry.get_delay(error=socket.timeout()), method)
+            self.assertIsNone(retry.get_delay(http_response=http_response(503)), method)
+        retry = RetryState(make_config(retry_methods=frozenset({'POST'})), 'post')
+        retry.attempts = 1
+        self.assertIsNotNone(retry.get_delay(error=socket.timeout()))
+        retry = RetryState(make_config(retry_methods=frozenset({'POST'})), 'GET')
+        self.assertIsNone(retry.get_delay(error=socket.timeout()))
+
+    def test_run_not_retried(self):
+        config = make_config(retry_backoff=0.0)
+        for method, attempts in (('GET', 4), ('POST', 1)):
+            test = get_test_runner_parser('http_test')({
+                'url': 'http://localhost/tasks', 'method': method})
+            test.testset_config = config
+            with mock.patch.object(http_test.HttpTest, 'send_request',
+                                   side_effect=socket.timeout()) as send:
+                result = run_http_test(test, config)
+            self.assertFalse(result.passed)
+            self.assertEqual(attempts, send.call_count, method)
+            self.assertEqual(attempts, result.attempts, method)
+
+    def test_budget(self):
+        config = make_config(retry_backoff=0.0, retry_budget=RetryBudget(2))
+        states = [RetryState(config) for _ in range(3)]
+        for retry in states:
+            retry.attempts = 1
+        self.assertIsNotNone(states[0].get_delay(http_response=http_response(503)))
+        self.assertIsNotNone(states[1].get_delay(http_response=http_response(503)))
+        self.assertIsNone(states[2].get_delay(http_response=http_response(503)))
+        self.assertEqual(2, config.retry_budget.used)
+        # Not retried failures do not use the budget
+        config.retry_budget = RetryBudget(1)
+        self.assertIsNone(states[0].get_delay(http_response=http_response(404)))
+        self.assertEqual(0, config.retry_budget.used)
+
+    def test_budget_per_testset_run(self):
+        testset = testsets.TestSet()
+        testset.name = 'budget'
+        testset.tests = list()
+        testset.config = make_config(retry_budget_limit=2)
+        run_testset(testset)
+        budget = testset.config.retry_budget
+        self.assertTrue(budget.acquire() and budget.acquire())
+        run_testset(testset)
+        self.assertIsNot(budget, testset.config.retry_budget)
+        self.assertEqual(0, testset.config.retry_budget.used)
+
+
+if __name__ == '__main__':
+    unittest.main()
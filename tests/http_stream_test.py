@@ -0,0 +1,149 @@
+import json
+import hashlib
+import unittest
+
+from notest.context import Context
+from notest.validators import parse_validator
+from notest.lib.utils import ResponseBody
+from notest.http_test_runner.http_stream import ResponseStream, is_stream_validator
+
+BODY = b'header\n' + b'x' * 100 + b'\ntotal: 12345\nfooter'
+
+
+def chunks_of(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def run_stream(validators, chunks, context=None, spool_size=1024):
+    stream = ResponseStream(validators, context=context, spool_size=spool_size)
+    for chunk in chunks:
+        stream.write(chunk)
+    stream.finish()
+    return stream
+
+
+class StreamValidatorTest(unittest.TestCase):
+
+    def result(self, validator, chunks, context=None):
+        stream = run_stream([validator], chunks, context)
+        try:
+            return stream.get_result(validator)
+        finally:
+            stream.close()
+
+    def test_stream_validators(self):
+        for name, config in (('byte_count', 10), ('hash', {'expected': 'x'}),
+                             ('regex', 'a'), ('ndjson', None)):
+            self.assertTrue(is_stream_validator(parse_validator(name, config)), name)
+        self.assertFalse(is_stream_validator(parse_validator(
+            'extract_test', {'jsonpath_mini': 'id', 'test': 'exists'})))
+
+    def test_regex_across_chunks(self):
+        validator = parse_validator('regex', r'total: \d{5}')
+        for size in (1, 3, 7, 10, 64, len(BODY)):
+            self.assertIs(True, self.result(validator, chunks_of(BODY, size)), size)
+        failure = self.result(parse_validator('regex', r'total: \d{6}'),
+                              chunks_of(BODY, 5))
+        self.assertFalse(failure)
+        self.assertEqual(r"Pattern total: \d{6} not found in body", failure.message)
+
+    def test_regex_overlap(self):
+        # A match longer than overlap bytes split between chunks is not seen
+        validator = parse_validator('regex', {'pattern': 'total: 12345', 'overlap': 4})
+        self.assertFalse(self.result(validator, [b'...total: 1', b'2345...']))
+        validator = parse_validator('regex', {'pattern': 'total: 12345', 'overlap': 16})
+        self.assertIs(True, self.result(validator, [b'...total: 1', b'2345...']))
+
+    def test_regex_templated(self):
+        context = Context()
+        context.bind_variable('count', 12345)
+        validator = parse_validator('regex', 'total: $count')
+        self.assertIs(True, self.result(validator, chunks_of(BODY, 4), context))
+        context.bind_variable('count', 54321)
+        self.assertFalse(self.result(validator, chunks_of(BODY, 4), context))
+
+    def test_byte_count(self):
+        self.assertIs(True, self.result(parse_validator('byte_count', len(BODY)),
+                                        chunks_of(BODY, 7)))
+        failure = self.result(parse_validator('byte_count', {'max': 10}),
+                              chunks_of(BODY, 7))
+        self.assertEqual("Body has {} bytes, more than max 10".format(len(BODY)),
+                         failure.message)
+        self.assertFalse(self.result(parse_validator('byte_count', {'min': 1}), []))
+
+    def test_hash(self):
+        digest = hashlib.md5(BODY).hexdigest()
+        validator = parse_validator('hash', {'algorithm': 'MD5',
+                                             'expected': digest.upper()})
+        for size in (1, 13, len(BODY)):
+            self.assertIs(True, self.result(validator, chunks_of(BODY, size)))
+        failure = self.result(validator, chunks_of(BODY[:-1], 13))
+        self.assertIn("expected {}".format(digest), failure.message)
+        self.assertRaises(ValueError, parse_validator, 'hash', {'algorithm': 'nope',
+                                                              'expected': digest})
+
+    def test_ndjson_lines_across_chunks(self):
+        lines = [json.dumps({'id': i, 'name': 'n{}'.format(i)}).encode() for i in range(20)]
+        body = b'\n'.join(lines)  # Last line without a trailing newline
+        validator = parse_validator('ndjson', {'min_lines': 20, 'max_lines': 20,
+                                               'required_keys': ['id', 'name']})
+        for size in (1, 5, 17, len(body)):
+            self.assertIs(True, self.result(validator, chunks_of(body, size)), size)
+            self.assertIs(True, self.result(validator, chunks_of(body + b'\n\n', size)))
+
+    def test_ndjson_errors(self):
+        body = b'{"id": 1}\n{"name": "a"}\nnot json\n[1]\n{"id": 5'
+        validator = parse_validator('ndjson', {'required_keys': 'id', 'min_lines': 9})
+        failure = self.result(validator, chunks_of(body, 4))
+        self.assertEqual("NDJSON body has 5 errors", failure.message)
+        details = failure.details.split('\n')
+        self.assertEqual("line 2: missing keys ['id']", details[0])
+        self.assertTrue(details[1].startswith("line 3: invalid json"))
+        self.assertEqual("line 4: not a json object", details[2])
+        self.assertTrue(details[3].startswith("line 5: invalid json"))  # Final partial line
+        self.assertEqual("5 lines, less than min 9", details[4])
+
+    def test_ndjson_reported_errors_capped(self):
+        body = b'x\n' * 50
+        failure = self.result(parse_validator('ndjson', None), [body])
+        self.assertEqual("NDJSON body has 50 errors", failure.message)
+        self.assertEqual(10, len(failure.details.split('\n')))
+
+
+class ResponseStreamTest(unittest.TestCase):
+
+    def test_spooled_in_memory(self):
+        stream = run_stream([], chunks_of(BODY, 10), spool_size=len(BODY) + 1)
+        self.assertFalse(stream.file._rolled)
+        self.assertEqual(BODY.decode(), stream.get_body())
+        stream.close()
+
+    def test_spooled_to_disk(self):
+        validator = parse_validator('byte_count', len(BODY))
+        stream = run_stream([validator], chunks_of(BODY, 10), spool_size=16)
+        self.assertTrue(stream.file._rolled)  # Body larger than the spool size is on disk
+        self.assertEqual(len(BODY), stream.byte_count)
+        self.assertIs(True, stream.get_result(validator))
+        body = stream.get_body()
+        self.assertIsInstance(body, ResponseBody)
+        self.assertEqual(BODY.decode(), body)
+        self.assertIs(body, stream.get_body())  # Read back once
+        stream.close()
+        self.assertTrue(stream.file.closed)
+
+    def test_json_body_read_back(self):
+        data = json.dumps({'items': list(range(1000))}).encode()
+        stream = run_stream([], chunks_of(data, 100), spool_size=256)
+        extractor_body = stream.get_body()
+        self.assertEqual(list(range(1000)), extractor_body.json()['items'])
+        stream.close()
+
+    def test_binary_body(self):
+        data = bytes(range(256)) * 4
+        stream = run_stream([], chunks_of(data, 100), spool_size=64)
+        self.assertEqual(data, stream.get_body())
+        stream.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
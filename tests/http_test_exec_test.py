@@ -0,0 +1,40 @@
+import unittest
+
+from notest import test_result, testset as testsets
+from notest.context import Context
+from notest.test_runners import get_test_runner_parser
+from notest.clients.http_response import HttpResponse
+from notest.http_test_runner.http_test_exec import check_http_response
+
+
+def http_test(node):
+    return get_test_runner_parser('http_test')(node)
+
+
+class CheckResponseTest(unittest.TestCase):
+
+    def check(self, test, body, status_code=200):
+        response = HttpResponse(body=body, status_code=status_code,
+                                headers=[('content-type', 'application/json')])
+        return check_http_response(test, testsets.TestSetConfig(),
+                                   test_result.TestResult(), response, Context())
+
+    def test_result_keeps_plain_body(self):
+        test = http_test({'url': '/tasks', 'validators': [
+            {'compare': {'jsonpath_mini': 'id', 'comparator': 'eq', 'expected': 3}},
+            {'extract_test': {'jsonpath_mini': 'name', 'test': 'exists'}}]})
+        result = self.check(test, b'{"id": 3, "name": "a"}')
+        self.assertTrue(result.passed, result.failures)
+        self.assertIs(str, type(result.response_body))
+        self.assertEqual('{"id": 3, "name": "a"}', result.response_body)
+
+    def test_failed_validator(self):
+        test = http_test({'url': '/tasks', 'validators': [
+            {'compare': {'jsonpath_mini': 'id', 'comparator': 'eq', 'expected': 4}}]})
+        result = self.check(test, '{"id": 3}')
+        self.assertFalse(result.passed)
+        self.assertIs(str, type(result.response_body))
+
+
+if __name__ == '__main__':
+    unittest.main()
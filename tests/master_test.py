@@ -0,0 +1,296 @@
+import os
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import asyncio
+
+from notest import master, operations, test_result, testset as testsets
+from notest.context import Context
+from notest.master import run_data_driven_rows, run_data_driven_rows_async, \
+    run_operation_step, run_testset, run_testsets
+from notest.test_runners import get_test_runner_parser
+from notest.validators import FAILURE_TEST_EXCEPTION
+
+
+def make_testset(name='master'):
+    testset = testsets.TestSet()
+    testset.name = name
+    testset.tests = list()
+    testset.config = testsets.TestSetConfig()
+    return testset
+
+
+def make_operation(config):
+    operation = operations.Operation()
+    operation.config = config
+    return operation
+
+
+def failing_operation(config, context=None):
+    raise ValueError("duplicate key 'id'")
+
+
+def counting_operation(config, context=None):
+    return {'rows': 3}
+
+
+class OperationStepTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.dict(operations.OPERATIONS, {
+            'failing_operation': failing_operation,
+            'counting_operation': counting_operation})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_stats(self):
+        result = run_operation_step(make_testset(), make_operation(
+            {'type': 'counting_operation'}), Context())
+        self.assertTrue(result.passed)
+        self.assertEqual(3, result.rows)
+        self.assertEqual('master', result.testset_name)
+
+    def test_failure_reported(self):
+        with self.assertLogs('notest.master', 'ERROR') as logs:
+            result = run_operation_step(make_testset(), make_operation(
+                {'type': 'failing_operation'}), Context())
+        self.assertFalse(result.passed)
+        failure = result.failures[0]
+        self.assertEqual("duplicate key 'id'", failure.message)
+        self.assertEqual(FAILURE_TEST_EXCEPTION, failure.failure_type)
+        self.assertIn('ValueError', failure.details)
+        self.assertTrue(any('failing_operation' in line for line in logs.output))
+
+    def test_unknown_operation(self):
+        result = run_operation_step(make_testset(), make_operation(
+            {'type': 'missing_operation'}), Context())
+        self.assertFalse(result.passed)
+        self.assertEqual("Unknown operation type: missing_operation",
+                         result.failures[0].message)
+
+
+class RunTestsetsTest(unittest.TestCase):
+    """ run_testset is replaced, each testset gives results named after it """
+
+    def setUp(self):
+        self.threads = dict()
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+        patcher = mock.patch.object(master, 'run_testset', self.run_testset)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_testset(self, testset, request_handle=None, test_results=None):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            self.threads[testset.name] = threading.current_thread().name
+        try:
+            time.sleep(0.05)
+            if testset.name.startswith('broken'):
+                raise ValueError("No generator named rows")
+            for i in range(3):
+                result = test_result.TestResult()
+                result.testset_name = testset.name
+                result.test_name = 't{}'.format(i)
+                result.passed = not testset.name.startswith('failing')
+                test_results.append(result)
+        finally:
+            with self.lock:
+                self.running -= 1
+
+    def names(self, results):
+        return [(r.testset_name, r.test_name) for r in results]
+
+    def expected(self, *testset_names):
+        return [(name, 't{}'.format(i)) for name in testset_names for i in range(3)]
+
+    def test_workers(self):
+        testset_list = [make_testset('s{}'.format(i)) for i in range(6)]
+        results = run_testsets(testset_list, workers=3)
+        # Merged in the order of testsets, not of completion
+        self.assertEqual(self.expected(*('s{}'.format(i) for i in range(6))),
+                         self.names(results))
+        self.assertEqual(3, self.max_running)
+        self.assertTrue(all(name.startswith('notest-worker')
+                            for name in self.threads.values()))
+
+    def test_results_sink(self):
+        path = os.path.join(tempfile.mkdtemp(), 'results.jsonl')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        testset_list = [make_testset('s{}'.format(i)) for i in range(4)]
+        testset_list.append(make_testset('failing'))
+        with test_result.ResultsWriter(path) as writer:
+            self.assertIs(writer, run_testsets(testset_list, workers=4,
+                                               test_results=writer))
+        self.assertEqual(15, writer.summary.test_count)
+        self.assertEqual(3, writer.summary.failed_cases_count)
+        self.assertEqual(self.expected('s0', 's1', 's2', 's3', 'failing'),
+                         [(r['testset'], r['test_name'])
+                          for r in test_result.read_results(path)])
+
+    def test_failing_testset(self):
+        testset_list = [make_testset('s0'), make_testset('broken'),
+                        make_testset('s2'), make_testset('failing')]
+        results = list()
+        with self.assertLogs('notest.master', 'ERROR') as logs:
+            with self.assertRaises(ValueError):
+                run_testsets(testset_list, workers=2, test_results=results)
+        # The others ran to the end and their results were kept
+        self.assertEqual(self.expected('s0', 's2', 'failing'), self.names(results))
+        self.assertEqual(4, len(self.threads))
+        self.assertIn('Testset broken failed', logs.output[0])
+
+    def test_one_worker(self):
+        testset_list = [make_testset('s0'), make_testset('s1')]
+        results = run_testsets(testset_list, workers=1)
+        self.assertEqual(self.expected('s0', 's1'), self.names(results))
+        self.assertEqual({threading.current_thread().name}, set(self.threads.values()))
+
+    def test_pool_closed(self):
+        with mock.patch.object(master.ConnectionPoolManager, 'close') as close:
+            run_testsets([make_testset('s0'), make_testset('s1')], workers=2)
+        close.assert_called_once_with()
+
+
+def slow_counter():
+    """ Raises 'generator already executing' if next() is called by two threads at once """
+    count = 0
+    while True:
+        time.sleep(0.002)
+        count += 1
+        yield count
+
+
+class DataDrivenTest(unittest.TestCase):
+    """ The test steps are replaced, each one records what its row context holds """
+
+    ROWS = 8
+
+    def setUp(self):
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+        self.testset = make_testset('ddt')
+        self.testset.tests = [get_test_runner_parser('http_test')(
+            {'name': name, 'url': '/tasks/$row'}) for name in ('first', 'second')]
+        self.testset.config.data_driven_generator = (
+            {'row': i} for i in range(self.ROWS))
+        self.context = Context()
+        self.context.bind_variable('base', 'b')
+        self.context.add_generator('counter', slow_counter())
+        for name, step in (('run_test_step', self.run_test_step),
+                           ('run_test_step_async', self.run_test_step_async)):
+            patcher = mock.patch.object(master, name, step)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def record(self, testset, test, context, test_results, ddt_data):
+        result = test_result.TestResult()
+        result.testset_name = testset.name
+        result.test_name = test.name
+        result.data_driven_fields = ddt_data
+        result.add_key_field('row', context.get_value('row'))
+        result.add_key_field('base', context.get_value('base'))
+        result.add_key_field('seen', context.get_value('step'))  # Only set by this row's first test
+        result.add_key_field('count', context.bind_generator_next('count', 'counter'))
+        context.bind_variable('step', test.name)
+        result.passed = True
+        test_results.append(result)
+
+    def enter(self):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+
+    def leave(self):
+        with self.lock:
+            self.running -= 1
+
+    def run_test_step(self, testset, test, context, request_handle, test_results, ddt_data):
+        self.enter()
+        try:
+            # Early rows finish last
+            time.sleep(0.002 * (self.ROWS - ddt_data['row']))
+            self.record(testset, test, context, test_results, ddt_data)
+        finally:
+            self.leave()
+        return False
+
+    async def run_test_step_async(self, testset, test, context, request_handle,
+                                  test_results, ddt_data):
+        self.enter()
+        try:
+            await asyncio.sleep(0.002 * (self.ROWS - ddt_data['row']))
+            self.record(testset, test, context, test_results, ddt_data)
+        finally:
+            self.leave()
+        return False
+
+    def check_results(self, results):
+        # Results in row order, then test order
+        self.assertEqual([(i, name) for i in range(self.ROWS) for name in ('first', 'second')],
+                         [(r.key_fields['row'], r.test_name) for r in results])
+        for result in results:
+            self.assertEqual({'row': result.key_fields['row']}, result.data_driven_fields)
+            self.assertEqual('b', result.key_fields['base'])
+            # Each row got its own context
+            expected_seen = None if result.test_name == 'first' else 'first'
+            self.assertEqual(expected_seen, result.key_fields['seen'])
+        # The shared generator gave each test its own value
+        self.assertEqual(list(range(1, 2 * self.ROWS + 1)),
+                         sorted(r.key_fields['count'] for r in results))
+        # Variables of the last row are visible afterwards, the parent kept its own
+        self.assertEqual(self.ROWS - 1, self.context.get_value('row'))
+        self.assertEqual('second', self.context.get_value('step'))
+        self.assertEqual('b', self.context.get_value('base'))
+        self.assertEqual(['/tasks/$row'] * 2, [t.url for t in self.testset.tests])
+
+    def test_threads(self):
+        results = run_data_driven_rows(self.testset, self.context, concurrency=4)
+        self.check_results(results)
+        self.assertEqual(4, self.max_running)
+
+    def test_async(self):
+        results = run_data_driven_rows_async(self.testset, self.context, concurrency=4)
+        self.check_results(results)
+        self.assertEqual(4, self.max_running)
+
+    def test_generator_lock(self):
+        # Without GENERATOR_LOCK, next() of slow_counter from two threads raises ValueError
+        with mock.patch.object(master, 'run_test_step') as step:
+            step.side_effect = lambda testset, test, context, *args: \
+                [context.bind_generator_next('count', 'counter') for _ in range(5)] and False
+            run_data_driven_rows(self.testset, self.context, concurrency=8)
+        self.assertEqual(2 * self.ROWS, step.call_count)
+        self.assertEqual(10 * self.ROWS + 1, next(self.context.get_generator('counter')))
+
+    def test_row_error(self):
+        self.testset.config.data_driven_generator = iter([{'row': 0}, 'not a dict'])
+        self.assertRaises(Exception, run_data_driven_rows, self.testset, self.context,
+                          concurrency=2)
+
+    def test_run_testset_dispatch(self):
+        self.testset.config.data_driven_concurrency = 3
+        self.testset.config.generators = {'counter': slow_counter()}
+        with mock.patch.object(master, 'run_data_driven_rows',
+                               wraps=run_data_driven_rows) as rows:
+            results = run_testset(self.testset)[0]
+        self.assertEqual(3, rows.call_args[1]['concurrency'])
+        self.assertEqual(2 * self.ROWS, len(results))
+        self.testset.config.request_client = 'async'
+        self.testset.config.data_driven_generator = ({'row': i} for i in range(self.ROWS))
+        with mock.patch.object(master, 'run_data_driven_rows_async',
+                               wraps=run_data_driven_rows_async) as rows:
+            results = run_testset(self.testset)[0]
+        self.assertEqual(3, rows.call_args[1]['concurrency'])
+        self.assertEqual(2 * self.ROWS, len(results))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,322 @@
+import time
+import threading
+import unittest
+from unittest import mock
+
+import mysql.connector
+from mysql.connector import errorcode
+
+from notest.lib import mysql_lib
+from notest.lib.mysql_lib import MysqlClient, MysqlConnectionPool, POOL_CHECK_INTERVAL
+
+CONFIG = {'user': 'root', 'host': 'localhost', 'database': 'test'}
+
+
+class FakeCursor:
+    """ Cursor over fixed rows, records the executed statements """
+
+    def __init__(self, connection, rows=(), column_names=('id', 'name')):
+        self.connection = connection
+        self.rows = list(rows)
+        self.column_names = column_names
+        self.executed = list()
+        self.fetch_sizes = list()
+        self.rowcount = -1
+        self.closed = False
+
+    def execute(self, sql):
+        self.executed.append(sql)
+        self.position = 0
+        self.connection.unread_result = bool(self.rows)
+
+    def fetchall(self):
+        self.connection.unread_result = False
+        return list(self.rows)
+
+    def fetchmany(self, size):
+        self.fetch_sizes.append(size)
+        rows = self.rows[self.position:self.position + size]
+        self.position += len(rows)
+        # Like mysql.connector, the end of the result is only seen by a short or empty fetch
+        if len(rows) < size:
+            self.connection.unread_result = False
+        return rows
+
+    def executemany(self, sql, rows):
+        rows = list(rows)
+        if self.connection.fail_on is not None and self.connection.fail_on in rows:
+            raise mysql.connector.errors.IntegrityError("Duplicate entry")
+        self.executed.append((sql, rows))
+        self.rowcount = len(rows)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnection:
+    """ Stands in for a mysql.connector connection """
+
+    def __init__(self, rows=(), fail_on=None):
+        self.rows = rows
+        self.fail_on = fail_on  # executemany raises for a batch holding this row
+        self.unread_result = False
+        self.in_transaction = False
+        self.connected = True
+        self.closed = False
+        self.pings = 0
+        self.commits = 0
+        self.rollbacks = 0
+        self.cursors = list()
+
+    def cursor(self, buffered=None):
+        cursor = FakeCursor(self, self.rows)
+        self.cursors.append(cursor)
+        return cursor
+
+    def is_connected(self):
+        self.pings += 1
+        return self.connected
+
+    def start_transaction(self):
+        self.in_transaction = True
+
+    def commit(self):
+        self.commits += 1
+        self.in_transaction = False
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.in_transaction = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnector:
+    """ mysql.connector.connect replacement, keeps the connections it opened """
+
+    def __init__(self, rows=(), fail_on=None):
+        self.rows = rows
+        self.fail_on = fail_on
+        self.connections = list()
+        self.error = None
+
+    def __call__(self, **config):
+        if self.error is not None:
+            raise self.error
+        connection = FakeConnection(self.rows, self.fail_on)
+        self.connections.append(connection)
+        return connection
+
+
+def patch_connector(test_case, connector):
+    patcher = mock.patch.object(mysql_lib.mysql.connector, 'connect', connector)
+    patcher.start()
+    test_case.addCleanup(patcher.stop)
+    return connector
+
+
+class ConnectionPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.connector = patch_connector(self, FakeConnector())
+
+    def idle_for(self, pool, seconds):
+        pool.idle = [(connection, released - seconds) for connection, released in pool.idle]
+
+    def test_reuse(self):
+        pool = MysqlConnectionPool(CONFIG)
+        first = pool.acquire()
+        pool.release(first)
+        self.assertIs(first, pool.acquire())
+        self.assertEqual(1, len(self.connector.connections))
+        self.assertEqual(0, first.pings)  # Just released, not pinged
+        self.assertEqual(1, pool.open_count)
+
+    def test_max_size_wait(self):
+        pool = MysqlConnectionPool(CONFIG, max_size=1)
+        first = pool.acquire()
+        acquired = list()
+        waiter = threading.Thread(target=lambda: acquired.append(pool.acquire(timeout=5)))
+        waiter.start()
+        time.sleep(0.05)
+        self.assertEqual([], acquired)  # Waits while the only connection is in use
+        pool.release(first)
+        waiter.join(5)
+        self.assertEqual([first], acquired)
+        self.assertEqual(1, len(self.connector.connections))
+
+    def test_max_size_timeout(self):
+        pool = MysqlConnectionPool(CONFIG, max_size=2)
+        pool.acquire()
+        pool.acquire()
+        start = time.monotonic()
+        with self.assertRaises(Exception) as raised:
+            pool.acquire(timeout=0.1)
+        self.assertGreaterEqual(time.monotonic() - start, 0.1)
+        self.assertEqual("No MySQL connection available in 0.1s, pool size 2",
+                         str(raised.exception))
+        self.assertEqual(2, pool.open_count)
+
+    def test_idle_timeout(self):
+        pool = MysqlConnectionPool(CONFIG, idle_timeout=300)
+        first = pool.acquire()
+        pool.release(first)
+        self.idle_for(pool, 301)
+        second = pool.acquire()
+        self.assertIsNot(first, second)
+        self.assertTrue(first.closed)
+        self.assertEqual(0, first.pings)  # Evicted without a ping
+        self.assertEqual(1, pool.open_count)
+
+    def test_ping_after_check_interval(self):
+        pool = MysqlConnectionPool(CONFIG)
+        first = pool.acquire()
+        pool.release(first)
+        self.idle_for(pool, POOL_CHECK_INTERVAL - 1)
+        self.assertIs(first, pool.acquire())
+        self.assertEqual(0, first.pings)
+        pool.release(first)
+        self.idle_for(pool, POOL_CHECK_INTERVAL + 1)
+        self.assertIs(first, pool.acquire())
+        self.assertEqual(1, first.pings)
+        # A connection that does not answer the ping is replaced
+        pool.release(first)
+        self.idle_for(pool, POOL_CHECK_INTERVAL + 1)
+        first.connected = False
+        second = pool.acquire()
+        self.assertIsNot(first, second)
+        self.assertTrue(first.closed)
+        self.assertEqual(1, pool.open_count)
+
+    def test_release_unread_result(self):
+        pool = MysqlConnectionPool(CONFIG)
+        connection = pool.acquire()
+        connection.unread_result = True
+        pool.release(connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual([], pool.idle)
+        self.assertEqual(0, pool.open_count)
+
+    def test_release_rolls_back(self):
+        pool = MysqlConnectionPool(CONFIG)
+        connection = pool.acquire()
+        connection.in_transaction = True
+        pool.release(connection)
+        self.assertEqual(1, connection.rollbacks)
+        self.assertFalse(connection.closed)
+        self.assertEqual(1, len(pool.idle))
+
+    def test_client_interface_error(self):
+        pool = MysqlConnectionPool(CONFIG)
+        with self.assertRaises(mysql.connector.errors.InterfaceError):
+            with MysqlClient(CONFIG, pool=pool) as cli:
+                connection = cli.connection
+                raise mysql.connector.errors.InterfaceError("Lost connection")
+        self.assertTrue(connection.closed)
+        self.assertEqual(0, pool.open_count)
+        # Other errors keep the connection
+        with self.assertRaises(ValueError):
+            with MysqlClient(CONFIG, pool=pool) as cli:
+                connection = cli.connection
+                raise ValueError()
+        self.assertFalse(connection.closed)
+        self.assertEqual([connection], [c for c, released in pool.idle])
+
+    def test_open_error(self):
+        pool = MysqlConnectionPool(CONFIG, max_size=1)
+        self.connector.error = mysql.connector.Error(errno=errorcode.ER_ACCESS_DENIED_ERROR)
+        self.assertRaises(mysql.connector.Error, pool.acquire)
+        self.assertEqual(0, pool.open_count)  # Rolled back
+        self.connector.error = None
+        self.assertIsNotNone(pool.acquire(timeout=0))
+
+    def test_close(self):
+        pool = MysqlConnectionPool(CONFIG)
+        connections = [pool.acquire() for _ in range(3)]
+        for connection in connections:
+            pool.release(connection)
+        pool.close()
+        self.assertTrue(all(c.closed for c in connections))
+        self.assertEqual(0, pool.open_count)
+
+    def test_get_pool(self):
+        with mock.patch.dict(mysql_lib.POOLS, clear=True):
+            pool = mysql_lib.get_pool(CONFIG)
+            self.assertIs(pool, mysql_lib.get_pool(dict(reversed(list(CONFIG.items())))))
+            self.assertIs(pool, mysql_lib.get_pool(
+                '{"user": "root", "host": "localhost", "database": "test"}'))
+            self.assertIsNot(pool, mysql_lib.get_pool(dict(CONFIG, database='other')))
+
+
+class IterQueryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.rows = [(i, 'n{}'.format(i)) for i in range(5)]
+        self.connector = patch_connector(self, FakeConnector(self.rows))
+
+    def test_batches(self):
+        for batch_size, fetches in ((1, [1] * 6), (2, [2] * 4), (5, [5, 5]), (10, [10, 10])):
+            with MysqlClient(CONFIG) as cli:
+                self.assertEqual(self.rows, list(cli.iter_query('select', batch_size)))
+                cursor = cli.connection.cursors[-1]
+            self.assertEqual(fetches, cursor.fetch_sizes, batch_size)
+            self.assertTrue(cursor.closed)
+
+    def test_dict_rows(self):
+        with MysqlClient(CONFIG) as cli:
+            rows = list(cli.iter_query('select', 2, return_dict_list=True))
+        self.assertEqual({'id': 4, 'name': 'n4'}, rows[4])
+
+    def test_stopped_early(self):
+        pool = MysqlConnectionPool(CONFIG)
+        with MysqlClient(CONFIG, pool=pool) as cli:
+            rows = cli.iter_query('select', 2)
+            self.assertEqual([self.rows[0], self.rows[1], self.rows[2]],
+                             [next(rows), next(rows), next(rows)])
+            rows.close()
+            connection = cli.connection
+            self.assertTrue(connection.unread_result)
+            self.assertTrue(connection.cursors[-1].closed)
+        # The rest of the result is not read to reuse the connection
+        self.assertTrue(connection.closed)
+        self.assertEqual(0, pool.open_count)
+        self.assertEqual([2, 2], connection.cursors[-1].fetch_sizes)
+        with MysqlClient(CONFIG, pool=pool) as cli:
+            self.assertIsNot(connection, cli.connection)
+
+
+class ExecuteManyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.connector = patch_connector(self, FakeConnector(fail_on=(7,)))
+
+    def execute_many(self, rows, batch_size):
+        with MysqlClient(CONFIG) as cli:
+            result = cli.execute_many('insert into t values(%s)', iter(rows), batch_size)
+            return result, cli.connection
+
+    def test_batches(self):
+        rows = [(i,) for i in range(6)]
+        for batch_size, sizes in ((3, [3, 3]), (4, [4, 2]), (1, [1] * 6), (10, [6])):
+            (row_count, affected, batches), connection = self.execute_many(rows, batch_size)
+            self.assertEqual((6, 6, len(sizes)), (row_count, affected, batches))
+            executed = connection.cursors[0].executed
+            self.assertEqual(sizes, [len(batch) for sql, batch in executed], batch_size)
+            self.assertEqual(rows, [row for sql, batch in executed for row in batch])
+            self.assertEqual((1, 0), (connection.commits, connection.rollbacks))
+
+    def test_no_rows(self):
+        self.assertEqual((0, 0, 0), self.execute_many([], 3)[0])
+
+    def test_rollback(self):
+        rows = [(i,) for i in range(10)]
+        with self.assertRaises(mysql.connector.errors.IntegrityError):
+            self.execute_many(rows, 3)  # Third batch holds the failing row
+        connection = self.connector.connections[0]
+        self.assertEqual(2, len(connection.cursors[0].executed))
+        self.assertEqual((0, 1), (connection.commits, connection.rollbacks))
+
+
+if __name__ == '__main__':
+    unittest.main()
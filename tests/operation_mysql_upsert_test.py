@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from notest import operations
+from notest import plugin_registery  # Puts the ext folder on sys.path
+from notest.context import Context
+from notest.lib import mysql_lib
+from tests.mysql_lib_test import CONFIG, FakeConnector, patch_connector
+
+import operation_mysql_upsert
+
+SQL = 'insert into sites(name, url) values(%s, %s)'
+
+
+class BulkUpsertTest(unittest.TestCase):
+
+    def setUp(self):
+        self.connector = patch_connector(self, FakeConnector())
+        patcher = mock.patch.dict(mysql_lib.POOLS, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def upsert(self, context=None, **config):
+        config = {'config': CONFIG, 'sql': SQL, **config}
+        return operation_mysql_upsert.mysql_bulk_upsert(config, context)
+
+    def executed_rows(self):
+        executed = self.connector.connections[-1].cursors[-1].executed
+        return [row for sql, batch in executed for row in batch]
+
+    def test_inline_rows(self):
+        context = Context()
+        context.bind_variable('b_url', 'b.com')
+        stats = self.upsert(context, rows=[['a', 'a.com'], ['b', '$b_url'], 'c'],
+                            batch_size=2)
+        self.assertEqual((3, 3, 2), (stats['rows'], stats['rows_affected'], stats['batches']))
+        self.assertEqual([('a', 'a.com'), ('b', 'b.com'), ('c',)], self.executed_rows())
+
+    def test_generator_rows(self):
+        context = Context()
+        context.add_generator('site', (row for row in [['a', 'a.com'], {'name': 'b'}, ['c', 'c.com']]))
+        stats = self.upsert(context, generator='site', count=2)
+        self.assertEqual(2, stats['rows'])
+        self.assertEqual([('a', 'a.com'), {'name': 'b'}], self.executed_rows())
+        # Stops early when the generator ends before count
+        stats = self.upsert(context, generator='site', count=5)
+        self.assertEqual(1, stats['rows'])
+
+    def test_generator_errors(self):
+        context = Context()
+        context.add_generator('site', (row for row in []))
+        with self.assertRaises(ValueError) as raised:
+            self.upsert(context, generator='site')
+        self.assertIn('needs count', str(raised.exception))
+        self.assertRaises(ValueError, self.upsert, context, generator='missing', count=1)
+        self.assertRaises(ValueError, self.upsert, context, generator='site', count=-1)
+        self.assertEqual([], self.connector.connections)  # Checked before connecting
+
+    def test_csv(self):
+        with open(os.path.join(self.dir, 'sites.csv'), 'w', newline='') as f:
+            f.write('name,url,rank\na,a.com,1\nb,b.com,2\n')
+        stats = self.upsert(csv='sites.csv', working_directory=self.dir)
+        self.assertEqual(2, stats['rows'])
+        self.assertEqual([{'name': 'a', 'url': 'a.com', 'rank': '1'},
+                          {'name': 'b', 'url': 'b.com', 'rank': '2'}], self.executed_rows())
+        self.upsert(csv=os.path.join(self.dir, 'sites.csv'), columns=['url', 'name'])
+        self.assertEqual([('a.com', 'a'), ('b.com', 'b')], self.executed_rows())
+
+    def test_bad_options(self):
+        self.assertRaises(ValueError, self.upsert)
+        self.assertRaises(ValueError, self.upsert, rows=[], csv='sites.csv')
+        self.assertRaises(ValueError, self.upsert, rows='a')
+        self.assertRaises(ValueError, self.upsert, rows=[], batch_size=0)
+
+    def test_registered(self):
+        self.assertIn('mysql_bulk_upsert', operations.OPERATIONS)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import os
+import ast
+import sys
+import shutil
+import tempfile
+import textwrap
+import unittest
+
+from notest import generators
+from notest import plugin_registery
+from notest.plugin_registery import auto_load_ext, get_literal_string, \
+    read_registry_keys
+
+LAZY_MODULE = '''
+import this_module_does_not_exist  # Fails if imported before first use
+
+def parse_lazy(config, variable_binds):
+    return iter([1])
+
+GENERATORS = {'registry_test_lazy': parse_lazy}
+'''
+
+IMPORTED_MODULE = '''
+def parse_imported(config, variable_binds):
+    return iter([2])
+
+GENERATORS = dict(registry_test_imported=parse_imported)
+'''
+
+
+class PluginRegistryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.modules = list()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+        for name in self.modules:
+            sys.modules.pop(name, None)
+        if self.dir in sys.path:
+            sys.path.remove(self.dir)
+        for name in ('registry_test_lazy', 'registry_test_imported'):
+            generators.GENERATOR_TYPES.discard(name)
+            generators.GENERATOR_PARSING.pop(name, None)
+
+    def write_module(self, name, source):
+        path = os.path.join(self.dir, name + '.py')
+        with open(path, 'w') as f:
+            f.write(textwrap.dedent(source))
+        self.modules.append(name)
+        return path
+
+    def test_literal_registries(self):
+        path = self.write_module('literal_ext', '''
+            VALIDATORS = {'v1': parse_v1}
+            EXTRACTORS = {'e1': E1.parse, 'e2': E2.parse}
+            OTHER = {'ignored': 1}
+            ''')
+        self.assertEqual({'VALIDATORS': ['v1'], 'EXTRACTORS': ['e1', 'e2']},
+                         read_registry_keys(path))
+
+    def test_not_literal_registries(self):
+        for source in ("GENERATORS = dict(g=parse)",
+                       "GENERATORS = {name: parse}",
+                       "GENERATORS = {1: parse}",
+                       "GENERATORS = {'a': parse, **OTHERS}"):
+            path = self.write_module('dynamic_ext', source)
+            self.assertIsNone(read_registry_keys(path), source)
+
+    def test_no_registries(self):
+        path = self.write_module('plain_module', "VALUE = {'a': 1}")
+        self.assertEqual({}, read_registry_keys(path))
+
+    def test_get_literal_string(self):
+        self.assertEqual('key', get_literal_string(
+            ast.parse("'key'", mode='eval').body))
+        for source in ("1", "b'key'", "name", "f'{name}'"):
+            self.assertIsNone(get_literal_string(
+                ast.parse(source, mode='eval').body), source)
+
+    def test_lazy_import(self):
+        self.write_module('lazy_ext', LAZY_MODULE)
+        self.write_module('imported_ext', IMPORTED_MODULE)
+        auto_load_ext(ext_dir=self.dir)
+
+        self.assertIn('imported_ext', sys.modules)
+        self.assertNotIn('lazy_ext', sys.modules)
+        self.assertIn('registry_test_lazy', generators.GENERATOR_TYPES)
+        self.assertEqual([2], list(generators.parse_generator(
+            {'type': 'registry_test_imported'})))
+        # The first use imports the module, which fails here
+        self.assertRaises(ImportError, generators.parse_generator,
+                          {'type': 'registry_test_lazy'})
+
+    def test_lazy_entry_loaded_once(self):
+        self.write_module('lazy_ext', LAZY_MODULE.replace(
+            'import this_module_does_not_exist', 'LOADS = [1]'))
+        manifest = read_registry_keys(os.path.join(self.dir, 'lazy_ext.py'))
+        sys.path.append(self.dir)
+        plugin_registery.register_lazy_extension('lazy_ext', manifest)
+        entry = generators.GENERATOR_PARSING['registry_test_lazy']
+        self.assertIsInstance(entry, plugin_registery.LazyRegistryEntry)
+        self.assertEqual([1], list(generators.parse_generator(
+            {'type': 'registry_test_lazy'})))
+        module = sys.modules['lazy_ext']
+        self.assertIs(module.parse_lazy, entry.function)
+        generators.parse_generator({'type': 'registry_test_lazy'})
+        self.assertIs(module, sys.modules['lazy_ext'])
+
+    def test_no_entries(self):
+        self.assertRaises(ImportError, plugin_registery.register_lazy_extension,
+                          'empty_ext', {'GENERATORS': []})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import threading
+import unittest
+from http.server import ThreadingHTTPServer
+
+from notest import test_result, testset as testsets
+from notest.context import Context
+from notest.test_runners import get_test_runner_parser
+from notest.clients.http_response import make_timings
+from notest.http_test_runner.http_stream import ResponseStream
+from notest.http_test_runner.http_test_exec import check_http_response
+from tests.async_client_test import Handler
+
+TIMING_KEYS = set(make_timings())
+
+
+class TimingsTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        cls.server.daemon_threads = True
+        cls.server.lock = threading.Lock()
+        cls.server.connections = 0
+        cls.url = 'http://127.0.0.1:{}/tasks'.format(cls.server.server_address[1])
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def send(self, client, stream=None):
+        test = get_test_runner_parser('http_test')({'url': self.url})
+        test.testset_config = testsets.TestSetConfig()
+        test.testset_config.request_client = client
+        test.response_stream = stream
+        return test, test.send_request()
+
+    def check_timings(self, timings, unmeasured):
+        self.assertEqual(TIMING_KEYS, set(timings))
+        for key in unmeasured:
+            self.assertIsNone(timings[key], key)
+        for key in TIMING_KEYS - set(unmeasured):
+            self.assertGreaterEqual(timings[key], 0, key)
+        self.assertLessEqual(timings['ttfb'], timings['total'])
+
+    def test_requests(self):
+        test, response = self.send('requests')
+        self.check_timings(response.timings, ('dns', 'connect', 'tls'))
+        self.assertGreater(response.bytes_sent, 0)
+        self.assertGreater(response.bytes_received, len(b'{"ok": true}'))
+        result = check_http_response(test, test.testset_config, test_result.TestResult(),
+                                     response, Context())
+        self.assertIs(response.timings, result.key_fields['timings'])
+        self.assertIn('"dns": null', result.to_json())
+
+    def test_requests_stream(self):
+        stream = ResponseStream([])
+        response = self.send('requests', stream)[1]
+        self.check_timings(response.timings, ('dns', 'connect', 'tls'))
+        self.assertEqual(len(b'{"ok": true}'), stream.byte_count)
+        stream.close()
+
+    def test_async(self):
+        # Name lookup of an ip address is not traced, tls is counted in connect
+        response = self.send('async')[1]
+        self.check_timings(response.timings, ('dns', 'tls'))
+
+
+if __name__ == '__main__':
+    unittest.main()
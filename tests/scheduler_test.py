@@ -0,0 +1,115 @@
+import time
+import unittest
+
+from notest.common_test import CommonTest
+from notest.context import Context
+from notest.operations import Operation
+from notest import test_result, testset as testsets, scheduler as schedulers
+from notest.test_runners import get_test_runner_parser
+from notest.scheduler import build_dependencies, find_template_vars
+from notest.master import run_tests_scheduled
+
+
+def http_test(node):
+    test = get_test_runner_parser('http_test')(node)
+    test.original_node = node
+    return test
+
+
+class SleepTest(CommonTest):
+    """ Test sleeping delay seconds, recording when it ran """
+    test_type = "sleep_test"
+    loop_until_conditions = None
+
+    def __init__(self, name, delay, log, depends_on=None):
+        self.name = name
+        self.delay = delay
+        self.log = log
+        self.depends_on = depends_on
+        self.original_node = {'name': name}
+
+    def run_test(self, test_config, context=None, handler=None, **kwargs):
+        start = time.perf_counter()
+        time.sleep(self.delay)
+        self.log[self.name] = (start, time.perf_counter())
+        result = test_result.TestResult()
+        result.test_obj = self
+        result.passed = True
+        return result
+
+
+class SchedulerTest(unittest.TestCase):
+
+    def test_find_template_vars(self):
+        node = {'url': '/tasks/$id', 'headers': {'Token': '${token}'},
+                'body': 'cost $$5', 'validators': [{'expected': '$name'}]}
+        self.assertEqual({'id', 'token', 'name'}, find_template_vars(node))
+
+    def test_independent_gets(self):
+        tests = [http_test({'name': 'a', 'url': '/a'}),
+                 http_test({'name': 'b', 'url': '/b'})]
+        self.assertEqual([set(), set()], build_dependencies(tests))
+
+    def test_unsafe_method_orders_requests(self):
+        tests = [http_test({'name': 'get', 'url': '/a'}),
+                 http_test({'name': 'post', 'url': '/a', 'method': 'POST'}),
+                 http_test({'name': 'get again', 'url': '/a'})]
+        self.assertEqual([set(), {0}, {1}], build_dependencies(tests))
+
+    def test_variable_read_after_write(self):
+        tests = [http_test({'name': 'extract', 'url': '/a',
+                            'extract_binds': [{'id': {'jsonpath_mini': 'id'}}]}),
+                 http_test({'name': 'other', 'url': '/b'}),
+                 http_test({'name': 'use', 'url': '/c/$id'})]
+        self.assertEqual([set(), set(), {0}], build_dependencies(tests))
+
+    def test_barriers(self):
+        operation = Operation()
+        operation.config = {'type': 'sleep_operation'}
+        tests = [http_test({'name': 'a', 'url': '/a'}),
+                 operation,
+                 http_test({'name': 'b', 'url': '/b'}),
+                 http_test({'name': 'file body', 'url': '/c',
+                            'body': {'file': 'body.json'}}),
+                 http_test({'name': 'd', 'url': '/d'})]
+        # Barriers wait for every earlier test, later tests wait for the barrier
+        self.assertEqual([set(), {0}, {1}, {0, 1, 2}, {1, 3}],
+                         build_dependencies(tests))
+
+    def test_depends_on(self):
+        tests = [http_test({'name': 'a', 'url': '/a'}),
+                 http_test({'name': 'b', 'url': '/b', 'depends_on': 'a'})]
+        self.assertEqual([set(), {0}], build_dependencies(tests))
+        tests = [http_test({'name': 'b', 'url': '/b', 'depends_on': 'a'})]
+        self.assertRaises(ValueError, build_dependencies, tests)
+
+    def test_start_ready(self):
+        tests = [http_test({'name': 'post', 'url': '/a', 'method': 'POST'}),
+                 http_test({'name': 'get', 'url': '/a'}),
+                 http_test({'name': 'other', 'url': '/b', 'depends_on': 'post'})]
+        scheduler = schedulers.TestScheduler(tests)
+        self.assertEqual([0], scheduler.start_ready())
+        self.assertEqual([], scheduler.start_ready())
+        scheduler.finish(0)
+        self.assertEqual([1], scheduler.start_ready(limit=1))
+        self.assertEqual([2], scheduler.start_ready())
+
+    def test_concurrent_results_in_test_order(self):
+        log = dict()
+        tests = [SleepTest('slow', 0.3, log),
+                 SleepTest('fast', 0.05, log),
+                 SleepTest('after slow', 0.05, log, depends_on=['slow'])]
+        testset = testsets.TestSet()
+        testset.name = 'scheduled'
+        testset.config = testsets.TestSetConfig()
+        testset.config.test_concurrency = 3
+        results = run_tests_scheduled(testset, tests, Context(), test_results=list())
+
+        self.assertEqual(['slow', 'fast', 'after slow'],
+                         [r.test_name for r in results])
+        self.assertLess(log['fast'][1], log['slow'][1])  # Ran alongside slow
+        self.assertGreaterEqual(log['after slow'][0], log['slow'][1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from notest import test_result as test_results
+from notest.validators import Failure, ComparatorValidator
+
+
+def make_result(name, group="default", passed=True):
+    result = test_results.TestResult()
+    result.testset_name = "results"
+    result.test_name = name
+    result.group = group
+    result.passed = passed
+    result.add_key_field("url", b"http://localhost/" + name.encode())
+    if not passed:
+        result.failures.append(Failure(message="bad status",
+                                       failure_type="status_code",
+                                       validator=ComparatorValidator()))
+    return result
+
+
+class ResultsWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write_results(self, file_name, **kwargs):
+        file_path = os.path.join(self.dir, file_name)
+        results = [make_result("a"), make_result("b", "other", passed=False),
+                   make_result("c", "other")]
+        with test_results.ResultsWriter(file_path, **kwargs) as writer:
+            writer.append(results[0])
+            writer.extend(results[1:])
+        self.assertEqual(3, writer.summary.test_count)
+        self.assertEqual(1, writer.summary.get_failed_cases_count())
+        return file_path
+
+    def check_round_trip(self, file_path):
+        results = list(test_results.read_results(file_path))
+        self.assertEqual(["a", "b", "c"], [r["test_name"] for r in results])
+        self.assertEqual("http://localhost/a", results[0]["url"])
+        self.assertEqual([], results[0]["failures"])
+        failure = results[1]["failures"][0]
+        self.assertEqual("bad status", failure["message"])
+        self.assertEqual("status_code", failure["failure_type"])
+        self.assertIsInstance(failure["validator"], str)
+
+        summary = test_results.load_results_summary(file_path)
+        self.assertEqual(3, summary.test_count)
+        self.assertEqual(1, summary.get_failed_cases_count())
+        self.assertEqual({"default": {"passed": 1, "failed": 0},
+                          "other": {"passed": 1, "failed": 1}}, summary.groups)
+
+    def test_jsonl(self):
+        file_path = self.write_results("results.jsonl")
+        with open(file_path, "rb") as fd:
+            self.assertNotEqual(b"\x1f\x8b", fd.read(2))
+        self.check_round_trip(file_path)
+
+    def test_gzip_from_extension(self):
+        file_path = self.write_results("results.jsonl.gz")
+        with open(file_path, "rb") as fd:
+            self.assertEqual(b"\x1f\x8b", fd.read(2))
+        self.check_round_trip(file_path)
+
+    def test_gzip_without_extension(self):
+        file_path = self.write_results("results.jsonl", compress=True)
+        self.check_round_trip(file_path)
+
+    def test_flushed_before_close(self):
+        file_path = os.path.join(self.dir, "results.jsonl")
+        writer = test_results.ResultsWriter(file_path, flush_every=2,
+                                            flush_interval=3600)
+        try:
+            writer.append(make_result("a"))
+            self.assertEqual([], list(test_results.read_results(file_path)))
+            writer.append(make_result("b"))
+            self.assertEqual(2, len(list(test_results.read_results(file_path))))
+            writer.append(make_result("c", passed=False))  # Failures flush at once
+            self.assertEqual(3, len(list(test_results.read_results(file_path))))
+        finally:
+            writer.close()
+        writer.close()  # Closing twice is fine
+
+    def test_truncated_lines_skipped(self):
+        file_path = self.write_results("results.jsonl")
+        with open(file_path, "a") as fd:
+            fd.write('{"test_name": "killed", "pass')
+        self.check_round_trip(file_path)
+
+    def test_truncated_gzip_skipped(self):
+        file_path = self.write_results("results.jsonl.gz")
+        with open(file_path, "rb") as fd:
+            data = fd.read()
+        with open(file_path, "wb") as fd:
+            fd.write(data[:-8])  # Drop the gzip trailer, as a killed run would
+        results = list(test_results.read_results(file_path))
+        self.assertEqual(["a", "b", "c"], [r["test_name"] for r in results])
+
+    def test_summary_groups(self):
+        results = [make_result("a"), make_result("b", passed=False)]
+        summary = test_results.ResultsSummary()
+        for result in results:
+            summary.add_result(result)
+        self.assertEqual({"default": {"passed": 1, "failed": 1}}, summary.groups)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+import string
+import unittest
+from unittest import mock
+
+from notest.context import Context
+from notest.test_runners import get_test_runner_parser
+from notest.lib import utils
+from notest.lib.utils import compile_template, templated_string, templated_var, \
+    json_loads, parse_json_body, ResponseBody
+from notest.validators import parse_extractor
+from notest.lib.parsing import safe_substitute_unicode_template
+
+TEMPLATES = [
+    '', 'no variables', '$a', '${a}', '$a$b', '${a}b', '$ab', 'pre $a post',
+    '$$', '$$a', '$$$a', 'cost $5', 'end $', '${', '${a', '${ a}', '$missing',
+    '${missing} and $a', '$a.$b', '$a-$b', '$é', 'é $a é',
+    '$a $a $a', '$_x1', '${_x1}', '$NUM $none $flag',
+]
+VALUES = {'a': 'A', 'b': 'bee', 'ab': 'AB', '_x1': 'x', 'NUM': 42,
+          'none': None, 'flag': True}
+
+
+class TemplateTest(unittest.TestCase):
+
+    def test_safe_substitute_parity(self):
+        for src in TEMPLATES:
+            expected = string.Template(src).safe_substitute(VALUES)
+            self.assertEqual(expected, compile_template(src).substitute(VALUES), src)
+            self.assertEqual(expected, safe_substitute_unicode_template(src, VALUES), src)
+
+    def test_templated_string(self):
+        for src in TEMPLATES:
+            self.assertEqual(string.Template(src).safe_substitute(VALUES),
+                             templated_string(src, VALUES), src)
+        context = Context()
+        context.bind_variables(VALUES)
+        self.assertEqual('A and 42', templated_string('$a and $NUM', context))
+        self.assertEqual('$a', templated_string('$a', None))
+        self.assertEqual('$a', templated_string('$a', {}))
+
+    def test_compiled_once(self):
+        self.assertIs(compile_template('${a}/$b'), compile_template('${a}/$b'))
+
+    def test_templated_var(self):
+        self.assertEqual({'A': ['$a'], 'url': '/A'},
+                         templated_var({'$a': ['$a'], 'url': '/$a'}, VALUES))
+        self.assertEqual('A', templated_var({'template': '$a'}, VALUES))
+        self.assertEqual(5, templated_var(5, VALUES))
+
+
+class RealizedTestTest(unittest.TestCase):
+    """ A parsed test realized on a copy per run, never changed itself """
+
+    def parse(self):
+        return get_test_runner_parser('http_test')({
+            'url': '/tasks/$id', 'method': 'POST', 'body': '{"id": "$id"}',
+            'headers': {'Token': '$token', 'X-$name': 'fixed'}})
+
+    def realize(self, test, **values):
+        context = Context()
+        context.bind_variables(values)
+        copy = test.ninja_copy()
+        copy.realize(context)
+        return copy
+
+    def test_realize_copy(self):
+        test = self.parse()
+        values = {'default_base_url': 'http://localhost', 'id': 1,
+                  'token': 't1', 'name': 'Trace'}
+        copy = self.realize(test, **values)
+        self.assertEqual('http://localhost/tasks/1', copy.url)
+        self.assertEqual('{"id": "1"}', copy.body)
+        self.assertEqual({'Token': 't1', 'X-Trace': 'fixed'}, copy.headers)
+
+        self.assertEqual('/tasks/$id', test.url)
+        self.assertEqual('{"id": "$id"}', test.body)
+        self.assertEqual({'Token': '$token', 'X-$name': 'fixed'}, test.headers)
+
+        values.update(id=2, token='t2')
+        copy = self.realize(test, **values)
+        self.assertEqual('http://localhost/tasks/2', copy.url)
+        self.assertEqual({'Token': 't2', 'X-Trace': 'fixed'}, copy.headers)
+
+    def test_header_templates_shared(self):
+        test = self.parse()
+        context = Context()
+        context.bind_variables({'token': 't1', 'name': 'Trace'})
+        first = test.ninja_copy()
+        second = test.ninja_copy()
+        self.assertIs(first.header_templates, second.header_templates)
+        headers = first.get_headers(context)
+        self.assertEqual({'Token': 't1', 'X-Trace': 'fixed'}, headers)
+        headers['Token'] = 'changed'  # Callers get their own dict
+        self.assertEqual({'Token': 't1', 'X-Trace': 'fixed'},
+                         second.get_headers(context))
+        context.bind_variable('token', 't2')
+        self.assertEqual({'Token': 't2', 'X-Trace': 'fixed'},
+                         first.get_headers(context))
+        other = Context()
+        other.bind_variables({'token': 't3', 'name': 'Trace'})
+        other.mod_count = context.mod_count
+        self.assertEqual({'Token': 't3', 'X-Trace': 'fixed'},
+                         second.get_headers(other))
+
+    def test_set_headers(self):
+        test = self.parse()
+        test.headers = {'Accept': '$type'}
+        context = Context()
+        context.bind_variable('type', 'text/plain')
+        self.assertEqual({'Accept': 'text/plain'}, test.get_headers(context))
+
+
+class JsonBodyTest(unittest.TestCase):
+
+    def test_json_loads(self):
+        self.assertEqual({'a': [1, 2.5, None]}, json_loads('{"a": [1, 2.5, null]}'))
+        self.assertEqual({'a': 1}, json_loads(b'{"a": 1}'))
+        self.assertEqual(2 ** 70, json_loads(str(2 ** 70)))  # Over 64 bits
+        self.assertNotEqual(json_loads('NaN'), json_loads('NaN'))
+        self.assertRaises(ValueError, json_loads, '{"a": ')
+
+    def test_response_body_decoded_once(self):
+        body = ResponseBody('{"id": 3, "tags": ["x", "y"]}')
+        with mock.patch.object(utils, 'json_loads', wraps=utils.json_loads) as loads:
+            for query in ('id', 'tags.1', 'tags.0'):
+                parse_extractor('jsonpath_mini', query).extract(body=body)
+            self.assertIs(parse_json_body(body), body.json())
+            self.assertEqual(1, loads.call_count)
+        self.assertEqual('y', parse_extractor('jsonpath_mini', 'tags.1').extract(body=body))
+
+    def test_plain_bodies(self):
+        self.assertEqual({'id': 3}, parse_json_body('{"id": 3}'))
+        self.assertEqual({'id': 'é'}, parse_json_body('{"id": "é"}'.encode('utf-8')))
+        self.assertEqual(3, parse_extractor('jsonpath_mini', 'id').extract(body=b'{"id": 3}'))
+
+
+if __name__ == '__main__':
+    unittest.main()
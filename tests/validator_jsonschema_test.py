@@ -0,0 +1,98 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+import jsonschema
+
+from notest import plugin_registery  # Puts the ext folder on sys.path
+from notest.context import Context
+from notest.validators import FAILURE_VALIDATOR_EXCEPTION, parse_validator
+
+from validator_jsonschema import compile_schema, compile_schema_version
+
+SCHEMA = {
+    'type': 'object',
+    'required': ['id', 'name'],
+    'properties': {
+        'id': {'type': 'integer'},
+        'name': {'type': 'string'},
+        'tags': {'type': 'array', 'items': {'type': 'string'}}
+    }
+}
+
+
+class JsonSchemaTest(unittest.TestCase):
+
+    def setUp(self):
+        compile_schema.cache_clear()
+        compile_schema_version.cache_clear()
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.path = os.path.join(self.dir, 'schema.json')
+        self.write_schema(SCHEMA)
+
+    def write_schema(self, schema):
+        with open(self.path, 'w') as f:
+            json.dump(schema, f)
+
+    def file_validator(self):
+        return parse_validator('json_schema', {'schema': {'file': self.path}})
+
+    def test_compiled_once(self):
+        validator = self.file_validator()
+        for _ in range(3):
+            self.assertIs(True, validator.validate(body='{"id": 1, "name": "a"}'))
+        self.assertEqual(1, compile_schema_version.cache_info().misses)
+        self.assertEqual(1, compile_schema.cache_info().misses)
+        # Same content inline shares the compiled schema
+        inline = parse_validator('json_schema', {'schema': json.dumps(SCHEMA)})
+        self.assertIs(True, inline.validate(body='{"id": 1, "name": "a"}'))
+        self.assertEqual(1, compile_schema.cache_info().currsize)
+
+    def test_file_changed(self):
+        validator = self.file_validator()
+        self.assertIs(True, validator.validate(body='{"id": 1, "name": "a"}'))
+        self.write_schema(dict(SCHEMA, required=['id', 'name', 'tags']))
+        self.assertFalse(validator.validate(body='{"id": 1, "name": "a"}'))
+        # Same size, only the modification time tells the change
+        stat = os.stat(self.path)
+        self.write_schema(dict(SCHEMA, required=['id', 'name', 'tag2']))
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        failure = validator.validate(body='{"id": 1, "name": "a", "tags": []}')
+        self.assertEqual("<root>: 'tag2' is a required property", failure.details)
+        self.assertEqual(3, compile_schema_version.cache_info().misses)
+
+    def test_invalid_schema(self):
+        self.write_schema({'type': 'object', 'properties': {'id': {'type': 'number-ish'}}})
+        self.assertRaises(jsonschema.exceptions.SchemaError, compile_schema,
+                          json.dumps({'type': 5}))
+        failure = self.file_validator().validate(body='{"id": 1}')
+        self.assertFalse(failure)
+        self.assertEqual("Invalid JSON Schema", failure.message)
+        self.assertEqual(FAILURE_VALIDATOR_EXCEPTION, failure.failure_type)
+        self.assertIn('number-ish', failure.details)
+
+    def test_all_errors_reported(self):
+        body = '{"id": "1", "tags": ["a", 2, 3]}'
+        failure = self.file_validator().validate(body=body)
+        self.assertEqual("JSON Schema Validation Failed, 4 errors", failure.message)
+        self.assertEqual(sorted([
+            "<root>: 'name' is a required property",
+            "id: '1' is not of type 'integer'",
+            "tags/1: 2 is not of type 'string'",
+            "tags/2: 3 is not of type 'string'"]), sorted(failure.details.split('\n')))
+
+    def test_templated_path(self):
+        os.rename(self.path, os.path.join(self.dir, 'schema_v1.json'))
+        validator = parse_validator('json_schema', {'schema': {'file': {
+            'template': os.path.join(self.dir, 'schema_$version.json')}}})
+        context = Context()
+        context.bind_variable('version', 'v1')
+        self.assertIs(True, validator.validate(body='{"id": 1, "name": "a"}',
+                                               context=context))
+
+
+if __name__ == '__main__':
+    unittest.main()
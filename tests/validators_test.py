@@ -0,0 +1,124 @@
+import re
+import unittest
+
+from notest import validators
+from notest.context import Context
+from notest.validators import FAILURE_EXTRACTOR_EXCEPTION, FAILURE_VALIDATOR_EXCEPTION, \
+    compile_json_path, compile_regex, parse_extractor, parse_validator, regex_compare
+
+BODY = '{"items": [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}]}'
+
+
+def regex_validator(expected):
+    return parse_validator('compare', {'raw_body': None, 'comparator': 'regex',
+                                       'expected': expected})
+
+
+class RegexTest(unittest.TestCase):
+
+    def setUp(self):
+        compile_regex.cache_clear()
+
+    def test_cache(self):
+        pattern = compile_regex(r'id: \d+')
+        self.assertIs(pattern, compile_regex(r'id: \d+'))
+        self.assertIsNot(pattern, compile_regex(r'id: \d+'.encode()))
+        info = compile_regex.cache_info()
+        self.assertEqual((1, 2), (info.hits, info.misses))
+        self.assertEqual(validators.REGEX_CACHE_SIZE, info.maxsize)
+
+    def test_cache_bounded(self):
+        for i in range(validators.REGEX_CACHE_SIZE + 10):
+            compile_regex('id{}'.format(i))
+        self.assertEqual(validators.REGEX_CACHE_SIZE, compile_regex.cache_info().currsize)
+
+    def test_str_and_bytes(self):
+        self.assertTrue(regex_compare('{"id": 12}', r'"id": \d+'))
+        self.assertTrue(regex_compare(b'{"id": 12}', r'"id": \d+'))
+        self.assertTrue(regex_compare('{"id": 12}', br'"id": \d+'))
+        self.assertTrue(regex_compare(b'\xff\xfeid: 12', r'id: \d+'))  # Not decoded
+        self.assertTrue(regex_compare(12345, r'^\d{5}$'))
+        self.assertFalse(regex_compare(b'{"id": 12}', '^b'))  # Not the repr of the bytes
+        self.assertTrue(regex_compare('café', 'café$'))
+        self.assertTrue(regex_compare('café'.encode('utf-8'), 'café$'))
+
+    def test_validator_bytes_body(self):
+        validator = regex_validator(r'"id": \d+')
+        self.assertIs(True, validator.validate(body=b'{"id": 12}'))
+        self.assertIs(True, validator.validate(body='{"id": 12}'))
+        self.assertFalse(validator.validate(body=b'{"name": "a"}'))
+
+    def test_static_pattern_checked_at_parse(self):
+        self.assertRaises(re.error, regex_validator, '[0-9')
+
+    def test_templated_pattern(self):
+        validator = regex_validator({'template': r'"id": $id\b'})
+        context = Context()
+        context.bind_variable('id', 12)
+        self.assertIs(True, validator.validate(body=b'{"id": 12}', context=context))
+        context.bind_variable('id', 1)
+        self.assertFalse(validator.validate(body=b'{"id": 12}', context=context))
+
+    def test_invalid_templated_pattern(self):
+        validator = regex_validator({'template': 'id: [$id'})
+        context = Context()
+        context.bind_variable('id', 1)
+        failure = validator.validate(body='id: [1', context=context)
+        self.assertFalse(failure)
+        self.assertEqual(FAILURE_VALIDATOR_EXCEPTION, failure.failure_type)
+        self.assertTrue(failure.message.startswith("Comparator regex threw exception"))
+
+    def test_invalid_stream_pattern(self):
+        validator = parse_validator('regex', 'id: [$id')
+        context = Context()
+        context.bind_variable('id', 1)
+        state = validator.start(context=context)
+        validator.feed(state, b'id: [1')
+        failure = validator.finish(state, context=context)
+        self.assertFalse(failure)
+        self.assertTrue(failure.message.startswith("Invalid pattern id: [1"))
+        self.assertRaises(re.error, parse_validator, 'regex', 'id: [1')
+
+
+class JsonPathTest(unittest.TestCase):
+
+    def setUp(self):
+        compile_json_path.cache_clear()
+
+    def test_compile(self):
+        self.assertEqual(('items', 0, 'id'), compile_json_path('items.0.id'))
+        self.assertEqual(('items', 1), compile_json_path('.items.1.'))
+        self.assertEqual((), compile_json_path(''))
+        self.assertEqual(('a', 'b'), compile_json_path('a/b', '/'))
+        self.assertIs(compile_json_path('items.0.id'), compile_json_path('items.0.id'))
+
+    def test_compiled_at_parse(self):
+        extractor = parse_extractor('jsonpath_mini', 'items.1.name')
+        self.assertEqual(1, compile_json_path.cache_info().currsize)
+        self.assertEqual('b', extractor.extract(body=BODY))
+        self.assertEqual(1, compile_json_path.cache_info().hits)
+        self.assertIsNone(extractor.extract(body='{"items": []}'))
+
+    def test_templated_query(self):
+        extractor = parse_extractor('jsonpath_mini', {'template': 'items.$index.name'})
+        self.assertEqual(0, compile_json_path.cache_info().currsize)  # Compiled once rendered
+        query = extractor.query
+        context = Context()
+        for index, name in ((0, 'a'), (1, 'b'), (0, 'a')):
+            context.bind_variable('index', index)
+            self.assertEqual(name, extractor.extract(body=BODY, context=context))
+            self.assertIs(query, extractor.query)  # Realized on a copy
+        info = compile_json_path.cache_info()
+        self.assertEqual((2, 1), (info.currsize, info.hits))
+        self.assertIn('"items.0.name"', extractor.get_readable_config(context=context))
+
+    def test_bad_body_reported(self):
+        validator = parse_validator('extract_test', {'jsonpath_mini': 'id', 'test': 'exists'})
+        failure = validator.validate(body='not json')
+        self.assertFalse(failure)
+        self.assertEqual(FAILURE_EXTRACTOR_EXCEPTION, failure.failure_type)
+        self.assertIn('Not legal JSON!', failure.details)
+
+
+if __name__ == '__main__':
+    unittest.main()